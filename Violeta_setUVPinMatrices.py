@@ -1,55 +1,224 @@
-"""Set up UV Pin Matrix nodes for Violeta's face rig"""
+"""Set up UV Pin Matrix nodes for Violeta's face rig
 
-from functools import partial
+Locators pinned to the same surface end up sharing one uvPin node, with one
+coordinate per locator, and each locator follows only the translation of its
+pin through a pickMatrix. Everything is built by one undoable MDGModifier.
+"""
 
+import time
+from typing import Optional
+
+import maya.api.OpenMaya as om
 import maya.cmds as cmds
 
+import undoableModifier
+from transforms import dagPath, setTransform
+
+GEOMETRY = ("deformedGeometry", "originalGeometry")
+PIN_SETTINGS = (
+    "normalAxis",
+    "tangentAxis",
+    "normalizedIsoParms",
+    "relativeSpaceMode",
+    "normalOverride",
+    "uvSetName",
+)
 
-def main() -> None:
-    cmds.undoInfo(openChunk=True)
 
+def main(frames: int = 48) -> None:
     # Get all locators under `face_controls_grp`
     locators = cmds.ls(selection=True, transforms=True)
 
-    # Loop through each locator
+    before = evaluationTime(frames)
+    build(locators)
+    after = evaluationTime(frames)
+    print(
+        f"Rig evaluation in parallel mode: {before * 1000:.2f} ->"
+        f" {after * 1000:.2f} ms/frame."
+    )
+
+
+def build(locators: list[str]) -> list[str]:
+    """Pin `locators` through one uvPin per surface, returning the uvPins
+
+    Each locator's group keeps its world position: its local matrix is
+    computed from the locator's new offset instead of parenting the group to
+    the world and back. The per-locator uvPins left driving nothing are
+    deleted.
+    """
+    surfaces: dict[tuple, list[dict]] = {}
+    rewired = set()
+    oldPins = set()
     for locator in locators:
-        # Get group under locator + unPin connected to it
-        group = cmds.listRelatives(locator, children=True, type="transform")[0]
-        pin = cmds.listConnections(locator, source=True, type="uvPin")[0]
-
-        # Establish node names
-        locatorName = group.replace("grp", "loc")
-        pinName = group.replace("grp", "uvPin")
-        pickMatrixName = group.replace("grp", "mtx")
-
-        # Rename nodes
-        cmds.rename(locator, locatorName)
-        cmds.rename(pin, pinName)
-
-        # Create pickMatrix
-        pickMatrix = cmds.createNode("pickMatrix", name=pickMatrixName)
-        cmds.setAttr(f"{pickMatrix}.useRotate", False)
-        cmds.setAttr(f"{pickMatrix}.useScale", False)
-        cmds.setAttr(f"{pickMatrix}.useShear", False)
-
-        # Connect pickMatrix
-        cmds.parent(f"{locatorName}|{group}", world=True)
-
-        connectAttrCmd = partial(cmds.connectAttr, force=True)
-        connectAttrCmd(
-            f"{pinName}.outputMatrix[0]", f"{pickMatrixName}.inputMatrix"
-        )
-        connectAttrCmd(
-            f"{pickMatrixName}.outputMatrix",
-            f"{locatorName}.offsetParentMatrix",
+        pin = _pin(locator)
+        settings = [cmds.getAttr(f"{pin['pin']}.{a}") for a in PIN_SETTINGS]
+        key = (*(_source(f"{pin['pin']}.{a}") for a in GEOMETRY), *settings)
+        surfaces.setdefault(key, []).append(pin)
+        oldPins.add(pin["pin"])
+        rewired.add(pin["locator"].fullPathName())
+        if pin["pickMatrix"] is not None:
+            rewired.add(om.MFnDependencyNode(pin["pickMatrix"]).name())
+
+    modifier = om.MDGModifier()
+    for pin in oldPins:
+        outputs = cmds.listConnections(
+            f"{pin}.outputMatrix", source=False, destination=True
         )
-
-        cmds.parent(f"|{group}", locatorName)
-
-        # Hide locator
-        cmds.setAttr(f"{locatorName}Shape.visibility", False)
-
-    cmds.undoInfo(closeChunk=True)
+        if not outputs or set(cmds.ls(outputs, long=True)) <= rewired:
+            modifier.deleteNode(_object(pin))
+
+    uvPins = {}
+    for key, pins in surfaces.items():
+        surface = (key[0] or "surface").split(".")[0].split(":")[-1]
+        uvPins[key] = modifier.createNode("uvPin")
+        modifier.renameNode(uvPins[key], f"{surface}_uvPin")
+        for pin in pins:
+            group = pin["group"].partialPathName().rsplit("|", 1)[-1]
+            locatorName = group.replace("grp", "loc")
+            modifier.renameNode(pin["locator"].node(), locatorName)
+            if pin["pickMatrix"] is None:
+                pin["pickMatrix"] = modifier.createNode("pickMatrix")
+                modifier.renameNode(
+                    pin["pickMatrix"], group.replace("grp", "mtx")
+                )
+    modifier.doIt()
+
+    for key, pins in surfaces.items():
+        uvPin = om.MFnDependencyNode(uvPins[key])
+        for attribute, source in zip(GEOMETRY, key):
+            if source:
+                modifier.connect(
+                    _plug(source), uvPin.findPlug(attribute, False)
+                )
+        for attribute, value in zip(PIN_SETTINGS, key[len(GEOMETRY) :]):
+            plug = uvPin.findPlug(attribute, False)
+            if isinstance(value, str):
+                modifier.newPlugValueString(plug, value)
+            else:
+                modifier.newPlugValueInt(plug, int(value))
+
+        coordinates = uvPin.findPlug("coordinate", False)
+        outputs = uvPin.findPlug("outputMatrix", False)
+        for i, pin in enumerate(pins):
+            coordinate = coordinates.elementByLogicalIndex(i)
+            modifier.newPlugValueDouble(coordinate.child(0), pin["u"])
+            modifier.newPlugValueDouble(coordinate.child(1), pin["v"])
+
+            # Create pickMatrix
+            pickMatrix = om.MFnDependencyNode(pin["pickMatrix"])
+            for attribute in ("useRotate", "useScale", "useShear"):
+                plug = pickMatrix.findPlug(attribute, False)
+                modifier.newPlugValueBool(plug, False)
+
+            # Connect pickMatrix
+            locator = om.MFnDependencyNode(pin["locator"].node())
+            _connect(
+                modifier,
+                outputs.elementByLogicalIndex(i),
+                pickMatrix.findPlug("inputMatrix", False),
+            )
+            _connect(
+                modifier,
+                pickMatrix.findPlug("outputMatrix", False),
+                locator.findPlug("offsetParentMatrix", False),
+            )
+            setTransform(modifier, pin["group"].node(), pin["groupMatrix"])
+
+            # Hide locator
+            shape = om.MDagPath(pin["locator"]).extendToShape()
+            shape = om.MFnDependencyNode(shape.node())
+            modifier.newPlugValueBool(
+                shape.findPlug("visibility", False), False
+            )
+
+    undoableModifier.commit(modifier)
+    return [om.MFnDependencyNode(p).name() for p in uvPins.values()]
+
+
+def _pin(locator: str) -> dict:
+    """How `locator` is pinned now, and its group's local matrix once the
+    locator follows only the translation of its pin"""
+    locatorPath = dagPath(locator)
+    group = cmds.listRelatives(
+        locator, children=True, type="transform", fullPath=True
+    )[0]
+
+    # Get the uvPin output driving the locator, through its pickMatrix if any
+    source = _source(f"{locator}.offsetParentMatrix")
+    pickMatrix = None
+    if cmds.nodeType(source) == "pickMatrix":
+        pickMatrix = _object(source.split(".")[0])
+        source = _source(f"{source.split('.')[0]}.inputMatrix")
+    pin, attribute = source.split(".", 1)
+    index = int(attribute[attribute.index("[") + 1 : -1])
+    u, v = cmds.getAttr(f"{pin}.coordinate[{index}]")[0]
+
+    pinMatrix = om.MTransformationMatrix(
+        om.MMatrix(cmds.getAttr(f"{pin}.outputMatrix[{index}]"))
+    )
+    offset = om.MTransformationMatrix()
+    offset.setTranslation(
+        pinMatrix.translation(om.MSpace.kWorld), om.MSpace.kWorld
+    )
+    local = om.MFnTransform(locatorPath).transformation().asMatrix()
+    parent = om.MDagPath(locatorPath).pop().inclusiveMatrix()
+    locatorMatrix = local * offset.asMatrix() * parent
+
+    groupPath = dagPath(group)
+    return {
+        "locator": locatorPath,
+        "group": groupPath,
+        "pin": pin,
+        "pickMatrix": pickMatrix,
+        "u": u,
+        "v": v,
+        "groupMatrix": groupPath.inclusiveMatrix() * locatorMatrix.inverse(),
+    }
+
+
+def _source(attribute: str) -> Optional[str]:
+    sources = cmds.listConnections(
+        attribute, source=True, destination=False, plugs=True
+    )
+    return sources[0] if sources else None
+
+
+def _object(name: str) -> om.MObject:
+    return om.MGlobal.getSelectionListByName(name).getDependNode(0)
+
+
+def _plug(attribute: str) -> om.MPlug:
+    return om.MGlobal.getSelectionListByName(attribute).getPlug(0)
+
+
+def _connect(
+    modifier: om.MDGModifier, source: om.MPlug, destination: om.MPlug
+) -> None:
+    if destination.isDestination:
+        connection = destination.source()
+        if connection == source:
+            return
+        modifier.disconnect(connection, destination)
+    modifier.connect(source, destination)
+
+
+def evaluationTime(frames: int = 48) -> float:
+    """Mean seconds to evaluate a frame with the parallel evaluator"""
+    mode = cmds.evaluationManager(query=True, mode=True)[0]
+    current = cmds.currentTime(query=True)
+    first = cmds.playbackOptions(query=True, minTime=True)
+    cmds.evaluationManager(mode="parallel")
+    cmds.evaluationManager(invalidate=True)
+    cmds.currentTime(first, update=True)  # Builds the evaluation graph
+
+    start = time.perf_counter()
+    for frame in range(1, frames + 1):
+        cmds.currentTime(first + frame, update=True)
+    seconds = (time.perf_counter() - start) / frames
+
+    cmds.currentTime(current, update=True)
+    cmds.evaluationManager(mode=mode)
+    return seconds
 
 
 if __name__ == "__main__":
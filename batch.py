@@ -0,0 +1,217 @@
+"""Run an operation over many scene files in parallel mayapy processes
+
+Each scene is opened, processed, and saved by its own worker process, e.g.
+
+    python batch.py switchToTxFiles "shots/*.ma" --mayapy <path> --jobs 4
+
+The scheduler itself doesn't import Maya, so any executable that accepts
+`batch.py --worker <operation> <scene>` can stand in for mayapy.
+"""
+
+import argparse
+import glob
+import json
+import os
+import runpy
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Optional
+
+from renderProfiles import PROFILES
+
+ROOT = Path(__file__).resolve().parent
+
+
+def _runModule(name: str) -> Callable[[], None]:
+    def run() -> None:
+        __import__(name).main()
+
+    return run
+
+
+def _runScript(path: str) -> Callable[[], None]:
+    def run() -> None:
+        runpy.run_path(str(ROOT / path), run_name="__main__")
+
+    return run
+
+
+def _rebuildShaderNetworks() -> None:
+    import maya.cmds as cmds
+
+    import shaderManager
+    import shaderNetworkIndex
+
+    cmds.loadPlugin("mtoa", quiet=True)
+    models = [shaderManager.Model(m) for m in shaderNetworkIndex.build()]
+    shaderManager.createShaderNetworks(models)
+
+
+def _prepareRender() -> None:
+    import idleQueue
+
+    idleQueue.flush()
+    script = runpy.run_path(str(ROOT / "scriptNodes/setRenderSettings.py"))
+    script["ensureAOVs"]()
+
+
+def _applyRenderProfile(name: str) -> Callable[[], None]:
+    def run() -> None:
+        import renderProfiles
+
+        renderProfiles.applyProfile(name)
+
+    return run
+
+
+OPERATIONS: dict[str, Callable[[], None]] = {
+    "switchToTxFiles": _runModule("switchToTxFiles"),
+    "renameShaders": _runModule("renameShaders"),
+    "setRenderSettings": _runScript("scriptNodes/setRenderSettings.py"),
+    "createShaderNetworks": _rebuildShaderNetworks,
+    "prepareRender": _prepareRender,
+    **{f"renderProfile:{n}": _applyRenderProfile(n) for n in PROFILES},
+}
+
+
+def work(operation: str, scene: str) -> None:
+    """Open `scene` in this mayapy process, run `operation`, and save it"""
+    import maya.standalone
+
+    maya.standalone.initialize(name="python")
+    import maya.cmds as cmds
+
+    try:
+        cmds.file(scene, open=True, force=True)
+        OPERATIONS[operation]()
+        cmds.file(save=True, force=True)
+    finally:
+        maya.standalone.uninitialize()
+
+
+def process(
+    scene: str,
+    operation: str,
+    mayapy: str,
+    retries: int = 1,
+    timeout: Optional[float] = None,
+) -> dict:
+    """Run `operation` on `scene` in a worker, retrying if it fails"""
+    command = [mayapy, str(ROOT / "batch.py"), "--worker", operation, scene]
+    result = {"scene": scene, "attempts": []}
+    for _ in range(retries + 1):
+        start = time.perf_counter()
+        try:
+            worker = subprocess.run(
+                command, capture_output=True, text=True, timeout=timeout
+            )
+        except (OSError, subprocess.TimeoutExpired) as e:
+            returncode, error = None, str(e)
+        else:
+            returncode, error = worker.returncode, worker.stderr[-2000:]
+        attempt = {
+            "seconds": round(time.perf_counter() - start, 3),
+            "returncode": returncode,
+        }
+        if returncode != 0:
+            attempt["error"] = error
+        result["attempts"].append(attempt)
+        if returncode == 0:
+            break
+
+    result["succeeded"] = result["attempts"][-1]["returncode"] == 0
+    result["seconds"] = round(sum(a["seconds"] for a in result["attempts"]), 3)
+    return result
+
+
+def run(
+    scenes: list[str],
+    operation: str,
+    mayapy: str,
+    jobs: int = 1,
+    retries: int = 1,
+    timeout: Optional[float] = None,
+) -> dict:
+    """Process `scenes` in up to `jobs` workers at once and summarize them"""
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        results = list(
+            executor.map(
+                lambda s: process(s, operation, mayapy, retries, timeout),
+                scenes,
+            )
+        )
+    return {
+        "operation": operation,
+        "jobs": jobs,
+        "seconds": round(time.perf_counter() - start, 3),
+        "succeeded": sum(r["succeeded"] for r in results),
+        "failed": [r["scene"] for r in results if not r["succeeded"]],
+        "scenes": results,
+    }
+
+
+def expandScenes(
+    patterns: list[str], listFile: Optional[str] = None
+) -> list[str]:
+    """Scene files matching `patterns` and listed in `listFile`, deduplicated"""
+    if listFile:
+        with open(listFile) as f:
+            patterns = patterns + [line.strip() for line in f if line.strip()]
+
+    scenes = {}
+    for pattern in patterns:
+        for scene in glob.glob(pattern) or [pattern]:
+            if scene.endswith((".ma", ".mb")):
+                scenes[os.path.abspath(scene)] = None
+    return list(scenes)
+
+
+def main(args: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("operation", choices=sorted(OPERATIONS))
+    parser.add_argument("scenes", nargs="*", help="Scene files or globs")
+    parser.add_argument("--list", help="Text file with one scene per line")
+    parser.add_argument(
+        "--mayapy",
+        default=os.environ.get("MAYAPY", "mayapy"),
+        help="Interpreter that runs each worker (default: $MAYAPY or mayapy)",
+    )
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--retries", type=int, default=1)
+    parser.add_argument("--timeout", type=float, help="Seconds per attempt")
+    parser.add_argument("--summary", help="Write the JSON summary here")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args(args)
+
+    if args.worker:
+        work(args.operation, args.scenes[0])
+        return 0
+
+    scenes = expandScenes(args.scenes, args.list)
+    summary = run(
+        scenes,
+        args.operation,
+        args.mayapy,
+        max(args.jobs, 1),
+        args.retries,
+        args.timeout,
+    )
+    for result in summary["scenes"]:
+        status = "ok" if result["succeeded"] else "FAILED"
+        print(f"{status:>6}  {result['seconds']:8.2f}s  {result['scene']}")
+    print(
+        f"{summary['succeeded']}/{len(scenes)} scenes in {summary['seconds']:.2f}s"
+    )
+
+    if args.summary:
+        with open(args.summary, "w") as f:
+            json.dump(summary, f, indent=2)
+    return 1 if summary["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
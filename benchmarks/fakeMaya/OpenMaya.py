@@ -0,0 +1,1049 @@
+"""maya.api.OpenMaya classes the tools use, over the in-memory scene"""
+
+import math
+import re
+from typing import Optional, Union
+
+import numpy as np
+
+from . import graph
+from .graph import Node, Path, scene
+
+
+class MFn:
+    kInvalid = 0
+    kDependencyNode = 4
+    kDagNode = 107
+    kTransform = 110
+    kShape = 248
+    kMesh = 296
+    kSet = 464
+    kShadingEngine = 320
+    kContainer = 1000
+
+
+_HAS_FN = {
+    MFn.kInvalid: lambda n: True,
+    MFn.kDependencyNode: lambda n: True,
+    MFn.kDagNode: lambda n: n.isDag,
+    MFn.kTransform: lambda n: n.type in graph.TRANSFORMS,
+    MFn.kShape: lambda n: n.type in graph.SHAPES,
+    MFn.kMesh: lambda n: n.type == "mesh",
+    MFn.kSet: lambda n: n.isType("objectSet"),
+    MFn.kShadingEngine: lambda n: n.type == "shadingEngine",
+    MFn.kContainer: lambda n: n.type in graph.CONTAINERS,
+}
+_TYPES = {
+    MFn.kShadingEngine: ("shadingEngine",),
+    MFn.kContainer: tuple(graph.CONTAINERS),
+    MFn.kMesh: ("mesh",),
+}
+
+
+class MSpace:
+    kInvalid = 0
+    kTransform = 1
+    kPreTransform = 2
+    kObject = 2
+    kPostTransform = 3
+    kWorld = 4
+
+
+class MObject:
+    kNullObj: "MObject"
+
+    def __init__(self, node: Optional[Node] = None) -> None:
+        self._node = node.node() if isinstance(node, MObject) else node
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, MObject) and other._node is self._node
+
+    def __ne__(self, other: object) -> bool:
+        return not self == other
+
+    def hasFn(self, fn: int) -> bool:
+        return self._node is not None and _HAS_FN[fn](self._node)
+
+    def isNull(self) -> bool:
+        return self._node is None
+
+    def apiTypeStr(self) -> str:
+        return self._node.type if self._node else "kInvalid"
+
+    def node(self) -> Optional[Node]:
+        return self._node
+
+
+MObject.kNullObj = MObject()
+
+
+def _node(obj: Union[MObject, "MDagPath", Node]) -> Node:
+    if isinstance(obj, MDagPath):
+        obj = obj.node()
+    if isinstance(obj, MObject):
+        obj = obj.node()
+    if obj is None:
+        raise RuntimeError("(kInvalidParameter): Object is incompatible")
+    return obj
+
+
+class MObjectHandle:
+    def __init__(self, obj: Optional[MObject] = None) -> None:
+        self._node = obj.node() if obj is not None else None
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, MObjectHandle):
+            return NotImplemented
+        return self._node is other._node
+
+    def __ne__(self, other: object) -> bool:
+        equal = self.__eq__(other)
+        return equal if equal is NotImplemented else not equal
+
+    def hashCode(self) -> int:
+        return id(self._node) & 0xFFFFFFFF
+
+    def isValid(self) -> bool:
+        return self._node is not None and self._node.alive
+
+    isAlive = isValid
+
+    def object(self) -> MObject:
+        return MObject(self._node)
+
+
+# Math
+
+
+class MMatrix:
+    kIdentity: "MMatrix"
+
+    def __init__(self, values=None) -> None:
+        if values is None:
+            self._m = np.identity(4)
+        elif isinstance(values, MMatrix):
+            self._m = values._m.copy()
+        else:
+            self._m = np.array(values, dtype=float).reshape(4, 4)
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}({self._m.ravel().tolist()})"
+
+    def __getitem__(self, index: int) -> float:
+        return float(self._m.flat[index])
+
+    def __setitem__(self, index: int, value: float) -> None:
+        self._m.flat[index] = value
+
+    def __len__(self) -> int:
+        return 16
+
+    def __mul__(self, other: "MMatrix") -> "MMatrix":
+        return MMatrix(self._m @ other._m)
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, MMatrix) and np.array_equal(self._m, other._m)
+
+    def getElement(self, row: int, column: int) -> float:
+        return float(self._m[row, column])
+
+    def setElement(self, row: int, column: int, value: float) -> None:
+        self._m[row, column] = value
+
+    def inverse(self) -> "MMatrix":
+        return MMatrix(np.linalg.inv(self._m))
+
+    def transpose(self) -> "MMatrix":
+        return MMatrix(self._m.T)
+
+    def isEquivalent(self, other: "MMatrix", tolerance: float = 1e-10) -> bool:
+        return bool(np.allclose(self._m, other._m, atol=tolerance))
+
+
+MMatrix.kIdentity = MMatrix()
+
+
+class MVector:
+    def __init__(self, *args) -> None:
+        if len(args) == 1:
+            args = tuple(args[0])
+        self.x, self.y, self.z = (list(map(float, args)) + [0.0] * 3)[:3]
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}({self.x}, {self.y}, {self.z})"
+
+    def __iter__(self):
+        return iter((self.x, self.y, self.z))
+
+    def __getitem__(self, index: int) -> float:
+        return (self.x, self.y, self.z)[index]
+
+    def __len__(self) -> int:
+        return 3
+
+    def length(self) -> float:
+        return math.sqrt(self.x**2 + self.y**2 + self.z**2)
+
+
+class MPoint(MVector):
+    w = 1.0
+
+
+class MBoundingBox:
+    def __init__(self, minimum=None, maximum=None) -> None:
+        self.min = MPoint(minimum or (0, 0, 0))
+        self.max = MPoint(maximum or (0, 0, 0))
+
+    @property
+    def width(self) -> float:
+        return self.max.x - self.min.x
+
+    @property
+    def height(self) -> float:
+        return self.max.y - self.min.y
+
+    @property
+    def depth(self) -> float:
+        return self.max.z - self.min.z
+
+    @property
+    def center(self) -> MPoint:
+        return MPoint((np.add(list(self.min), list(self.max)) / 2).tolist())
+
+
+class MEulerRotation:
+    kXYZ = 0
+
+    def __init__(self, *args) -> None:
+        if len(args) == 1:
+            args = tuple(args[0])
+        self.x, self.y, self.z = (list(map(float, args[:3])) + [0.0] * 3)[:3]
+        self.order = MEulerRotation.kXYZ
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}({self.x}, {self.y}, {self.z})"
+
+    def __iter__(self):
+        return iter((self.x, self.y, self.z))
+
+    def asMatrix(self) -> MMatrix:
+        matrix = np.identity(4)
+        matrix[:3, :3] = graph.rotationMatrix(self.x, self.y, self.z)
+        return MMatrix(matrix)
+
+
+class MTransformationMatrix:
+    def __init__(self, matrix: Optional[MMatrix] = None) -> None:
+        values = matrix._m if matrix is not None else np.identity(4)
+        self._t, self._r, self._s = graph.decompose(values)
+
+    def asMatrix(self) -> MMatrix:
+        return MMatrix(graph.compose(self._t, self._r, self._s))
+
+    def asMatrixInverse(self) -> MMatrix:
+        return self.asMatrix().inverse()
+
+    def translation(self, space: int = MSpace.kTransform) -> MVector:
+        return MVector(self._t.tolist())
+
+    def setTranslation(self, vector, space: int) -> "MTransformationMatrix":
+        self._t = np.array(list(vector), dtype=float)
+        return self
+
+    def rotation(self, asQuaternion: bool = False) -> MEulerRotation:
+        return MEulerRotation(self._r.tolist())
+
+    def setRotation(self, rotation: MEulerRotation) -> "MTransformationMatrix":
+        self._r = np.array(list(rotation), dtype=float)
+        return self
+
+    def scale(self, space: int = MSpace.kTransform) -> list[float]:
+        return self._s.tolist()
+
+    def setScale(self, scale, space: int) -> "MTransformationMatrix":
+        self._s = np.array(list(scale), dtype=float)
+        return self
+
+
+# Plugs and attributes
+
+
+class MPlug:
+    def __init__(
+        self, node: Optional[Node] = None, attribute: Optional[str] = None
+    ) -> None:
+        self._node = node
+        self._attribute = attribute
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}({self.name()!r})"
+
+    def __eq__(self, other: object) -> bool:
+        return (
+            isinstance(other, MPlug)
+            and other._node is self._node
+            and other._attribute == self._attribute
+        )
+
+    def __ne__(self, other: object) -> bool:
+        return not self == other
+
+    @property
+    def isNull(self) -> bool:
+        return self._node is None
+
+    @property
+    def isDestination(self) -> bool:
+        return self._attribute in self._node.inputs
+
+    @property
+    def isSource(self) -> bool:
+        return bool(self._node.outputs.get(self._attribute))
+
+    @property
+    def isConnected(self) -> bool:
+        return self.isDestination or self.isSource
+
+    @property
+    def isElement(self) -> bool:
+        return self._attribute.endswith("]")
+
+    def name(self) -> str:
+        return f"{self._node.name}.{self._attribute}"
+
+    def partialName(self, *_, **__) -> str:
+        return self._attribute
+
+    def node(self) -> MObject:
+        return MObject(self._node)
+
+    def source(self) -> "MPlug":
+        if connection := self._node.inputs.get(self._attribute):
+            return MPlug(*connection)
+        return MPlug()
+
+    def destinations(self) -> list["MPlug"]:
+        return [MPlug(*d) for d in self._node.outputs.get(self._attribute, ())]
+
+    def connectedTo(self, asDst: bool, asSrc: bool) -> list["MPlug"]:
+        plugs = [self.source()] if asDst and self.isDestination else []
+        return plugs + (self.destinations() if asSrc else [])
+
+    def elementByLogicalIndex(self, index: int) -> "MPlug":
+        return MPlug(self._node, f"{self._attribute}[{index}]")
+
+    def logicalIndex(self) -> int:
+        return int(re.search(r"\[(\d+)\]$", self._attribute).group(1))
+
+    def child(self, index: int) -> "MPlug":
+        axes = "RGB" if self._attribute.endswith("Color") else "XYZ"
+        return MPlug(self._node, f"{self._attribute}{axes[index]}")
+
+    def getExistingArrayAttributeIndices(self) -> list[int]:
+        return self._node.indices(self._attribute)
+
+    def numElements(self) -> int:
+        return len(self.getExistingArrayAttributeIndices())
+
+    def asDouble(self) -> float:
+        return float(scene.getValue(self._node, self._attribute))
+
+    def asInt(self) -> int:
+        return int(scene.getValue(self._node, self._attribute))
+
+    def asBool(self) -> bool:
+        return bool(scene.getValue(self._node, self._attribute))
+
+    def asString(self) -> str:
+        return str(scene.getValue(self._node, self._attribute) or "")
+
+    def _set(self, value) -> None:
+        scene.setValue(self._node, self._attribute, value)
+
+    setDouble = setInt = setBool = setString = _set
+
+
+class _Attribute:
+    """What MFnAttribute.create returns, with settings kept for addAttribute"""
+
+    def __init__(self, name: str, default: object = None) -> None:
+        self.name = name
+        self.default = default
+
+
+class MFnAttribute:
+    def __init__(self, attribute: Optional[_Attribute] = None) -> None:
+        self._attribute = attribute
+
+    def setMin(self, value) -> None:
+        pass
+
+    setMax = setSoftMin = setSoftMax = setDefault = setMin
+
+
+class MFnNumericData:
+    kBoolean = 1
+    kInt = 7
+    kFloat = 10
+    kDouble = 11
+    k3Double = 14
+
+
+class MFnNumericAttribute(MFnAttribute):
+    def create(
+        self, longName: str, shortName: str, type_: int, default: float = 0
+    ) -> _Attribute:
+        self._attribute = _Attribute(longName, default)
+        return self._attribute
+
+
+class MFnMessageAttribute(MFnAttribute):
+    def create(self, longName: str, shortName: str) -> _Attribute:
+        self._attribute = _Attribute(longName)
+        return self._attribute
+
+
+class MFnTypedAttribute(MFnAttribute):
+    def create(
+        self, longName: str, shortName: str, type_: int, default=None
+    ) -> _Attribute:
+        self._attribute = _Attribute(longName, default)
+        return self._attribute
+
+
+class MFnData:
+    kString = 4
+
+
+# Nodes and paths
+
+
+class MDagPath:
+    def __init__(self, other: Optional["MDagPath"] = None) -> None:
+        self._path: Path = other._path if other is not None else ()
+
+    @classmethod
+    def _of(cls, path: Path) -> "MDagPath":
+        result = cls()
+        result._path = path
+        return result
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}({self.fullPathName()!r})"
+
+    def __str__(self) -> str:
+        return self.partialPathName()
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, MDagPath) and other._path == self._path
+
+    @staticmethod
+    def getAPathTo(obj: MObject) -> "MDagPath":
+        return MDagPath._of(scene.defaultPath(_node(obj)))
+
+    @staticmethod
+    def getAllPathsTo(obj: MObject) -> list["MDagPath"]:
+        return [MDagPath._of(p) for p in scene.paths(_node(obj))]
+
+    def isValid(self) -> bool:
+        return bool(self._path) and all(n.alive for n in self._path)
+
+    def fullPathName(self) -> str:
+        return scene.fullName(self._path) if self._path else ""
+
+    def partialPathName(self) -> str:
+        return scene.partialName(self._path) if self._path else ""
+
+    def node(self) -> MObject:
+        return MObject(self._path[-1] if self._path else scene.world)
+
+    def transform(self) -> MObject:
+        for node in reversed(self._path):
+            if node.type in graph.TRANSFORMS:
+                return MObject(node)
+        return MObject(scene.world)
+
+    def hasFn(self, fn: int) -> bool:
+        return self.node().hasFn(fn)
+
+    def apiType(self) -> str:
+        return self.node().apiTypeStr()
+
+    def length(self) -> int:
+        return len(self._path)
+
+    def instanceNumber(self) -> int:
+        return scene.instanceNumber(self._path)
+
+    def pop(self, count: int = 1) -> "MDagPath":
+        self._path = self._path[:-count]
+        return self
+
+    def push(self, obj: MObject) -> "MDagPath":
+        self._path += (_node(obj),)
+        return self
+
+    def childCount(self) -> int:
+        return len(self.node().node().children)
+
+    def child(self, index: int) -> MObject:
+        return MObject(list(self.node().node().children)[index])
+
+    def numberOfShapesDirectlyBelow(self) -> int:
+        return len(self._shapes())
+
+    def extendToShape(self, index: int = 0) -> "MDagPath":
+        if self._path[-1].type not in graph.SHAPES:
+            shapes = self._shapes()
+            if index >= len(shapes):
+                raise RuntimeError("(kFailure): Object does not exist")
+            self._path += (shapes[index],)
+        return self
+
+    def _shapes(self) -> list[Node]:
+        return [c for c in self._path[-1].children if c.type in graph.SHAPES]
+
+    def inclusiveMatrix(self) -> MMatrix:
+        return MMatrix(scene.worldMatrix(self._path))
+
+    def exclusiveMatrix(self) -> MMatrix:
+        return MMatrix(scene.worldMatrix(self._path[:-1]))
+
+    def inclusiveMatrixInverse(self) -> MMatrix:
+        return self.inclusiveMatrix().inverse()
+
+    def exclusiveMatrixInverse(self) -> MMatrix:
+        return self.exclusiveMatrix().inverse()
+
+
+class MFnBase:
+    def __init__(self, obj: Union[MObject, MDagPath, None] = None) -> None:
+        self._path: Optional[MDagPath] = None
+        self._obj: Optional[Node] = None
+        if obj is not None:
+            self.setObject(obj)
+
+    def setObject(self, obj: Union[MObject, MDagPath]) -> None:
+        if isinstance(obj, MDagPath):
+            self._path = MDagPath(obj)
+        self._obj = _node(obj)
+
+    def object(self) -> MObject:
+        return MObject(self._obj)
+
+    def hasObj(self, obj: MObject) -> bool:
+        return obj.node() is not None
+
+
+class MFnDependencyNode(MFnBase):
+    def create(self, type_: str, name: Optional[str] = None) -> MObject:
+        self._obj = scene.create(type_, name)
+        return MObject(self._obj)
+
+    def name(self) -> str:
+        return self._obj.name
+
+    def absoluteName(self) -> str:
+        return f":{self._obj.name}"
+
+    def setName(self, name: str) -> str:
+        return scene.rename(self._obj, name)
+
+    @property
+    def typeName(self) -> str:
+        return self._obj.type
+
+    @property
+    def isDefaultNode(self) -> bool:
+        return self._obj.default
+
+    @property
+    def isFromReferencedFile(self) -> bool:
+        return self._obj.referenced
+
+    @property
+    def isLocked(self) -> bool:
+        return self._obj.locked
+
+    def hasAttribute(self, name: str) -> bool:
+        return self._obj.hasAttribute(name)
+
+    def findPlug(self, attribute: str, wantNetworked: bool = False) -> MPlug:
+        if not self._obj.hasAttribute(attribute):
+            raise RuntimeError("(kInvalidParameter): No element at given index")
+        return MPlug(self._obj, attribute)
+
+    def getConnections(self) -> list[MPlug]:
+        node = self._obj
+        plugs = dict.fromkeys(node.inputs)
+        plugs.update(dict.fromkeys(node.outputs))
+        return [MPlug(node, a) for a in plugs]
+
+
+class MFnDagNode(MFnDependencyNode):
+    kNextPos = 255
+
+    def addChild(
+        self,
+        child: MObject,
+        index: int = kNextPos,
+        keepExistingParents: bool = False,
+    ) -> MObject:
+        scene.parent(_node(child), self._obj, add=keepExistingParents)
+        return child
+
+    def removeChild(self, child: MObject) -> None:
+        node = _node(child)
+        node.parents.remove(self._obj)
+        self._obj.children.pop(node, None)
+
+    def getPath(self) -> MDagPath:
+        return MDagPath(self._path) if self._path else self.dagPath()
+
+    def dagPath(self) -> MDagPath:
+        return self._path or MDagPath.getAPathTo(MObject(self._obj))
+
+    def fullPathName(self) -> str:
+        return self.dagPath().fullPathName()
+
+    def partialPathName(self) -> str:
+        return self.dagPath().partialPathName()
+
+    def childCount(self) -> int:
+        return len(self._obj.children)
+
+    def child(self, index: int) -> MObject:
+        return MObject(list(self._obj.children)[index])
+
+    def parentCount(self) -> int:
+        return len(self._obj.parents)
+
+    def parent(self, index: int) -> MObject:
+        return MObject(self._obj.parents[index])
+
+    @property
+    def isIntermediateObject(self) -> bool:
+        return bool(self._obj.values.get("intermediateObject"))
+
+    @property
+    def boundingBox(self) -> MBoundingBox:
+        """Object space bounds, from each shape's `boundingBox` value"""
+        path = self.dagPath()._path
+        corners = []
+        for shape in scene.shapes(path):
+            lower, upper = shape[-1].values.get(
+                "boundingBox", ((-0.5,) * 3, (0.5,) * 3)
+            )
+            matrix = scene.worldMatrix(shape[len(path) :])
+            for corner in np.array(np.meshgrid(*zip(lower, upper))).T.reshape(
+                -1, 3
+            ):
+                corners.append((np.append(corner, 1) @ matrix)[:3])
+        if not corners:
+            return MBoundingBox()
+        corners = np.array(corners)
+        return MBoundingBox(
+            corners.min(axis=0).tolist(), corners.max(axis=0).tolist()
+        )
+
+
+class MFnTransform(MFnDagNode):
+    def scale(self) -> list[float]:
+        return [float(scene.getValue(self._obj, f"scale{a}")) for a in "XYZ"]
+
+    def transformation(self) -> MTransformationMatrix:
+        return MTransformationMatrix(MMatrix(scene.localMatrix(self._obj)))
+
+    def translation(self, space: int) -> MVector:
+        return self.transformation().translation(space)
+
+    def rotation(self, space: int = MSpace.kTransform, asQuaternion=False):
+        return self.transformation().rotation()
+
+    def setTransformation(self, transformation: MTransformationMatrix) -> None:
+        scene.setLocalMatrix(self._obj, transformation.asMatrix()._m)
+
+
+class MFnSet(MFnDependencyNode):
+    def getMembers(self, flatten: bool) -> "MSelectionList":
+        selection = MSelectionList()
+        for path in scene.members(self._obj):
+            selection.add(MDagPath._of(path))
+        return selection
+
+    def isMember(self, item: Union[MDagPath, MObject]) -> bool:
+        if isinstance(item, MDagPath):
+            return scene.isMember(self._obj, item._path)
+        node = _node(item)
+        return any(scene.isMember(self._obj, p) for p in scene.paths(node))
+
+
+class MFnContainerNode(MFnDependencyNode):
+    def getMembers(self) -> list[MObject]:
+        return [MObject(n) for n in self._obj.members]
+
+
+# Selection
+
+
+class MSelectionList:
+    def __init__(self, other: Optional["MSelectionList"] = None) -> None:
+        self._items: list = list(other._items) if other is not None else []
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}({self.getSelectionStrings()})"
+
+    def add(self, item, mergeWithExisting: bool = True) -> "MSelectionList":
+        if isinstance(item, MDagPath):
+            self._items.append((item._path[-1], item._path, None))
+        elif isinstance(item, MObject):
+            node = _node(item)
+            path = scene.defaultPath(node) if node.isDag else None
+            self._items.append((node, path, None))
+        elif isinstance(item, MPlug):
+            self._items.append((item._node, None, item._attribute))
+        else:
+            self._addName(str(item))
+        return self
+
+    def _addName(self, name: str) -> None:
+        node, _, attribute = name.partition(".")
+        matches = scene.match(node)
+        if not matches:
+            raise RuntimeError("(kInvalidParameter): Object does not exist")
+        for node, path in matches:
+            if attribute and not node.hasAttribute(attribute):
+                raise RuntimeError("(kInvalidParameter): Object does not exist")
+            self._items.append((node, path, attribute or None))
+
+    def length(self) -> int:
+        return len(self._items)
+
+    def isEmpty(self) -> bool:
+        return not self._items
+
+    def clear(self) -> "MSelectionList":
+        self._items.clear()
+        return self
+
+    def getDependNode(self, index: int) -> MObject:
+        return MObject(self._items[index][0])
+
+    def getDagPath(self, index: int) -> MDagPath:
+        node, path, _ = self._items[index]
+        if path is None:
+            raise TypeError("item is not a DAG path")
+        return MDagPath._of(path)
+
+    def getPlug(self, index: int) -> MPlug:
+        node, _, attribute = self._items[index]
+        if attribute is None:
+            raise TypeError("item is not a plug")
+        return MPlug(node, attribute)
+
+    def getSelectionStrings(self) -> list[str]:
+        return [
+            (scene.partialName(p) if p else n.name) + (f".{a}" if a else "")
+            for n, p, a in self._items
+        ]
+
+
+class MGlobal:
+    @staticmethod
+    def getSelectionListByName(name: str) -> MSelectionList:
+        return MSelectionList().add(name)
+
+    @staticmethod
+    def getActiveSelectionList() -> MSelectionList:
+        selection = MSelectionList()
+        selection._items = [(n, p, None) for n, p in scene.selection]
+        return selection
+
+    @staticmethod
+    def setActiveSelectionList(selection: MSelectionList) -> None:
+        scene.selection = [(n, p) for n, p, _ in selection._items]
+
+    @staticmethod
+    def displayWarning(message: str) -> None:
+        print(f"# Warning: {message}")
+
+
+# Iterators
+
+
+class MItDependencyNodes:
+    def __init__(self, filter_: int = MFn.kInvalid) -> None:
+        if filter_ in _TYPES:
+            nodes = scene.ofType(_TYPES[filter_])
+        else:
+            nodes = [n for n in scene.nodes.values() if _HAS_FN[filter_](n)]
+        self._nodes = nodes
+        self._index = 0
+
+    def isDone(self) -> bool:
+        return self._index >= len(self._nodes)
+
+    def next(self) -> None:
+        self._index += 1
+
+    def thisNode(self) -> MObject:
+        return MObject(self._nodes[self._index])
+
+
+class MItDag:
+    kDepthFirst = 1
+    kBreadthFirst = 2
+
+    def __init__(
+        self, traversal: int = kDepthFirst, filter_: int = MFn.kInvalid
+    ) -> None:
+        self._root: Path = ()
+        self._filter = filter_
+        self._paths: Optional[list[Path]] = None  # Found on first use
+        self._index = 0
+
+    def reset(
+        self,
+        root: Union[MDagPath, MObject, None] = None,
+        traversal: int = kDepthFirst,
+        filter_: int = MFn.kInvalid,
+    ) -> None:
+        if isinstance(root, MDagPath):
+            self._root = root._path
+        elif root is None or root.node() is scene.world:
+            self._root = ()
+        else:
+            self._root = scene.defaultPath(_node(root))
+        self._filter = filter_
+        self._paths = None
+        self._index = 0
+
+    @property
+    def _found(self) -> list[Path]:
+        if self._paths is None:
+            if self._root:
+                paths = scene.descendants(self._root)
+            else:
+                paths = [
+                    p
+                    for c in scene.world.children
+                    for p in scene.descendants((c,))
+                ]
+            hasFn = _HAS_FN[self._filter]
+            self._paths = [p for p in paths if hasFn(p[-1])]
+        return self._paths
+
+    def isDone(self) -> bool:
+        return self._index >= len(self._found)
+
+    def next(self) -> None:
+        self._index += 1
+
+    def currentItem(self) -> MObject:
+        return MObject(self._found[self._index][-1])
+
+    def getPath(self) -> MDagPath:
+        return MDagPath._of(self._found[self._index])
+
+    def fullPathName(self) -> str:
+        return scene.fullName(self._found[self._index])
+
+    def depth(self) -> int:
+        return len(self._found[self._index])
+
+
+# Modifiers
+
+
+class MDGModifier:
+    """Operations queued until `doIt`, run in order"""
+
+    def __init__(self) -> None:
+        self._queue: list = []
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}()"
+
+    def doIt(self) -> None:
+        queue, self._queue = self._queue, []
+        for operation, *args in queue:
+            operation(*args)
+
+    def undoIt(self) -> None:
+        raise NotImplementedError("The fake scene has no undo")
+
+    def createNode(self, type_: str) -> MObject:
+        node = scene.new(type_)
+        self._queue.append((scene.add, node))
+        return MObject(node)
+
+    def renameNode(self, obj: MObject, name: str) -> None:
+        self._queue.append((scene.rename, _node(obj), name))
+
+    def deleteNode(self, obj: MObject) -> None:
+        self._queue.append((lambda n: scene.delete([n]), _node(obj)))
+
+    def addAttribute(self, obj: MObject, attribute: _Attribute) -> None:
+        self._queue.append((_addAttribute, _node(obj), attribute))
+
+    def connect(self, source: MPlug, destination: MPlug) -> None:
+        self._queue.append(
+            (
+                scene.connect,
+                source._node,
+                source._attribute,
+                destination._node,
+                destination._attribute,
+            )
+        )
+
+    def disconnect(self, source: MPlug, destination: MPlug) -> None:
+        self._queue.append(
+            (
+                scene.disconnect,
+                source._node,
+                source._attribute,
+                destination._node,
+                destination._attribute,
+            )
+        )
+
+    def _newValue(self, plug: MPlug, value) -> None:
+        self._queue.append((scene.setValue, plug._node, plug._attribute, value))
+
+    newPlugValue = newPlugValueBool = newPlugValueInt = _newValue
+    newPlugValueDouble = newPlugValueFloat = newPlugValueString = _newValue
+
+    def commandToExecute(self, command: str) -> None:
+        from . import cmds
+
+        self._queue.append((cmds.mel, command))
+
+    def pythonCommandToExecute(self, command: str) -> None:
+        self._queue.append((exec, command, {}))
+
+
+class MDagModifier(MDGModifier):
+    def createNode(
+        self, type_: str, parent: MObject = MObject.kNullObj
+    ) -> MObject:
+        node = scene.new(type_)
+        parent = parent.node() if isinstance(parent, MObject) else None
+        self._queue.append((scene.add, node, parent))
+        return MObject(node)
+
+    def reparentNode(
+        self, obj: MObject, parent: MObject = MObject.kNullObj
+    ) -> None:
+        self._queue.append(
+            (scene.parent, _node(obj), parent.node() or scene.world)
+        )
+
+
+def _addAttribute(node: Node, attribute: _Attribute) -> None:
+    if attribute.name in node.attributes:
+        raise RuntimeError(f"{node.name} already has {attribute.name}")
+    node.attributes[attribute.name] = attribute.default
+
+
+# Messages
+
+
+class MMessage:
+    @staticmethod
+    def removeCallback(id: int) -> None:
+        if entry := scene.callbacks.pop(id, None):
+            node, kind = entry
+            node.callbacks.get(kind, {}).pop(id, None)
+
+    @staticmethod
+    def removeCallbacks(ids: list[int]) -> None:
+        for id in ids:
+            MMessage.removeCallback(id)
+
+
+class MNodeMessage(MMessage):
+    kConnectionMade = 0x01
+    kConnectionBroken = 0x02
+    kAttributeSet = 0x08
+    kIncomingDirection = 0x800
+    kOtherPlugSet = 0x4000
+
+    @staticmethod
+    def _add(obj: MObject, kind: str, callback) -> int:
+        node = _node(obj)
+        id = next(scene.ids)
+        node.callbacks.setdefault(kind, {})[id] = callback
+        scene.callbacks[id] = (node, kind)
+        return id
+
+    @staticmethod
+    def addAttributeChangedCallback(obj: MObject, function, clientData=None):
+        def changed(change, node, attribute, other, otherAttribute) -> None:
+            message = {
+                "made": MNodeMessage.kConnectionMade
+                | MNodeMessage.kOtherPlugSet,
+                "broken": MNodeMessage.kConnectionBroken
+                | MNodeMessage.kOtherPlugSet,
+                "set": MNodeMessage.kAttributeSet,
+            }[change]
+            if other is not None and node.inputs.get(attribute, ())[:1] == (
+                other,
+            ):
+                message |= MNodeMessage.kIncomingDirection
+            function(
+                message,
+                MPlug(node, attribute),
+                MPlug(other, otherAttribute),
+                clientData,
+            )
+
+        return MNodeMessage._add(obj, "attributeChanged", changed)
+
+    @staticmethod
+    def addNameChangedCallback(obj: MObject, function, clientData=None):
+        return MNodeMessage._add(
+            obj,
+            "nameChanged",
+            lambda node, previous: function(
+                MObject(node), previous, clientData
+            ),
+        )
+
+    @staticmethod
+    def addNodePreRemovalCallback(obj: MObject, function, clientData=None):
+        return MNodeMessage._add(
+            obj,
+            "preRemoval",
+            lambda node: function(MObject(node), clientData),
+        )
+
+
+# Plug-ins
+
+
+class MPxCommand:
+    def __init__(self) -> None:
+        pass
+
+
+class MArgList(list):
+    pass
+
+
+class MFnPlugin:
+    def __init__(self, obj: Optional[MObject] = None, *_, **__) -> None:
+        pass
+
+    def registerCommand(self, name: str, creator) -> None:
+        from . import cmds
+
+        def command(*_, **__):
+            creator().doIt(MArgList())
+
+        setattr(cmds, name, command)
+
+    def deregisterCommand(self, name: str) -> None:
+        from . import cmds
+
+        delattr(cmds, name)
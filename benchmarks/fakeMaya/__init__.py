@@ -0,0 +1,43 @@
+"""In-memory stand-in for the parts of Maya these tools use
+
+Enough of maya.cmds and OpenMaya to run the tools' graph work on a plain
+Linux box: nodes and DAG paths, message attributes and connections, shading
+group membership, containers, `ls` with namespace wildcards, `xform`, and
+modifiers. Nothing is evaluated, rendered, or undoable.
+
+    import fakeMaya
+    fakeMaya.install()  # Before importing any of the tools
+    fakeMaya.reset()  # New, empty scene
+"""
+
+import sys
+import types
+
+from . import cmds, OpenMaya
+from .graph import scene
+
+__all__ = ["install", "reset", "scene", "cmds", "OpenMaya"]
+
+
+def install() -> None:
+    """Register the fake modules as maya, maya.cmds, and maya.api.OpenMaya"""
+    maya = types.ModuleType("maya")
+    api = types.ModuleType("maya.api")
+    mel = types.ModuleType("maya.mel")
+    mel.eval = cmds.mel
+    maya.cmds, maya.api, maya.mel = cmds, api, mel
+    api.OpenMaya = OpenMaya
+    sys.modules.update(
+        {
+            "maya": maya,
+            "maya.cmds": cmds,
+            "maya.mel": mel,
+            "maya.api": api,
+            "maya.api.OpenMaya": OpenMaya,
+        }
+    )
+
+
+def reset() -> None:
+    """Start a new scene, dropping every node, callback, and plug-in"""
+    scene.reset()
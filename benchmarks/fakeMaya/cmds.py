@@ -0,0 +1,569 @@
+"""maya.cmds commands the tools use, over the in-memory scene
+
+Commands take Maya's long flag names. UI commands only remember the flags
+they were created or edited with, so queries return what was set.
+"""
+
+import importlib.util
+import math
+import os
+import re
+import sys
+import tempfile
+from typing import Optional
+
+import numpy as np
+
+from . import graph
+from .graph import Node, Path, scene
+
+# {MEL flag: (Python flag, number of arguments)}, for `commandToExecute`
+MEL_FLAGS = {
+    "-e": ("edit", 0),
+    "-edit": ("edit", 0),
+    "-q": ("query", 0),
+    "-query": ("query", 0),
+    "-f": ("force", 0),
+    "-force": ("force", 0),
+    "-fe": ("forceElement", 1),
+    "-forceElement": ("forceElement", 1),
+    "-an": ("addNode", 1),
+    "-addNode": ("addNode", 1),
+    "-pb": ("publishAndBind", 2),
+    "-publishAndBind": ("publishAndBind", 2),
+    "-add": ("addObject", 0),
+    "-addObject": ("addObject", 0),
+    "-s": ("shape", 0),
+    "-shape": ("shape", 0),
+    "-r": ("relative", 0),
+    "-relative": ("relative", 0),
+    "-nc": ("noConnections", 0),
+    "-noConnections": ("noConnections", 0),
+    "-type": ("type", 1),
+}
+REPEATABLE = {"addNode"}
+_TOKEN = re.compile(r'"([^"]*)"|(\S+)')
+ROTATIONS = {"rotateX", "rotateY", "rotateZ"}
+
+
+def mel(command: str) -> object:
+    """Run a MEL command by translating it into a call of this module"""
+    name, *tokens = [
+        quoted or bare for quoted, bare in _TOKEN.findall(command.rstrip(";"))
+    ]
+    args, flags = [], {}
+    tokens = iter(tokens)
+    for token in tokens:
+        if token not in MEL_FLAGS:
+            args.append(token)
+            continue
+        flag, count = MEL_FLAGS[token]
+        values = [next(tokens) for _ in range(count)]
+        value = True if not count else values[0] if count == 1 else values
+        if flag in REPEATABLE:
+            flags.setdefault(flag, []).append(value)
+        else:
+            flags[flag] = value
+    return globals()[name](*args, **flags)
+
+
+def _flatten(args) -> list[str]:
+    result = []
+    for arg in args:
+        if isinstance(arg, (list, tuple, set)):
+            result.extend(_flatten(arg))
+        elif arg is not None:
+            result.append(str(arg))
+    return result
+
+
+def _resolve(name) -> tuple[Node, Optional[Path]]:
+    return scene.resolve(str(name))
+
+
+def _items(args) -> list[tuple[Node, Optional[Path]]]:
+    return [_resolve(a) for a in _flatten(args)]
+
+
+def _plug(name: str) -> tuple[Node, str]:
+    node, _, attribute = str(name).partition(".")
+    node = _resolve(node)[0]
+    if not attribute or not node.hasAttribute(attribute):
+        raise ValueError(f"No object matches name: {name}")
+    return node, attribute
+
+
+def _name(node: Node, path: Optional[Path], long: bool = False) -> str:
+    if path:
+        return scene.fullName(path) if long else scene.partialName(path)
+    return node.name
+
+
+# Scene queries
+
+
+def ls(*args, **flags) -> list[str]:
+    if flags.get("selection"):
+        items = list(scene.selection)
+    elif names := _flatten(args):
+        items = [m for n in names for m in scene.match(n)]
+    elif "type" in flags:
+        types = flags["type"]
+        types = [types] if isinstance(types, str) else types
+        items = [
+            (n, scene.defaultPath(n) if n.isDag else None)
+            for n in scene.ofType(types)
+        ]
+    else:
+        items = [
+            (n, scene.defaultPath(n) if n.isDag else None)
+            for n in scene.nodes.values()
+        ]
+
+    if "type" in flags:
+        types = flags["type"]
+        types = [types] if isinstance(types, str) else types
+        items = [i for i in items if any(i[0].isType(t) for t in types)]
+    if flags.get("transforms"):
+        items = [i for i in items if i[0].type in graph.TRANSFORMS]
+    if flags.get("shapes"):
+        items = [i for i in items if i[0].type in graph.SHAPES]
+    if flags.get("cameras"):
+        items = [i for i in items if i[0].type == "camera"]
+    if flags.get("materials"):
+        items = [i for i in items if i[0].type in graph.MATERIALS]
+    if flags.get("dag"):
+        items = [i for i in items if i[0].isDag]
+    if flags.get("noIntermediate"):
+        items = [i for i in items if not i[0].values.get("intermediateObject")]
+
+    long = flags.get("long", False)
+    return list(dict.fromkeys(_name(n, p, long) for n, p in items))
+
+
+def objExists(name) -> bool:
+    node, _, attribute = str(name).partition(".")
+    node = scene.find(node)
+    return node is not None and (not attribute or node.hasAttribute(attribute))
+
+
+def objectType(name, isType: Optional[str] = None, **_):
+    node = _resolve(name)[0]
+    if isType is not None:
+        return node.isType(isType)
+    return node.type
+
+
+def nodeType(name, **_) -> str:
+    return _resolve(str(name).partition(".")[0])[0].type
+
+
+def listRelatives(*args, **flags) -> Optional[list[str]]:
+    long = flags.get("fullPath") or flags.get("path")
+    result = []
+    for node, path in _items(args):
+        if flags.get("parent"):
+            for parent in node.parents:
+                if parent is not scene.world:
+                    result.append(_name(parent, path[:-1], long))
+            continue
+        if flags.get("allDescendents"):
+            paths = scene.descendants(path)[1:]
+            paths.reverse()  # Maya lists the deepest first
+        else:
+            paths = [path + (c,) for c in node.children]
+        for p in paths:
+            child = p[-1]
+            if flags.get("shapes") and child.type not in graph.SHAPES:
+                continue
+            if (type_ := flags.get("type")) and not child.isType(type_):
+                continue
+            if flags.get("noIntermediate") and child.values.get(
+                "intermediateObject"
+            ):
+                continue
+            result.append(_name(child, p, long))
+    return result or None
+
+
+def listConnections(target=None, **flags) -> Optional[list[str]]:
+    if target is None:
+        return None
+    sources = flags.get("source", True)
+    destinations = flags.get("destination", True)
+    node, _, attribute = str(target).partition(".")
+    node = _resolve(node)[0]
+
+    def wanted(plug: str) -> bool:
+        return (
+            not attribute
+            or plug == attribute
+            or plug.startswith((f"{attribute}[", f"{attribute}."))
+        )
+
+    connections = []
+    if sources:
+        for plug, other in node.inputs.items():
+            if wanted(plug):
+                connections.append((plug, other))
+    if destinations:
+        for plug, others in node.outputs.items():
+            if wanted(plug):
+                connections.extend((plug, o) for o in others)
+
+    result = []
+    for plug, (other, otherPlug) in connections:
+        if (type_ := flags.get("type")) and not other.isType(type_):
+            continue
+        if flags.get("connections"):
+            result.append(f"{node.name}.{plug}")
+        result.append(
+            f"{other.name}.{otherPlug}" if flags.get("plugs") else other.name
+        )
+    return result or None
+
+
+def isConnected(source: str, destination: str, **_) -> bool:
+    source = _plug(source)
+    node, attribute = _plug(destination)
+    return node.inputs.get(attribute) == source
+
+
+def attributeQuery(attribute: str, node: str = None, **flags):
+    node = _resolve(node)[0]
+    if flags.get("exists"):
+        return node.hasAttribute(attribute)
+    if flags.get("listChildren"):
+        return [f"{attribute}{a}" for a in "XYZ"]
+    return None
+
+
+def referenceQuery(name, **flags):
+    node = _resolve(str(name).partition(".")[0])[0]
+    if flags.get("isNodeReferenced"):
+        return node.referenced
+    return None
+
+
+def getAttr(name: str, **flags):
+    node, attribute = _plug(name)
+    if attribute in ("translate", "rotate", "scale"):
+        return [tuple(getAttr(f"{name}{a}") for a in "XYZ")]
+    value = scene.getValue(node, attribute)
+    if attribute in ROTATIONS:
+        value = math.degrees(value)
+    return value
+
+
+def setAttr(name: str, *values, **flags) -> None:
+    node, attribute = _plug(name)
+    if node.locked or flags.get("lock") is not None:
+        node.locked = bool(flags.get("lock", node.locked))
+        if not values:
+            return
+    if attribute in ("translate", "rotate", "scale") and len(values) == 3:
+        for axis, value in zip("XYZ", values):
+            setAttr(f"{name}{axis}", value)
+        return
+    value = values[0] if len(values) == 1 else tuple(values)
+    if attribute in ROTATIONS:
+        value = math.radians(value)
+    scene.setValue(node, attribute, value)
+
+
+def addAttr(*args, **flags) -> None:
+    targets = _items(args) or list(scene.selection)
+    name = flags.get("longName") or flags.get("shortName")
+    for node, _ in targets:
+        if name in node.attributes:
+            raise RuntimeError(f"Found attribute name '{name}' on {node.name}")
+        node.attributes[name] = flags.get("defaultValue")
+
+
+# Connections
+
+
+def connectAttr(source: str, destination: str, force: bool = False, **_):
+    scene.connect(*_plug(source), *_plug(destination), force=force)
+
+
+def disconnectAttr(source: str, destination: str, **_) -> None:
+    scene.disconnect(*_plug(source), *_plug(destination))
+
+
+# Creation and deletion
+
+
+def createNode(type_: str, name: Optional[str] = None, parent=None, **_):
+    parentNode = _resolve(parent)[0] if parent else None
+    if type_ in graph.SHAPES and parentNode is None:
+        parentNode = scene.create("transform", f"{type_}1")
+    return scene.create(type_, name, parentNode).name
+
+
+LISTS = {
+    "asShader": ("defaultShaderList1", "shaders"),
+    "asTexture": ("defaultTextureList1", "textures"),
+    "asUtility": ("defaultRenderUtilityList1", "utilities"),
+}
+
+
+def shadingNode(type_: str, name: Optional[str] = None, **flags) -> str:
+    node = scene.create(type_, name)
+    for flag, (array, attribute) in LISTS.items():
+        if flags.get(flag):
+            scene.append(node, "message", array, attribute)
+    return node.name
+
+
+def group(*args, **flags) -> str:
+    parent = _resolve(flags["parent"])[0] if flags.get("parent") else None
+    node = scene.create("transform", flags.get("name", "group1"), parent)
+    for child, _ in _items(args):
+        scene.parent(child, node)
+    return node.name
+
+
+def parent(*args, **flags) -> list[str]:
+    names = _flatten(args)
+    if flags.get("world"):
+        destination = scene.world
+        children = names
+    else:
+        *children, destination = names
+        destination = _resolve(destination)[0]
+    result = []
+    for node, path in _items(children):
+        scene.parent(node, destination, add=flags.get("addObject", False))
+        result.append(node.name)
+    return result
+
+
+def delete(*args, **_) -> None:
+    scene.delete([n for n, _ in _items(args)])
+
+
+def rename(old, new: str, **_) -> str:
+    return scene.rename(_resolve(old)[0], new)
+
+
+# Selection and sets
+
+
+def select(*args, **flags) -> None:
+    if flags.get("clear"):
+        scene.selection = []
+        return
+    items = _items(args)
+    if flags.get("add") or flags.get("toggle"):
+        scene.selection.extend(i for i in items if i not in scene.selection)
+    elif flags.get("deselect"):
+        scene.selection = [s for s in scene.selection if s not in items]
+    else:
+        scene.selection = items
+
+
+def sets(*args, **flags):
+    if flags.get("query"):
+        sg = _resolve(_flatten(args)[0])[0]
+        return [scene.partialName(p) for p in scene.members(sg)] or None
+    if flags.get("edit"):
+        if "forceElement" in flags:
+            sg = _resolve(flags["forceElement"])[0]
+            scene.forceElement(sg, _items(args))
+        return None
+
+    type_ = "shadingEngine" if flags.get("renderable") else "objectSet"
+    node = scene.create(type_, flags.get("name", f"{type_}1"))
+    if type_ == "shadingEngine":
+        scene.append(node, "message", "renderPartition", "sets")
+    if not flags.get("empty"):
+        scene.forceElement(node, _items(args) or list(scene.selection))
+    return node.name
+
+
+def hyperShade(*_, assign: Optional[str] = None, **__) -> None:
+    if assign:
+        scene.forceElement(_resolve(assign)[0], list(scene.selection))
+
+
+def container(*args, **flags):
+    if "name" in flags and not args:
+        node = scene.create("container", flags["name"])
+        if "addNode" in flags:
+            container(node.name, edit=True, addNode=flags["addNode"])
+        return node.name
+
+    node = _resolve(_flatten(args)[0])[0]
+    if flags.get("query"):
+        if flags.get("nodeList"):
+            return [m.name for m in node.members] or None
+        if flags.get("publishName"):
+            return list(node.published) or None
+        return None
+
+    if "addNode" in flags:
+        for member, _ in _items(flags["addNode"]):
+            if (other := scene.containers.get(member)) not in (None, node):
+                if not flags.get("force"):
+                    raise RuntimeError(f"{member.name} is in {other.name}")
+                other.members.pop(member, None)
+            node.members[member] = None
+            scene.containers[member] = node
+    if "publishAndBind" in flags:
+        plug, name = flags["publishAndBind"]
+        node.published[name] = _plug(plug)
+    return None
+
+
+# Plug-ins and environment
+
+
+def pluginInfo(name: str, query: bool = False, loaded: bool = False, **_):
+    return name in scene.plugins or os.path.basename(name) in scene.plugins
+
+
+def loadPlugin(name: str, quiet: bool = False, **_) -> list[str]:
+    if pluginInfo(name):
+        return []
+    if name.endswith(".py") and os.path.isfile(name):
+        from .OpenMaya import MObject
+
+        stem = os.path.splitext(os.path.basename(name))[0]
+        spec = importlib.util.spec_from_file_location(f"_plugin_{stem}", name)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        module.initializePlugin(MObject())
+    scene.plugins.update((name, os.path.basename(name)))
+    return [name]
+
+
+def warning(message: str, **_) -> None:
+    print(f"# Warning: {message}", file=sys.stderr)
+
+
+def about(**flags):
+    return True if flags.get("batch") else "2023"
+
+
+def workspace(*_, **flags):
+    if flags.get("rootDirectory"):
+        return tempfile.gettempdir()
+    return None
+
+
+def internalVar(**flags) -> str:
+    return tempfile.gettempdir() + "/"
+
+
+def currentTime(*args, **flags):
+    if args:
+        scene.time = float(args[0])
+    return scene.time
+
+
+def playbackOptions(**flags):
+    return 1.0 if flags.get("minTime") else 24.0
+
+
+def undoInfo(**_) -> None:
+    pass
+
+
+def refresh(**_) -> None:
+    pass
+
+
+def xform(*args, **flags):
+    node, path = _items(args)[0]
+    world = flags.get("worldSpace", False)
+    local = scene.localMatrix(node)
+    parentMatrix = scene.worldMatrix(path[:-1])
+    matrix = local @ parentMatrix if world else local
+
+    if flags.get("query"):
+        translate, rotate, scale = graph.decompose(matrix)
+        if flags.get("matrix"):
+            return matrix.ravel().tolist()
+        if flags.get("translation"):
+            return translate.tolist()
+        if flags.get("rotation"):
+            return np.degrees(rotate).tolist()
+        if flags.get("scale"):
+            return scale.tolist()
+        return None
+
+    if (values := flags.get("matrix")) is not None:
+        matrix = np.array(values, dtype=float).reshape(4, 4)
+    else:
+        translate, rotate, scale = graph.decompose(matrix)
+        if (values := flags.get("translation")) is not None:
+            translate = np.array(values, dtype=float)
+        if (values := flags.get("rotation")) is not None:
+            rotate = np.radians(values)
+        if (values := flags.get("scale")) is not None:
+            scale = np.array(values, dtype=float)
+        matrix = graph.compose(translate, rotate, scale)
+    if world:
+        matrix = matrix @ np.linalg.inv(parentMatrix)
+    scene.setLocalMatrix(node, matrix)
+    return None
+
+
+# UI
+
+
+def _control(kind: str):
+    def control(name: Optional[str] = None, *_, **flags):
+        if flags.get("exists"):
+            return name in scene.ui
+        if flags.get("query"):
+            queried = [
+                f for f, v in flags.items() if v is True and f != "query"
+            ]
+            values = scene.ui.get(name, {})
+            return values.get(queried[0], "") if queried else None
+        if flags.get("edit"):
+            scene.ui.setdefault(name, {}).update(flags)
+            return None
+        name = name or f"{kind}{len(scene.ui) + 1}"
+        scene.ui[name] = dict(flags)
+        return name
+
+    control.__name__ = kind
+    return control
+
+
+for _kind in (
+    "window",
+    "formLayout",
+    "scrollLayout",
+    "frameLayout",
+    "columnLayout",
+    "rowLayout",
+    "textField",
+    "text",
+    "separator",
+    "helpLine",
+    "button",
+    "checkBox",
+    "outlinerEditor",
+):
+    globals()[_kind] = _control(_kind)
+
+
+def deleteUI(*names, **_) -> None:
+    for name in _flatten(names):
+        scene.ui.pop(name, None)
+
+
+def showWindow(*_) -> None:
+    pass
+
+
+def setParent(*_, **__) -> None:
+    pass
+
+
+def getPanel(**_) -> list[str]:
+    return []
@@ -0,0 +1,645 @@
+"""The in-memory scene: nodes, DAG hierarchy, attributes, and connections
+
+Node names are unique across the whole scene, a simplification of Maya's
+per-parent uniqueness that the tools never depend on. Attributes exist on
+every node unless they are ones the tools add themselves (`DYNAMIC`), so
+static attributes don't have to be declared per node type.
+"""
+
+import fnmatch
+import itertools
+import re
+from typing import Callable, Iterable, Optional
+
+import numpy as np
+
+TRANSFORMS = {"transform", "joint"}
+SHAPES = {
+    "mesh",
+    "nurbsSurface",
+    "nurbsCurve",
+    "locator",
+    "camera",
+    "gpuCache",
+    "aiStandIn",
+    "particle",
+}
+MATERIALS = {
+    "aiToon",
+    "aiLambert",
+    "aiFlat",
+    "aiStandardSurface",
+    "aiRampRgb",
+    "aiCellNoise",
+    "lambert",
+    "standardSurface",
+    "surfaceShader",
+}
+CONTAINERS = {"container", "dagContainer"}
+
+# Abstract types each concrete type also matches in `ls -type`/`isType`
+INHERITED = {
+    **{t: ("shape", "dagNode") for t in SHAPES},
+    "mesh": ("surfaceShape", "deformableShape", "shape", "dagNode"),
+    "nurbsSurface": ("surfaceShape", "deformableShape", "shape", "dagNode"),
+    "transform": ("dagNode",),
+    "joint": ("transform", "dagNode"),
+    "shadingEngine": ("objectSet",),
+}
+
+# Attributes the tools add with addAttr or publish on containers
+DYNAMIC = {
+    "model",
+    "members",
+    "multiplier",
+    "container",
+    "shadingEngine",
+    "aiLambert",
+    "aiToon",
+    "aiImage",
+    "aiRange",
+    "aiMultiply",
+    "aiCellNoise",
+    "texture",
+    "lineThickness",
+    "lineColor",
+    "linePriority",
+    "renderProfile",
+    "settingsFingerprint",
+    "rotationPP",
+    "rotationPP0",
+    "scalePP",
+    "scalePP0",
+}
+
+DEFAULT_VALUES = {
+    "scaleX": 1.0,
+    "scaleY": 1.0,
+    "scaleZ": 1.0,
+    "visibility": True,
+    "filename": "",
+    "fileTextureName": "",
+    "imageFilePrefix": "",
+}
+
+DEFAULT_NODES = (
+    ("renderPartition", "partition"),
+    ("defaultShaderList1", "defaultShaderList"),
+    ("defaultTextureList1", "defaultTextureList"),
+    ("defaultRenderUtilityList1", "defaultRenderUtilityList"),
+    ("lambert1", "lambert"),
+    ("initialShadingGroup", "shadingEngine"),
+    ("initialParticleSE", "shadingEngine"),
+    ("defaultRenderGlobals", "renderGlobals"),
+    ("defaultResolution", "resolution"),
+    ("time1", "time"),
+)
+CAMERAS = ("persp", "top", "front", "side")
+
+_ELEMENT = re.compile(r"^(\w+)\[(\d+)\]")
+
+
+class Node:
+    """A dependency node, and a DAG node if it has parents"""
+
+    __slots__ = (
+        "type",
+        "name",
+        "values",
+        "attributes",
+        "inputs",
+        "outputs",
+        "elements",
+        "parents",
+        "children",
+        "callbacks",
+        "members",
+        "published",
+        "alive",
+        "default",
+        "referenced",
+        "locked",
+        "__weakref__",
+    )
+
+    def __init__(self, type_: str, name: str) -> None:
+        self.type = type_
+        self.name = name
+        self.values: dict[str, object] = {}
+        self.attributes: dict[str, object] = {}  # {dynamic attribute: default}
+        self.inputs: dict[str, tuple[Node, str]] = {}
+        self.outputs: dict[str, dict[tuple[Node, str], None]] = {}
+        # {array: [{index: connections and values}, next free index]}
+        self.elements: dict[str, list] = {}
+        self.parents: list[Node] = []
+        self.children: dict[Node, None] = {}
+        self.callbacks: dict[str, dict[int, Callable]] = {}
+        self.members: dict[Node, None] = {}  # Container contents
+        self.published: dict[str, tuple[Node, str]] = {}
+        self.alive = False
+        self.default = False
+        self.referenced = ":" in name
+        self.locked = False
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}({self.type!r}, {self.name!r})"
+
+    @property
+    def isDag(self) -> bool:
+        return self.type in TRANSFORMS or self.type in SHAPES
+
+    def isType(self, type_: str) -> bool:
+        return type_ == self.type or type_ in INHERITED.get(self.type, ())
+
+    def hasAttribute(self, attribute: str) -> bool:
+        root = re.split(r"[\[.]", attribute, 1)[0]
+        return (
+            root in self.attributes
+            or root in self.published
+            or root not in DYNAMIC
+        )
+
+    def indices(self, array: str) -> list[int]:
+        return sorted(self.elements.get(array, ({}, 0))[0])
+
+    def nextIndex(self, array: str) -> int:
+        return self.elements.get(array, ({}, 0))[1]
+
+    def fire(self, kind: str, *args) -> None:
+        for callback in list(self.callbacks.get(kind, {}).values()):
+            callback(*args)
+
+    def _addElement(self, attribute: str) -> None:
+        """Count a connection or value on an array element"""
+        if match := _ELEMENT.match(attribute):
+            array, index = match.group(1), int(match.group(2))
+            entry = self.elements.setdefault(array, [{}, 0])
+            entry[0][index] = entry[0].get(index, 0) + 1
+            entry[1] = max(entry[1], index + 1)
+
+    def _removeElement(self, attribute: str) -> None:
+        if match := _ELEMENT.match(attribute):
+            array, index = match.group(1), int(match.group(2))
+            counts = self.elements[array][0]
+            counts[index] -= 1
+            if not counts[index]:
+                del counts[index]
+
+
+Path = tuple[Node, ...]
+
+
+class Scene:
+    """Every node in the open scene, by name and by type"""
+
+    def __init__(self) -> None:
+        self.reset()
+
+    def reset(self) -> None:
+        self.nodes: dict[str, Node] = {}
+        self.byType: dict[str, dict[Node, None]] = {}
+        self.world = Node("world", "")
+        self.world.alive = True
+        self.selection: list[tuple[Node, Optional[Path]]] = []
+        self.plugins: set[str] = set()
+        self.ui: dict[str, dict] = {}
+        self.time = 1.0
+        self.ids = itertools.count(1)
+        self.callbacks: dict[int, tuple[Node, str]] = {}
+        self.containers: dict[Node, Node] = {}  # {member: container}
+        self._counters: dict[str, int] = {}
+
+        for name, type_ in DEFAULT_NODES:
+            self.create(type_, name).default = True
+        self.connect(
+            self.nodes["lambert1"],
+            "outColor",
+            self.nodes["initialShadingGroup"],
+            "surfaceShader",
+        )
+        for name in ("initialShadingGroup", "initialParticleSE"):
+            self.append(self.nodes[name], "message", "renderPartition", "sets")
+        for name in CAMERAS:
+            transform = self.create("transform", name)
+            shape = self.create("camera", f"{name}Shape", transform)
+            transform.default = shape.default = True
+
+    # Names and creation
+
+    def uniqueName(self, name: str) -> str:
+        if name not in self.nodes:
+            return name
+        base = name.rstrip("0123456789")
+        i = self._counters.get(base, 1)
+        while f"{base}{i}" in self.nodes:
+            i += 1
+        self._counters[base] = i + 1
+        return f"{base}{i}"
+
+    def new(self, type_: str, name: Optional[str] = None) -> Node:
+        """A node that isn't in the scene until `add`ed"""
+        return Node(type_, name or self.uniqueName(f"{type_}1"))
+
+    def add(self, node: Node, parent: Optional[Node] = None) -> Node:
+        node.name = self.uniqueName(node.name)
+        node.alive = True
+        self.nodes[node.name] = node
+        self.byType.setdefault(node.type, {})[node] = None
+        if node.isDag:
+            self.parent(node, parent or self.world)
+        return node
+
+    def create(
+        self, type_: str, name: Optional[str] = None, parent: Node = None
+    ) -> Node:
+        return self.add(self.new(type_, name), parent)
+
+    def rename(self, node: Node, name: str) -> str:
+        previous = node.name
+        if name == previous:
+            return name
+        if node.alive:
+            del self.nodes[previous]
+            node.name = self.uniqueName(name)
+            self.nodes[node.name] = node
+        else:
+            node.name = name
+        node.referenced = ":" in node.name
+        node.fire("nameChanged", node, previous)
+        return node.name
+
+    def delete(self, nodes: Iterable[Node]) -> None:
+        doomed: dict[Node, None] = {}
+        for node in nodes:
+            self._collect(node, doomed)
+        for node in doomed:
+            node.fire("preRemoval", node)
+
+        for node in doomed:
+            for attribute, (source, plug) in list(node.inputs.items()):
+                self.disconnect(source, plug, node, attribute)
+            for attribute, destinations in list(node.outputs.items()):
+                for destination, plug in list(destinations):
+                    self.disconnect(node, attribute, destination, plug)
+            for parent in node.parents:
+                parent.children.pop(node, None)
+            for child in node.children:
+                if child not in doomed:
+                    child.parents.remove(node)
+            if container := self.containers.pop(node, None):
+                container.members.pop(node, None)
+            for member in node.members:
+                self.containers.pop(member, None)
+
+            node.alive = False
+            del self.nodes[node.name]
+            del self.byType[node.type][node]
+        self.selection = [s for s in self.selection if s[0].alive]
+
+    def _collect(self, node: Node, doomed: dict[Node, None]) -> None:
+        if node in doomed:
+            return
+        doomed[node] = None
+        for child in node.children:
+            if all(p in doomed for p in child.parents):
+                self._collect(child, doomed)
+
+    # Lookup
+
+    def find(self, name: str) -> Optional[Node]:
+        try:
+            return self.resolve(name)[0]
+        except ValueError:
+            return None
+
+    def resolve(self, name: str) -> tuple[Node, Optional[Path]]:
+        """The node and DAG path (None for DG nodes) that `name` refers to"""
+        name = str(name)
+        if "|" not in name:
+            if (node := self.nodes.get(name)) is None or not node.alive:
+                raise ValueError(f"No object matches name: {name}")
+            return node, self.defaultPath(node) if node.isDag else None
+
+        parts = name.strip("|").split("|")
+        try:
+            path = tuple(self.nodes[p] for p in parts)
+        except KeyError:
+            raise ValueError(f"No object matches name: {name}") from None
+        for parent, child in zip(path, path[1:]):
+            if child not in parent.children:
+                raise ValueError(f"No object matches name: {name}")
+        if name.startswith("|"):
+            if self.world not in path[0].parents:
+                raise ValueError(f"No object matches name: {name}")
+        else:
+            path = self.defaultPath(path[0])[:-1] + path
+        return path[-1], path
+
+    def match(self, pattern: str) -> list[tuple[Node, Optional[Path]]]:
+        """Nodes whose name, or DAG path if `pattern` has one, matches"""
+        pattern = str(pattern)
+        if not any(c in pattern for c in "*?[") and not pattern.startswith(
+            "::"
+        ):
+            try:
+                return [self.resolve(pattern)]
+            except ValueError:
+                return []
+
+        if pattern.startswith("::"):  # Any namespace, including none
+            patterns = (pattern[2:], f"*:{pattern[2:]}")
+        else:
+            patterns = (pattern,)
+
+        result = []
+        if "|" in pattern:
+            for node in self.nodes.values():
+                if node.isDag:
+                    for path in self.paths(node):
+                        full = self.fullName(path)
+                        if any(fnmatch.fnmatchcase(full, p) for p in patterns):
+                            result.append((node, path))
+            return result
+        for node in self.nodes.values():
+            if any(fnmatch.fnmatchcase(node.name, p) for p in patterns):
+                result.append(
+                    (node, self.defaultPath(node) if node.isDag else None)
+                )
+        return result
+
+    def ofType(self, types: Iterable[str]) -> list[Node]:
+        types = set(types)
+        concrete = [
+            t
+            for t in self.byType
+            if t in types or types.intersection(INHERITED.get(t, ()))
+        ]
+        return [n for t in concrete for n in self.byType[t]]
+
+    # DAG
+
+    def parent(self, child: Node, parent: Node, add: bool = False) -> None:
+        if not add:
+            for old in child.parents:
+                old.children.pop(child, None)
+            child.parents = []
+        if child not in parent.children:
+            child.parents.append(parent)
+            parent.children[child] = None
+
+    def defaultPath(self, node: Node) -> Path:
+        path = []
+        while node is not self.world and node.parents:
+            path.append(node)
+            node = node.parents[0]
+        return tuple(reversed(path))
+
+    def paths(self, node: Node) -> list[Path]:
+        """Every DAG path to `node`, one per instance"""
+        if node is self.world:
+            return [()]
+        return [
+            p + (node,) for parent in node.parents for p in self.paths(parent)
+        ]
+
+    def instanceNumber(self, path: Path) -> int:
+        return self.paths(path[-1]).index(path)
+
+    def descendants(self, path: Path) -> list[Path]:
+        """`path` and every path below it, depth first"""
+        result = [path]
+        for child in path[-1].children:
+            result.extend(self.descendants(path + (child,)))
+        return result
+
+    def shapes(self, path: Path) -> list[Path]:
+        """Non-intermediate shapes at or below `path`"""
+        return [
+            p
+            for p in self.descendants(path)
+            if p[-1].type in SHAPES
+            and not p[-1].values.get("intermediateObject")
+        ]
+
+    @staticmethod
+    def fullName(path: Path) -> str:
+        return "|" + "|".join(n.name for n in path)
+
+    @staticmethod
+    def partialName(path: Path) -> str:
+        node = path[-1]
+        if len(path) > 1 and len(node.parents) > 1:
+            return f"{path[-2].name}|{node.name}"
+        return node.name
+
+    # Attributes and connections
+
+    def getValue(self, node: Node, attribute: str) -> object:
+        node, attribute = self._published(node, attribute)
+        if attribute in node.values:
+            return node.values[attribute]
+        if attribute in node.attributes:
+            return node.attributes[attribute]
+        return DEFAULT_VALUES.get(attribute, 0)
+
+    def setValue(self, node: Node, attribute: str, value: object) -> None:
+        node, attribute = self._published(node, attribute)
+        if attribute not in node.values:
+            node._addElement(attribute)
+        node.values[attribute] = value
+        node.fire("attributeChanged", "set", node, attribute, None, None)
+
+    def _published(self, node: Node, attribute: str) -> tuple[Node, str]:
+        if attribute in node.published:
+            return node.published[attribute]
+        return node, attribute
+
+    def connect(
+        self,
+        source: Node,
+        sourceAttribute: str,
+        destination: Node,
+        attribute: str,
+        force: bool = False,
+    ) -> None:
+        source, sourceAttribute = self._published(source, sourceAttribute)
+        destination, attribute = self._published(destination, attribute)
+        existing = destination.inputs.get(attribute)
+        if existing == (source, sourceAttribute):
+            if force:
+                return
+            raise RuntimeError(
+                f"{source.name}.{sourceAttribute} is already connected to"
+                f" {destination.name}.{attribute}"
+            )
+        if existing:
+            if not force:
+                raise RuntimeError(
+                    f"{destination.name}.{attribute} already has an incoming"
+                    " connection"
+                )
+            self.disconnect(*existing, destination, attribute)
+
+        destination.inputs[attribute] = (source, sourceAttribute)
+        source.outputs.setdefault(sourceAttribute, {})[
+            (destination, attribute)
+        ] = None
+        source._addElement(sourceAttribute)
+        destination._addElement(attribute)
+        source.fire(
+            "attributeChanged",
+            "made",
+            source,
+            sourceAttribute,
+            destination,
+            attribute,
+        )
+        destination.fire(
+            "attributeChanged",
+            "made",
+            destination,
+            attribute,
+            source,
+            sourceAttribute,
+        )
+
+    def disconnect(
+        self,
+        source: Node,
+        sourceAttribute: str,
+        destination: Node,
+        attribute: str,
+    ) -> None:
+        source, sourceAttribute = self._published(source, sourceAttribute)
+        destination, attribute = self._published(destination, attribute)
+        if destination.inputs.get(attribute) != (source, sourceAttribute):
+            raise RuntimeError(
+                f"{source.name}.{sourceAttribute} is not connected to"
+                f" {destination.name}.{attribute}"
+            )
+        del destination.inputs[attribute]
+        outputs = source.outputs[sourceAttribute]
+        del outputs[(destination, attribute)]
+        if not outputs:
+            del source.outputs[sourceAttribute]
+        source._removeElement(sourceAttribute)
+        destination._removeElement(attribute)
+        source.fire(
+            "attributeChanged",
+            "broken",
+            source,
+            sourceAttribute,
+            destination,
+            attribute,
+        )
+        destination.fire(
+            "attributeChanged",
+            "broken",
+            destination,
+            attribute,
+            source,
+            sourceAttribute,
+        )
+
+    def append(
+        self, source: Node, attribute: str, array: str, arrayAttribute: str
+    ) -> None:
+        """Connect to the next free element of `array`.`arrayAttribute`"""
+        node = self.nodes[array]
+        index = node.nextIndex(arrayAttribute)
+        self.connect(source, attribute, node, f"{arrayAttribute}[{index}]")
+
+    # Shading groups
+
+    def forceElement(
+        self, sg: Node, items: Iterable[tuple[Node, Optional[Path]]]
+    ) -> None:
+        """Make the shapes of `items` members of `sg` only"""
+        for node, path in items:
+            for shape in self.shapes(path) if path else ():
+                member = shape[-1]
+                plug = f"instObjGroups[{self.instanceNumber(shape)}]"
+                sets = list(member.outputs.get(plug, ()))
+                if any(d is sg for d, _ in sets):
+                    continue
+                for destination, attribute in sets:
+                    if destination.type == "shadingEngine":
+                        self.disconnect(member, plug, destination, attribute)
+                index = sg.nextIndex("dagSetMembers")
+                self.connect(member, plug, sg, f"dagSetMembers[{index}]")
+
+    def members(self, sg: Node) -> list[Path]:
+        result = []
+        for attribute, (node, plug) in sg.inputs.items():
+            if attribute.startswith("dagSetMembers"):
+                paths = self.paths(node)
+                index = int(_ELEMENT.match(plug).group(2))
+                if index < len(paths):
+                    result.append(paths[index])
+        return result
+
+    def isMember(self, sg: Node, path: Path) -> bool:
+        plug = f"instObjGroups[{self.instanceNumber(path)}]"
+        return any(d is sg for d, _ in path[-1].outputs.get(plug, ()))
+
+    # Transforms
+
+    def localMatrix(self, node: Node) -> np.ndarray:
+        if node.type not in TRANSFORMS:
+            return np.identity(4)
+        values = node.values
+        return compose(
+            [values.get(f"translate{a}", 0.0) for a in "XYZ"],
+            [values.get(f"rotate{a}", 0.0) for a in "XYZ"],
+            [values.get(f"scale{a}", 1.0) for a in "XYZ"],
+        )
+
+    def setLocalMatrix(self, node: Node, matrix: np.ndarray) -> None:
+        for name, values in zip(
+            ("translate", "rotate", "scale"), decompose(matrix)
+        ):
+            for axis, value in zip("XYZ", values):
+                self.setValue(node, f"{name}{axis}", float(value))
+
+    def worldMatrix(self, path: Path) -> np.ndarray:
+        matrix = np.identity(4)
+        for node in path:
+            matrix = self.localMatrix(node) @ matrix
+        return matrix
+
+
+def rotationMatrix(x: float, y: float, z: float) -> np.ndarray:
+    """3x3 XYZ rotation for row vectors, in radians"""
+    cx, sx, cy, sy, cz, sz = (
+        np.cos(x),
+        np.sin(x),
+        np.cos(y),
+        np.sin(y),
+        np.cos(z),
+        np.sin(z),
+    )
+    rx = np.array([[1, 0, 0], [0, cx, sx], [0, -sx, cx]])
+    ry = np.array([[cy, 0, -sy], [0, 1, 0], [sy, 0, cy]])
+    rz = np.array([[cz, sz, 0], [-sz, cz, 0], [0, 0, 1]])
+    return rx @ ry @ rz
+
+
+def compose(translate, rotate, scale) -> np.ndarray:
+    matrix = np.identity(4)
+    matrix[:3, :3] = np.diag(scale) @ rotationMatrix(*rotate)
+    matrix[3, :3] = translate
+    return matrix
+
+
+def decompose(matrix: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Translation, XYZ rotation in radians, and scale of a 4x4 matrix"""
+    matrix = np.asarray(matrix, dtype=float).reshape(4, 4)
+    scale = np.linalg.norm(matrix[:3, :3], axis=1)
+    rotation = matrix[:3, :3] / np.maximum(scale, 1e-12)[:, np.newaxis]
+    y = np.arcsin(np.clip(-rotation[0, 2], -1, 1))
+    z = np.arctan2(rotation[0, 1], rotation[0, 0])
+    x = np.arctan2(rotation[1, 2], rotation[2, 2])
+    return matrix[3, :3].copy(), np.array([x, y, z]), scale
+
+
+scene = Scene()
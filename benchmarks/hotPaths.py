@@ -0,0 +1,202 @@
+"""Time the tools' hot paths on generated scenes, without Maya
+
+The tools run against `fakeMaya`, so timings measure their own graph work
+(calls made, nodes visited, plugs looked up) rather than Maya's. Every run
+starts from a new scene with about the given number of nodes.
+
+    python benchmarks/hotPaths.py --sizes 1000 10000 --save before.json
+    python benchmarks/hotPaths.py --sizes 1000 10000 --compare before.json
+
+With --compare, the exit status is 1 if any benchmark got slower than the
+saved one by more than --tolerance.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import statistics
+import sys
+import time
+from typing import Callable, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fakeMaya
+
+fakeMaya.install()
+
+import maya.cmds as cmds
+
+import renameShaders
+import replacePlaceholderCoins
+import shaderManager
+
+SIZES = (1000, 10000, 100000)
+NODES_PER_MODEL = 10  # Transform, shape, and the shader network's 8 nodes
+
+
+def addModels(
+    count: int, prefix: str = "prop", parent: Optional[str] = None
+) -> list[str]:
+    """Full paths of `count` new transforms, each with a mesh"""
+    paths = []
+    for i in range(1, count + 1):
+        transform = cmds.createNode(
+            "transform", name=f"{prefix}{i}_geo", parent=parent
+        )
+        cmds.createNode("mesh", name=f"{transform}Shape", parent=transform)
+        paths.append(cmds.ls(transform, long=True)[0])
+    return paths
+
+
+def withNetworks(nodes: int) -> list[str]:
+    """Models whose shader networks are already built"""
+    paths = addModels(nodes // NODES_PER_MODEL)
+    models = [shaderManager.Model(p) for p in paths]
+    with contextlib.redirect_stdout(io.StringIO()):
+        shaderManager.createShaderNetworks(models)
+    for model in models:
+        model.release()
+    return paths
+
+
+def window() -> shaderManager.Window:
+    cmds.select(clear=True)
+    return shaderManager.Window()
+
+
+# Each benchmark sets up a scene of about `nodes` nodes and returns the call
+# to time
+
+
+def createShaderNetwork(nodes: int) -> Callable:
+    paths = addModels(nodes // NODES_PER_MODEL)
+    shaderManager.createMasterShaders()
+    models = [shaderManager.Model(p) for p in paths]
+
+    def run() -> None:
+        for model in models:
+            model.createShaderNetwork()
+
+    return run
+
+
+def createShaderNetworks(nodes: int) -> Callable:
+    paths = addModels(nodes // NODES_PER_MODEL)
+    models = [shaderManager.Model(p) for p in paths]
+    return lambda: shaderManager.createShaderNetworks(models)
+
+
+def repairShaderNetworks(nodes: int) -> Callable:
+    models = [shaderManager.Model(p) for p in withNetworks(nodes)]
+    return lambda: shaderManager.createShaderNetworks(models)
+
+
+def find(nodes: int) -> Callable:
+    withNetworks(nodes)
+    return lambda: window()._find(None)
+
+
+def delete(nodes: int) -> Callable:
+    paths = withNetworks(nodes)
+    # Half the shading groups lose their geometry
+    cmds.delete([cmds.listRelatives(p, shapes=True)[0] for p in paths[::2]])
+    return lambda: window()._delete(None)
+
+
+def rename(nodes: int) -> Callable:
+    for i, path in enumerate(withNetworks(nodes), 1):
+        cmds.rename(path, f"item{i}_geo")
+    return renameShaders.main
+
+
+def replaceCoins(nodes: int) -> Callable:
+    random.seed(nodes)
+    coin = cmds.createNode("transform", name="Coin_geo")
+    cmds.createNode("mesh", name="Coin_geoShape", parent=coin)
+    cmds.setAttr(f"{coin}.scale", 2, 2, 2)
+    group = cmds.group(name="back_coins", empty=True, world=True)
+    for path in addModels(nodes // 2, prefix="placeholder", parent=group):
+        cmds.xform(
+            path,
+            worldSpace=True,
+            translation=[random.uniform(-50, 50) for _ in range(3)],
+            rotation=[random.uniform(-180, 180) for _ in range(3)],
+        )
+    return replacePlaceholderCoins.main
+
+
+BENCHMARKS = {
+    "Model.createShaderNetwork": createShaderNetwork,
+    "createShaderNetworks": createShaderNetworks,
+    "createShaderNetworks (built)": repairShaderNetworks,
+    "Window._find": find,
+    "Window._delete": delete,
+    "renameShaders.main": rename,
+    "replacePlaceholderCoins.main": replaceCoins,
+}
+
+
+def measure(setup: Callable, nodes: int, repeat: int) -> list[float]:
+    """Seconds taken by each of `repeat` runs, each in a new scene"""
+    times = []
+    for _ in range(repeat):
+        fakeMaya.reset()
+        run = setup(nodes)
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            run()
+            times.append(time.perf_counter() - start)
+    return times
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES)
+    parser.add_argument("--only", nargs="+", choices=BENCHMARKS)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--save", help="Write the results to this JSON file")
+    parser.add_argument("--compare", help="JSON file saved by an earlier run")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args()
+
+    baseline = {}
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+
+    results: dict[str, dict[str, float]] = {}
+    regressions = []
+    print(f"{'benchmark':<30} {'nodes':>7} {'best s':>9} {'median s':>9}")
+    for name, setup in BENCHMARKS.items():
+        if args.only and name not in args.only:
+            continue
+        for nodes in args.sizes:
+            times = measure(setup, nodes, args.repeat)
+            best = min(times)
+            results.setdefault(name, {})[str(nodes)] = best
+            line = (
+                f"{name:<30} {nodes:>7} {best:9.4f}"
+                f" {statistics.median(times):9.4f}"
+            )
+            if (before := baseline.get(name, {}).get(str(nodes))) is not None:
+                change = best / before - 1
+                line += f" {change:+7.1%}"
+                if change > args.tolerance:
+                    regressions.append(f"{name} at {nodes} nodes")
+            print(line, flush=True)
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=1)
+    if regressions:
+        print(f"Slower than {args.compare}: {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
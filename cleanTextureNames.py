@@ -1,19 +1,219 @@
-"""Remove the ' (1)' in certain filenames when Google Drive errors during sync"""
+"""Remove the ' (n)' Google Drive adds to filenames when it errors during sync
 
-from pathlib import Path
+Every texture folder is scanned in parallel, copies identical to their original
+are deleted, and a copy replaces its original when the original is older.
+Copies without an original are only reported, as names like "Photo (2019)"
+may be intended, unless renaming them is asked for. Texture attributes still
+pointing at a copy are reported at the end.
+"""
+
+import os
+import re
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Iterable, Optional
 
 import maya.cmds as cmds
 
+import shaderNetworkIndex
+from fileHashes import hashFile
+
+# Google Drive numbers copies from 1, so years and the like aren't matched
+COPY = re.compile(r"^(?P<stem>.+) \((?P<number>\d{1,2})\)$")
+
+# Only these are collected, so scenes and caches near textures are left alone
+TEXTURE_EXTENSIONS = {
+    ".exr",
+    ".hdr",
+    ".jpeg",
+    ".jpg",
+    ".png",
+    ".psd",
+    ".tga",
+    ".tif",
+    ".tiff",
+    ".tx",
+}
+
+
+def canonicalPath(path: str) -> Optional[str]:
+    """The original file `path` is a copy of, if it is one"""
+    directory, filename = os.path.split(path)
+    stem, extension = os.path.splitext(filename)
+    if match := COPY.match(stem):
+        return os.path.join(directory, f"{match['stem']}{extension}")
+    return None
+
+
+def scan(roots: Iterable[str], jobs: Optional[int] = None) -> list[str]:
+    """Paths of every copy below `roots`, walking directories in parallel"""
+    copies = []
+    visited = set()
+
+    def submit(directory: str) -> None:
+        realPath = os.path.realpath(directory)
+        if realPath not in visited:
+            visited.add(realPath)
+            pending.add(executor.submit(_scanDirectory, directory))
+
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        pending = set()
+        for root in roots:
+            if os.path.isdir(root):
+                submit(root)
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                files, directories = future.result()
+                copies.extend(files)
+                for directory in directories:
+                    submit(directory)
+    return sorted(copies)
+
+
+def _scanDirectory(directory: str) -> tuple[list[str], list[str]]:
+    files, directories = [], []
+    try:
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    directories.append(entry.path)
+                elif (
+                    os.path.splitext(entry.name)[1].lower()
+                    in TEXTURE_EXTENSIONS
+                    and entry.is_file()
+                    and canonicalPath(entry.path)
+                ):
+                    files.append(entry.path)
+    except OSError:
+        pass
+    return files, directories
+
+
+def clean(
+    copies: Iterable[str],
+    dryRun: bool = False,
+    jobs: Optional[int] = None,
+    renameUnmatched: bool = False,
+) -> dict[str, dict[str, str]]:
+    """Resolve each copy against its original
+
+    Copies are compared by size first and by content hash only when the sizes
+    match. Returns {action: {copy: original}} for the actions "removed",
+    "renamed", "replaced", "kept" (a differing copy older than its original),
+    and "unmatched" (no original, and `renameUnmatched` is off).
+    """
+    groups: dict[str, list[str]] = {}
+    for copy in copies:
+        groups.setdefault(canonicalPath(copy), []).append(copy)
+
+    result = {
+        "removed": {},
+        "renamed": {},
+        "replaced": {},
+        "kept": {},
+        "unmatched": {},
+    }
+
+    def resolve(canonical: str, copies: list[str]) -> list[tuple[str, str]]:
+        actions = []
+        # The file at `canonical`, or in a dry run the copy that would be there
+        original = canonical if os.path.isfile(canonical) else None
+        for copy in sorted(copies, key=_copyNumber):
+            if original is None:
+                action = "renamed" if renameUnmatched else "unmatched"
+            elif _identical(copy, original):
+                action = "removed"
+            elif os.path.getmtime(copy) > os.path.getmtime(original):
+                action = "replaced"
+            else:
+                action = "kept"
+
+            if not dryRun:
+                if action == "removed":
+                    os.remove(copy)
+                elif action in ("renamed", "replaced"):
+                    os.replace(copy, canonical)
+            if action in ("renamed", "replaced"):
+                original = copy if dryRun else canonical
+            actions.append((action, copy))
+        return actions
+
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        for canonical, actions in zip(
+            groups, executor.map(lambda g: resolve(*g), groups.items())
+        ):
+            for action, copy in actions:
+                result[action][copy] = canonical
+    return result
+
+
+def _identical(path: str, other: str) -> bool:
+    if os.path.getsize(path) != os.path.getsize(other):
+        return False
+    return hashFile(path) == hashFile(other)
+
+
+def _copyNumber(path: str) -> int:
+    stem = os.path.splitext(os.path.basename(path))[0]
+    return int(COPY.match(stem)["number"])
+
+
+def main(
+    roots: Optional[list[str]] = None,
+    dryRun: bool = False,
+    renameUnmatched: bool = False,
+) -> list[tuple[str, str, str]]:
+    """Clean every texture folder and report the attributes to re-point
+
+    Without `roots`, the folders of all shader network textures and the
+    project's sourceimages folder are scanned. Returns (attribute, current
+    value, new value) for each texture that pointed at a copy.
+    """
+    workspace = cmds.workspace(query=True, rootDirectory=True)
+    textures = {}
+    for network in shaderNetworkIndex.containers():
+        try:
+            if texture := cmds.getAttr(f"{network}.texture"):
+                textures[f"{network}.texture"] = texture
+        except ValueError:
+            continue
 
-def main() -> None:
-    toRemove = " (1)"
+    if roots is None:
+        roots = {os.path.join(workspace, "sourceimages")}
+        roots.update(
+            os.path.normpath(os.path.dirname(os.path.join(workspace, t)))
+            for t in textures.values()
+        )
+        # A texture directly in the project doesn't make it a texture folder
+        roots.discard(os.path.normpath(workspace))
+    result = clean(scan(roots), dryRun, renameUnmatched=renameUnmatched)
 
-    texture = cmds.getAttr("::PokemonPlush_shaderNetwork.texture")
+    moved = {}
+    for action in ("removed", "renamed", "replaced"):
+        moved.update(
+            (os.path.normcase(os.path.abspath(c)), o)
+            for c, o in result[action].items()
+        )
+    report = []
+    for attribute, texture in textures.items():
+        path = os.path.normcase(
+            os.path.abspath(os.path.join(workspace, texture))
+        )
+        if path in moved:
+            filename = os.path.basename(moved[path])
+            directory = texture.replace("\\", "/").rsplit("/", 1)
+            new = (
+                f"{directory[0]}/{filename}" if len(directory) > 1 else filename
+            )
+            report.append((attribute, texture, new))
 
-    dir = Path(texture).parent
-    toClean = (f for f in dir.iterdir() if f.is_file() and toRemove in f.stem)
-    for f in toClean:
-        f.rename(f"{f}".replace(toRemove, ""))
+    for action, files in result.items():
+        print(f"{len(files)} copies {action}.")
+    for copy in result["unmatched"]:
+        print(f"No original, left as is: {copy}")
+    for attribute, texture, new in report:
+        print(f"{attribute}: {texture} -> {new}")
+    return report
 
 
 if __name__ == "__main__":
@@ -0,0 +1,211 @@
+"""Count and time every maya.cmds and OpenMaya call made during an operation
+
+Profiling is opt-in, either for one block of code,
+
+    with cmdsProfiler.profile("createShaderNetworks"):
+        ...
+
+or for every function decorated with `profiled`, while the ATRACE_PROFILE
+environment variable is set. Its value, if it's a directory, is where the
+JSON reports go instead of the temp directory. Calls are grouped by command
+and by the function that made them, and a table sorted by total time is
+printed when the operation finishes.
+"""
+
+import functools
+import json
+import os
+import sys
+import tempfile
+import time
+from typing import Callable, Optional
+
+import maya.api.OpenMaya as om
+import maya.cmds as cmds
+
+ENVIRONMENT_VARIABLE = "ATRACE_PROFILE"
+
+# OpenMaya classes whose methods are timed, for objects created while active
+PROFILED_CLASSES = (
+    "MDGModifier",
+    "MDagModifier",
+    "MDagPath",
+    "MFnDagNode",
+    "MFnDependencyNode",
+    "MFnSet",
+    "MFnTransform",
+    "MGlobal",
+    "MItDag",
+    "MItDependencyNodes",
+    "MSelectionList",
+)
+
+
+class Profiler:
+    """Call counts and wall times keyed by (command, calling function)"""
+
+    def __init__(self, label: str) -> None:
+        self.label = label
+        self.seconds = 0.0
+        self.calls: dict[tuple[str, str], list] = {}  # [count, total, max]
+        self._originals: list[tuple[object, str, object]] = []
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}({self.label!r})"
+
+    def record(self, command: str, caller: str, seconds: float) -> None:
+        stats = self.calls.setdefault((command, caller), [0, 0.0, 0.0])
+        stats[0] += 1
+        stats[1] += seconds
+        stats[2] = max(stats[2], seconds)
+
+    def wrap(self, command: str, function: Callable) -> Callable:
+        @functools.wraps(function)
+        def timed(*args, **kwargs):
+            code = sys._getframe(1).f_code
+            caller = f"{os.path.basename(code.co_filename)}:{code.co_name}"
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                self.record(command, caller, time.perf_counter() - start)
+
+        return timed
+
+    def install(self) -> None:
+        for name in dir(cmds):
+            function = getattr(cmds, name)
+            if not name.startswith("_") and callable(function):
+                self._replace(cmds, name, self.wrap(f"cmds.{name}", function))
+
+        for name in PROFILED_CLASSES:
+            if (class_ := getattr(om, name, None)) is not None:
+                self._replace(om, name, self._profiledClass(class_))
+
+    def uninstall(self) -> None:
+        for owner, name, original in reversed(self._originals):
+            setattr(owner, name, original)
+        self._originals.clear()
+
+    def _replace(self, owner: object, name: str, value: object) -> None:
+        self._originals.append((owner, name, getattr(owner, name)))
+        setattr(owner, name, value)
+
+    def _profiledClass(self, class_: type) -> type:
+        """Subclass of `class_` whose methods are timed"""
+        methods = {}
+        for name, attribute in vars(class_).items():
+            if name.startswith("_"):
+                continue
+            command = f"om.{class_.__name__}.{name}"
+            if isinstance(attribute, staticmethod):
+                function = getattr(class_, name)
+                methods[name] = staticmethod(self.wrap(command, function))
+            elif callable(attribute):
+                methods[name] = self.wrap(command, attribute)
+        try:
+            return type(class_.__name__, (class_,), methods)
+        except TypeError:  # Final classes can't be subclassed
+            return class_
+
+    def table(self, limit: int = 30) -> str:
+        rows = sorted(self.calls.items(), key=lambda c: -c[1][1])[:limit]
+        lines = [
+            f"{self.label}: {self.seconds:.3f} s,"
+            f" {sum(s[0] for s in self.calls.values())} calls",
+            f"{'total s':>9} {'max ms':>9} {'count':>8}  command  (caller)",
+        ]
+        for (command, caller), (count, total, longest) in rows:
+            lines.append(
+                f"{total:9.4f} {longest * 1000:9.3f} {count:8}"
+                f"  {command}  ({caller})"
+            )
+        return "\n".join(lines)
+
+    def report(self) -> dict:
+        return {
+            "label": self.label,
+            "seconds": self.seconds,
+            "calls": [
+                {
+                    "command": command,
+                    "caller": caller,
+                    "count": count,
+                    "totalSeconds": total,
+                    "maxSeconds": longest,
+                }
+                for (command, caller), (count, total, longest) in sorted(
+                    self.calls.items(), key=lambda c: -c[1][1]
+                )
+            ],
+        }
+
+    def save(self, directory: Optional[str] = None) -> str:
+        directory = directory or _reportDirectory()
+        os.makedirs(directory, exist_ok=True)
+        filename = f"{self.label}-{time.strftime('%Y%m%d-%H%M%S')}.json"
+        path = os.path.join(directory, filename.replace(":", "_"))
+        with open(path, "w") as f:
+            json.dump(self.report(), f, indent=1)
+        return path
+
+
+class profile:
+    """Context manager profiling maya.cmds and OpenMaya calls in its block
+
+    Nested blocks record into the outermost profiler.
+    """
+
+    _active: Optional[Profiler] = None
+
+    def __init__(self, label: str, save: bool = True) -> None:
+        self.label = label
+        self.saveReport = save
+        self.profiler: Optional[Profiler] = None
+        self._start = 0.0
+
+    def __enter__(self) -> Profiler:
+        if profile._active is not None:
+            return profile._active
+        self.profiler = profile._active = Profiler(self.label)
+        self.profiler.install()
+        self._start = time.perf_counter()
+        return self.profiler
+
+    def __exit__(self, *_) -> None:
+        if self.profiler is None:
+            return
+        self.profiler.seconds = time.perf_counter() - self._start
+        self.profiler.uninstall()
+        profile._active = None
+
+        print(self.profiler.table())
+        if self.saveReport:
+            print(f"Profile saved to {self.profiler.save()}")
+
+
+def enabled() -> bool:
+    return bool(os.environ.get(ENVIRONMENT_VARIABLE))
+
+
+def profiled(label: Optional[str] = None) -> Callable:
+    """Profile the decorated function while ATRACE_PROFILE is set"""
+
+    def decorator(function: Callable) -> Callable:
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not enabled():
+                return function(*args, **kwargs)
+            with profile(label or function.__qualname__):
+                return function(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def _reportDirectory() -> str:
+    value = os.environ.get(ENVIRONMENT_VARIABLE, "")
+    if os.path.isdir(value):
+        return value
+    return os.path.join(tempfile.gettempdir(), "atraceProfiles")
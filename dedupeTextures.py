@@ -0,0 +1,94 @@
+"""Point shader networks with byte-identical textures at a single file
+
+Arnold loads and caches every texture path separately, so identical files
+saved under different names cost memory and I/O once per copy.
+"""
+
+import os
+import struct
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+import maya.cmds as cmds
+
+import shaderNetworkIndex
+from fileHashes import SIDECAR, HashCache
+
+PNG_CHANNELS = {0: 1, 2: 3, 3: 1, 4: 2, 6: 4}  # {color type: channels}
+
+
+def decodedSize(path: str) -> int:
+    """Bytes a texture takes once decoded, or its file size if unknown"""
+    try:
+        with open(path, "rb") as f:
+            header = f.read(26)
+    except OSError:
+        return 0
+    if header[:8] == b"\x89PNG\r\n\x1a\n" and header[12:16] == b"IHDR":
+        width, height, depth, colorType = struct.unpack(">IIBB", header[16:26])
+        return width * height * PNG_CHANNELS.get(colorType, 4) * depth // 8
+    return os.path.getsize(path)
+
+
+def canonical(paths: list[str], references: dict[str, int]) -> str:
+    """The most referenced path, preferring shorter and then earlier names"""
+    return min(paths, key=lambda p: (-references[p], len(p), p))
+
+
+def main(dryRun: bool = False, jobs: Optional[int] = None) -> dict:
+    workspace = cmds.workspace(query=True, rootDirectory=True)
+    textures = {}  # {container: (attribute value, absolute path)}
+    for network in shaderNetworkIndex.containers():
+        try:
+            texture = cmds.getAttr(f"{network}.texture")
+        except ValueError:
+            continue
+        path = os.path.normpath(os.path.join(workspace, texture or ""))
+        if texture and os.path.isfile(path):
+            textures[network] = (texture, path)
+
+    references: dict[str, int] = {}
+    for _, path in textures.values():
+        references[path] = references.get(path, 0) + 1
+
+    # Later runs only rehash files whose size or modification time changed
+    cache = HashCache(os.path.join(workspace, "sourceimages", SIDECAR))
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        digests = dict(zip(references, executor.map(cache.hash, references)))
+    cache.save()
+
+    groups: dict[str, list[str]] = {}
+    for path, digest in digests.items():
+        groups.setdefault(digest, []).append(path)
+    targets = {}  # {duplicate path: canonical path}
+    for paths in groups.values():
+        keep = canonical(paths, references)
+        targets.update((p, keep) for p in paths if p != keep)
+
+    for network, (texture, path) in textures.items():
+        if path in targets and not dryRun:
+            new = targets[path]
+            if new.startswith(os.path.normpath(workspace) + os.sep):
+                new = os.path.relpath(new, workspace)
+            cmds.setAttr(
+                f"{network}.texture", new.replace(os.sep, "/"), type="string"
+            )
+
+    report = {
+        "textures": len(digests),
+        "unique": len(groups),
+        "networks": sum(path in targets for _, path in textures.values()),
+        "fileBytesSaved": sum(os.path.getsize(p) for p in targets),
+        "cacheBytesSaved": sum(decodedSize(p) for p in targets),
+    }
+    print(
+        f"{report['textures']} textures, {report['unique']} unique:"
+        f" {report['networks']} networks repointed,"
+        f" {report['fileBytesSaved'] / 2**20:.1f} MB less file I/O,"
+        f" ~{report['cacheBytesSaved'] / 2**20:.1f} MB less texture cache."
+    )
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""Hash file contents, caching digests by path, size, and modification time"""
+
+import hashlib
+import json
+import os
+import threading
+from typing import Optional
+
+CHUNK_SIZE = 1 << 20
+SIDECAR = ".textureHashes.json"  # Cache kept beside the hashed textures
+
+
+def hashFile(path: str) -> str:
+    digest = hashlib.blake2b(digest_size=20)
+    with open(path, "rb") as f:
+        while chunk := f.read(CHUNK_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class HashCache:
+    """Content hashes kept in a JSON sidecar so unchanged files aren't reread
+
+    An entry is reused only while the file's size and modification time match
+    the ones recorded with it.
+    """
+
+    def __init__(self, path: Optional[str] = None) -> None:
+        self.path = path
+        self._entries: dict[str, list] = {}  # {path: [size, mtime, digest]}
+        self._lock = threading.Lock()
+        self._changed = False
+        if path and os.path.isfile(path):
+            try:
+                with open(path) as f:
+                    self._entries = json.load(f)
+            except (OSError, ValueError):
+                pass
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}({self.path!r})"
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def hash(self, path: str) -> str:
+        """Digest of the file at `path`, read only if it changed"""
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        key = [stat.st_size, stat.st_mtime_ns]
+        entry = self._entries.get(path)
+        if entry and entry[:2] == key:
+            return entry[2]
+
+        digest = hashFile(path)
+        with self._lock:
+            self._entries[path] = key + [digest]
+            self._changed = True
+        return digest
+
+    def save(self) -> None:
+        if not (self.path and self._changed):
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        temporary = f"{self.path}.tmp"
+        with open(temporary, "w") as f:
+            json.dump(self._entries, f, indent=1, sort_keys=True)
+        os.replace(temporary, self.path)
+        self._changed = False
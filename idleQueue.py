@@ -0,0 +1,136 @@
+"""Run script node jobs in small chunks while Maya is idle
+
+Script nodes run while the scene opens, so a long one freezes the UI until
+it's done. Scheduled instead, a job runs from Maya's idle queue for at most
+BUDGET seconds at a time, so the scene is usable right away. A job is a
+generator, and each `yield` is a point where it may pause:
+
+    def job() -> Iterator[None]:
+        for camera in cmds.ls(cameras=True):
+            ...
+            yield
+
+    idleQueue.schedule("cameras", job())
+
+Jobs still queued are finished before the scene is saved, exported, or
+rendered, through the pre-render MEL of defaultRenderGlobals, and dropped when
+another scene is opened. Call `flush` before anything else that needs them
+done. In batch mode, or while ATRACE_PROFILE is set, jobs run to completion as
+soon as they're scheduled.
+"""
+
+import time
+from typing import Iterator
+
+import maya.api.OpenMaya as om
+import maya.cmds as cmds
+
+import cmdsProfiler
+
+BUDGET = 0.02  # Seconds of work per idle event
+
+# Saved with the scene, so it does nothing where this module isn't loaded
+PRE_RENDER_MEL = (
+    "python(\"import sys; sys.modules.get('idleQueue')"
+    " and sys.modules['idleQueue'].flush()\")"
+)
+
+_jobs: dict[str, Iterator[None]] = {}  # In the order they run
+_posted = False
+_callbacks: list[int] = []
+
+
+def schedule(name: str, job: Iterator[None]) -> None:
+    """Queue `job`, replacing any job still queued under the same `name`"""
+    _jobs.pop(name, None)
+    _jobs[name] = job
+    if cmds.about(batch=True):
+        _finish(name)
+    elif cmdsProfiler.enabled():
+        with cmdsProfiler.profile(name):
+            _finish(name)
+    else:
+        _listen()
+        _hookRender()
+        _post()
+
+
+def pending() -> list[str]:
+    """Names of the jobs not finished yet"""
+    return list(_jobs)
+
+
+def flush() -> None:
+    """Run every queued job to completion"""
+    while _jobs:
+        _finish(next(iter(_jobs)))
+
+
+def clear() -> None:
+    """Drop every queued job without running the rest of it"""
+    for job in _jobs.values():
+        job.close()
+    _jobs.clear()
+
+
+def _step(name: str) -> bool:
+    """Run the next chunk of job `name`, returning whether there's more"""
+    job = _jobs[name]
+    try:
+        next(job)
+        return True
+    except BaseException as error:
+        if _jobs.get(name) is job:
+            del _jobs[name]
+        if isinstance(error, StopIteration):
+            return False
+        raise
+
+
+def _finish(name: str) -> None:
+    while name in _jobs and _step(name):
+        pass
+
+
+def _run() -> None:
+    global _posted
+    _posted = False
+    deadline = time.perf_counter() + BUDGET
+    try:
+        # At least one chunk each time, however small the budget
+        while _jobs:
+            _step(next(iter(_jobs)))
+            if time.perf_counter() >= deadline:
+                break
+    finally:
+        _post()
+
+
+def _post() -> None:
+    global _posted
+    if _jobs and not _posted:
+        _posted = True
+        cmds.evalDeferred(_run, lowestPriority=True)
+
+
+def _listen() -> None:
+    if _callbacks:
+        return
+    messages = om.MSceneMessage
+    for message, callback in (
+        (messages.kBeforeSave, flush),
+        (messages.kBeforeExport, flush),
+        (messages.kBeforeOpen, clear),
+        (messages.kBeforeNew, clear),
+    ):
+        _callbacks.append(
+            messages.addCallback(message, lambda _, c=callback: c())
+        )
+
+
+def _hookRender() -> None:
+    plug = "defaultRenderGlobals.preMel"
+    mel = cmds.getAttr(plug) or ""
+    if PRE_RENDER_MEL not in mel:
+        mel = f"{PRE_RENDER_MEL}; {mel}" if mel.strip() else PRE_RENDER_MEL
+        cmds.setAttr(plug, mel, type="string")
@@ -0,0 +1,326 @@
+"""Rewrite attribute values in Maya ASCII scenes without launching Maya
+
+Scenes are streamed one statement at a time, so memory use doesn't grow with
+file size, and the result replaces the original only once it is complete, e.g.
+
+    python mayaAscii.py --tx --render-settings "shots/*.ma"
+
+Render settings come from the profile stored in each scene, as in Maya, or
+from --profile, which also stores that profile in the scene. Bytes that
+aren't UTF-8, e.g. Latin-1 paths, are written back unchanged.
+"""
+
+import argparse
+import os
+import re
+import shutil
+import tempfile
+from typing import Callable, Iterable, Iterator, Optional
+
+import renderProfiles
+from renderProfiles import Value
+
+# Short names Maya writes for the attributes rewritten here
+SHORT_NAMES = {
+    "currentRenderer": "ren",
+    "imageFilePrefix": "ifp",
+    "animation": "an",
+    "putFrameBeforeExt": "pff",
+    "periodInExt": "peie",
+    "extensionPadding": "ep",
+    "width": "w",
+    "height": "h",
+}
+
+# Nodes whose render settings don't depend on the scene's contents
+RENDER_SETTINGS_NODES = ("defaultRenderGlobals", "defaultResolution")
+
+# Flags declaring the dynamic attributes that may be set here
+DYNAMIC_ATTRIBUTES = {
+    renderProfiles.ATTRIBUTE: '-ci true -sn "renderProfile" -ln "renderProfile"'
+    ' -dt "string"'
+}
+
+# String attributes that hold texture paths, keyed by node type
+TEXTURE_ATTRIBUTES = {"container": ("texture",), "aiImage": ("filename",)}
+
+_TOKEN = re.compile(r'"(?:[^"\\]|\\.)*"|[^\s;]+')
+
+
+def toSourceImages(path: str) -> str:
+    """Same rewrite as the texture loop in `setRenderSettings`"""
+    return f"sourceimages/{path.rsplit('/', 1)[-1]}"
+
+
+def toTx(path: str) -> str:
+    """Same rewrite as `switchToTxFiles`"""
+    return toSourceImages(path).replace(".png", ".tx")
+
+
+def renderSettings(profile: str) -> dict[str, dict[str, Value]]:
+    """Settings of `profile` that don't depend on the scene, by node"""
+    return renderProfiles.byNode(
+        renderProfiles.settings(profile), RENDER_SETTINGS_NODES
+    )
+
+
+def storedProfile(path: str) -> str:
+    """The render profile stored in the scene at `path`
+
+    Only read up to the end of the defaultRenderGlobals block.
+    """
+    node, attribute = renderProfiles.ATTRIBUTE.split(".")
+    inBlock = False
+    with open(path, encoding="utf-8", errors="surrogateescape") as f:
+        for statement in statements(f):
+            tokens = _TOKEN.findall(statement)
+            command = tokens[0] if tokens else ""
+            if command in ("createNode", "select"):
+                if inBlock:
+                    break
+                inBlock = command == "select" and tokens[-1] == f":{node}"
+            elif inBlock and command == "setAttr" and len(tokens) > 2:
+                if _unquote(tokens[1]) == f".{attribute}":
+                    name = _unquote(tokens[-1])
+                    if name in renderProfiles.PROFILES:
+                        return name
+                    break
+    return renderProfiles.DEFAULT
+
+
+def melValue(value: Value) -> str:
+    """Arguments that set `value` in a `setAttr` statement"""
+    if isinstance(value, bool):
+        return "yes" if value else "no"
+    if isinstance(value, str):
+        return f'-type "string" {_quote(value)}'
+    return str(value)
+
+
+def _quote(text: str) -> str:
+    return '"{}"'.format(text.replace("\\", "\\\\").replace('"', '\\"'))
+
+
+def _unquote(token: str) -> str:
+    return re.sub(r"\\(.)", r"\1", token[1:-1])
+
+
+def statements(lines: Iterable[str]) -> Iterator[str]:
+    """Complete MEL statements and top-level comment lines, in order"""
+    buffer = []
+    quoted = False
+    for line in lines:
+        if not buffer and line.lstrip().startswith("//"):
+            yield line
+            continue
+        buffer.append(line)
+
+        # Track quotes so semicolons inside strings don't end the statement
+        escaped = False
+        for character in line:
+            if escaped:
+                escaped = False
+            elif character == "\\":
+                escaped = quoted
+            elif character == '"':
+                quoted = not quoted
+        if not quoted and line.rstrip().endswith(";"):
+            yield "".join(buffer)
+            buffer.clear()
+    if buffer:
+        yield "".join(buffer)
+
+
+class Rewriter:
+    """Apply texture path and attribute value rules to statements in order"""
+
+    def __init__(
+        self,
+        textures: Optional[Callable[[str], str]] = None,
+        values: Optional[dict[str, dict[str, Value]]] = None,
+    ) -> None:
+        self.textures = textures
+        self.values = values or {}
+        self.changes = 0
+        self._nodeType: Optional[str] = None
+        self._nodeName: Optional[str] = None
+        self._pending: dict[str, Value] = {}  # Values not set in the block
+        self._declared: set[str] = set()  # Dynamic attributes in the block
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}({self.textures!r}, {self.values!r})"
+
+    def rewrite(self, statements: Iterable[str]) -> Iterator[str]:
+        for statement in statements:
+            tokens = _TOKEN.findall(statement)
+            command = tokens[0] if tokens else ""
+
+            if command in ("createNode", "select"):
+                yield from self._closeBlock()
+                self._openBlock(command, tokens)
+            elif command == "setAttr" and self._nodeName:
+                statement = self._setAttr(statement, tokens)
+            elif command == "addAttr" and "-ln" in tokens:
+                self._declared.add(_unquote(tokens[tokens.index("-ln") + 1]))
+            elif command and not statement.startswith(("\t", " ", "//")):
+                yield from self._closeBlock()
+                self._nodeType = self._nodeName = None
+
+            if statement.startswith("// End of"):
+                yield from self._closeBlock()
+                yield from self._missingBlocks()
+            yield statement
+        yield from self._closeBlock()
+        yield from self._missingBlocks()
+
+    def _openBlock(self, command: str, tokens: list[str]) -> None:
+        flags = dict(zip(tokens, tokens[1:]))
+        if command == "createNode":
+            self._nodeType = tokens[1]
+            self._nodeName = _unquote(flags.get("-n", '""'))
+        else:
+            self._nodeType = None
+            self._nodeName = tokens[-1].lstrip(":")
+        self._pending = dict(self.values.pop(self._nodeName, {}))
+        self._declared = set()
+
+    def _closeBlock(self) -> Iterator[str]:
+        for attribute, value in self._pending.items():
+            flags = DYNAMIC_ATTRIBUTES.get(f"{self._nodeName}.{attribute}")
+            if flags and attribute not in self._declared:
+                yield f"\taddAttr {flags};\n"
+            name = SHORT_NAMES.get(attribute, attribute)
+            self.changes += 1
+            yield f'\tsetAttr ".{name}" {melValue(value)};\n'
+        self._pending = {}
+
+    def _missingBlocks(self) -> Iterator[str]:
+        """Blocks for default nodes whose values were never written"""
+        for node, values in self.values.items():
+            yield f"select -ne :{node};\n"
+            self._nodeName = node
+            self._pending = dict(values)
+            self._declared = set()
+            yield from self._closeBlock()
+        self.values = {}
+
+    def _setAttr(self, statement: str, tokens: list[str]) -> str:
+        attribute = next((t for t in tokens[1:] if t.startswith('"')), None)
+        if not attribute:
+            return statement
+        attribute = _unquote(attribute).lstrip(".")
+
+        for long, value in list(self._pending.items()):
+            if attribute in (long, SHORT_NAMES.get(long)):
+                del self._pending[long]
+                # Keep flags before the attribute, like -k or -l
+                end = statement.index('"', statement.index("setAttr"))
+                end = statement.index('"', end + 1) + 1
+                ending = statement[len(statement.rstrip("\r\n")) :]
+                new = f"{statement[:end]} {melValue(value)};{ending}"
+                if new != statement:
+                    self.changes += 1
+                return new
+
+        names = TEXTURE_ATTRIBUTES.get(self._nodeType, ())
+        if self.textures and attribute in names and '"string"' in tokens:
+            old = _unquote(tokens[-1])
+            if old and (new := self.textures(old)) != old:
+                self.changes += 1
+                start = statement.rindex(tokens[-1])
+                end = start + len(tokens[-1])
+                return f"{statement[:start]}{_quote(new)}{statement[end:]}"
+        return statement
+
+
+def rewrite(
+    path: str,
+    textures: Optional[Callable[[str], str]] = None,
+    values: Optional[dict[str, dict[str, Value]]] = None,
+    dryRun: bool = False,
+) -> int:
+    """Rewrite the scene at `path` in place and count the changed values"""
+    if not path.endswith(".ma"):
+        raise ValueError(f"{path} is not a Maya ASCII file.")
+
+    rewriter = Rewriter(
+        textures, {n: dict(v) for n, v in (values or {}).items()}
+    )
+    directory = os.path.dirname(os.path.abspath(path))
+    # Undecodable bytes become surrogates and are written back as they were
+    destination = tempfile.NamedTemporaryFile(
+        "w",
+        dir=directory,
+        suffix=".ma",
+        delete=False,
+        encoding="utf-8",
+        errors="surrogateescape",
+        newline="",
+    )
+    try:
+        with destination, open(
+            path, encoding="utf-8", errors="surrogateescape", newline=""
+        ) as source:
+            for statement in rewriter.rewrite(statements(source)):
+                destination.write(statement)
+
+        if rewriter.changes and not dryRun:
+            # Temporary files are private, but the scene must stay shared
+            shutil.copymode(path, destination.name)
+            os.replace(destination.name, path)
+    finally:
+        # Never leave a partial scene behind for the next glob to pick up
+        if os.path.exists(destination.name):
+            os.remove(destination.name)
+    return rewriter.changes
+
+
+def main(args: Optional[list[str]] = None) -> None:
+    import batch
+
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("scenes", nargs="+", help="Scene files or globs")
+    textures = parser.add_mutually_exclusive_group()
+    textures.add_argument(
+        "--tx", action="store_true", help="Point textures at TX files"
+    )
+    textures.add_argument(
+        "--sourceimages",
+        action="store_true",
+        help="Point textures at sourceimages/",
+    )
+    parser.add_argument(
+        "--render-settings",
+        action="store_true",
+        help="Apply the render settings that don't depend on the scene",
+    )
+    parser.add_argument(
+        "--profile",
+        choices=sorted(renderProfiles.PROFILES),
+        help="Store this render profile in the scenes and apply its settings",
+    )
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args(args)
+
+    if args.tx:
+        rule = toTx
+    elif args.sourceimages:
+        rule = toSourceImages
+    else:
+        rule = None
+
+    for scene in batch.expandScenes(args.scenes):
+        if scene.endswith(".ma"):
+            values = None
+            if args.profile:
+                values = renderSettings(args.profile)
+                node, attribute = renderProfiles.ATTRIBUTE.split(".")
+                values.setdefault(node, {})[attribute] = args.profile
+            elif args.render_settings:
+                values = renderSettings(storedProfile(scene))
+            changes = rewrite(scene, rule, values, args.dry_run)
+            print(f"{changes:6} changes  {scene}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,33 +1,111 @@
-"""Rename the shaders in the network to match the geometry's"""
+"""Rename the shaders in the network to match the geometry's
 
+Every new name is worked out and checked for collisions before anything is
+renamed, and all renames then run in one MDGModifier, undone as one step.
+"""
+
+from typing import Optional
+
+import maya.api.OpenMaya as om
 import maya.cmds as cmds
 
+import cmdsProfiler
+import shaderNetworkIndex
+import undoableModifier
+
+SUFFIXES = (
+    "shaderNetwork",
+    "sg",
+    "lam",
+    "toon",
+    "tex",
+    "rng",
+    "lineWidth",
+    "lineNoise",
+)
+
 
-def main() -> None:
-    suffixes = (
-        "shaderNetwork",
-        "sg",
-        "lam",
-        "toon",
-        "tex",
-        "rng",
-        "lineWidth",
-        "lineNoise",
-    )
-
-    networks = (c for c in cmds.ls("*shaderNetwork", type="container"))
-    for n in networks:
-        model = cmds.listConnections(f"{n}.model")[0]
-        oldName = n.rsplit("_shaderNetwork", 1)[0]
+def plan(
+    networks: Optional[dict[str, shaderNetworkIndex.Network]] = None,
+) -> dict[str, str]:
+    """{old name: new name} for every shader that would be renamed"""
+    if networks is None:
+        networks = shaderNetworkIndex.build()
+
+    mapping = {}
+    for n in networks.values():
+        # Only networks in the root namespace can be renamed, and shared ones
+        # are named after the model they were built for
+        if n.owner or not (
+            n.container
+            and n.container.endswith("shaderNetwork")
+            and ":" not in n.container
+        ):
+            continue
+
+        model = n.model.rsplit("|", 1)[-1]
+        oldName = n.container.rsplit("_shaderNetwork", 1)[0]
         newName = model.removesuffix("_grp").removesuffix("_geo")
+        for s in (n.container, *n.nodes):
+            if s and s.rsplit("_", 1)[-1] in SUFFIXES:
+                if (new := s.replace(oldName, newName)) != s:
+                    mapping[s] = new
+    return mapping
+
+
+def collisions(mapping: dict[str, str]) -> dict[str, list[str]]:
+    """{new name: [old names]} for names that can't all be taken"""
+    targets: dict[str, list[str]] = {}
+    for old, new in mapping.items():
+        targets.setdefault(new, []).append(old)
+    result = {n: olds for n, olds in targets.items() if len(olds) > 1}
+
+    # An existing node only frees its name if it is renamed too
+    for existing in cmds.ls(list(targets)) if targets else []:
+        if existing not in mapping:
+            result.setdefault(existing, targets[existing])
+    return result
+
+
+def order(mapping: dict[str, str]) -> Optional[list[tuple[str, str]]]:
+    """Renames ordered so no name is taken before it is freed, if possible"""
+    pending = dict(mapping)
+    ordered = []
+    while pending:
+        ready = [(o, n) for o, n in pending.items() if n not in pending]
+        if not ready:
+            return None  # The remaining renames swap names in a cycle
+        for old, new in ready:
+            ordered.append((old, new))
+            del pending[old]
+    return ordered
+
+
+@cmdsProfiler.profiled("renameShaders")
+def main(dryRun: bool = False) -> dict[str, str]:
+    mapping = plan()
+    problems = collisions(mapping)
+    renames = order(mapping) if not problems else None
+    if renames is None:
+        for new, olds in problems.items():
+            cmds.warning(f"{', '.join(olds)} can't all be renamed to {new}.")
+        if not problems:
+            cmds.warning("Shader names would swap in a cycle.")
+        cmds.warning("Nothing was renamed.")
+        return {}
+
+    if not dryRun:
+        modifier = om.MDGModifier()
+        selection = om.MSelectionList()
+        for old, _ in renames:
+            selection.add(old)
+        for i, (_, new) in enumerate(renames):
+            modifier.renameNode(selection.getDependNode(i), new)
+        undoableModifier.commit(modifier)
 
-        shaders = (
-            s
-            for s in cmds.listConnections(model)
-            if s.rsplit("_", 1)[-1] in suffixes
-        )
-        for s in shaders:
-            cmds.rename(s, s.replace(oldName, newName))
+    verb = "Would rename" if dryRun else "Renamed"
+    print(f"{verb} {len(renames)} shaders.")
+    return dict(renames)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,164 @@
+"""Named render settings profiles, from quick previews to final frames
+
+A profile is a table of {"node.attribute": value}. The profile a scene uses
+is stored on defaultRenderGlobals, so `scriptNodes/setRenderSettings.py`
+keeps applying it whenever the scene is opened. To switch many shots, e.g.
+
+    python batch.py renderProfile:preview "shots/*.ma" --jobs 4
+"""
+
+from typing import Iterable, Optional, Union
+
+Value = Union[bool, int, float, str]
+
+DEFAULT = "final"
+ATTRIBUTE = "defaultRenderGlobals.renderProfile"
+
+# Copied into scriptNodes/setRenderSettings.py, so keep the two the same
+FINAL: dict[str, Value] = {
+    "defaultRenderGlobals.currentRenderer": "arnold",
+    "defaultRenderGlobals.animation": True,
+    "defaultRenderGlobals.putFrameBeforeExt": True,
+    "defaultRenderGlobals.periodInExt": 2,
+    "defaultRenderGlobals.extensionPadding": 3,
+    "defaultResolution.width": 1920,
+    "defaultResolution.height": 1080,
+    "defaultArnoldDriver.aiTranslator": "exr",
+    "defaultArnoldDriver.exrCompression": 4,
+    "defaultArnoldDriver.halfPrecision": True,
+    "defaultArnoldDriver.exrTiled": True,
+    "defaultArnoldDriver.mergeAOVs": True,
+    "defaultArnoldDriver.colorManagement": 0,
+    "defaultArnoldRenderOptions.AASamples": 5,
+    "defaultArnoldRenderOptions.GIDiffuseSamples": 2,
+    "defaultArnoldRenderOptions.GISpecularSamples": 0,
+    "defaultArnoldRenderOptions.GITransmissionSamples": 0,
+    "defaultArnoldRenderOptions.GISssSamples": 0,
+    "defaultArnoldRenderOptions.GIVolumeSamples": 0,
+    "defaultArnoldRenderOptions.enableProgressiveRender": False,
+    "defaultArnoldRenderOptions.enableAdaptiveSampling": True,
+    "defaultArnoldRenderOptions.AASamplesMax": 6,
+    "defaultArnoldRenderOptions.AAAdaptiveThreshold": 0.1,
+    "defaultArnoldRenderOptions.lock_sampling_noise": True,
+    "defaultArnoldRenderOptions.GITotalDepth": 5,
+    "defaultArnoldRenderOptions.GIDiffuseDepth": 1,
+    "defaultArnoldRenderOptions.GISpecularDepth": 0,
+    "defaultArnoldRenderOptions.GITransmissionDepth": 0,
+    "defaultArnoldRenderOptions.GIVolumeDepth": 0,
+    "defaultArnoldRenderOptions.autoTransparencyDepth": 5,
+    "defaultArnoldRenderOptions.ignoreMotionBlur": True,
+    "defaultArnoldRenderOptions.bucketScanning": 1,
+    "defaultArnoldRenderOptions.bucketSize": 384,
+    "defaultArnoldRenderOptions.threads_autodetect": True,
+    "defaultArnoldFilter.aiTranslator": "contour",
+}
+
+PROFILES: dict[str, dict[str, Value]] = {
+    "final": FINAL,
+    # Full resolution shading checks with lighter sampling
+    "lookdev": {
+        **FINAL,
+        "defaultArnoldRenderOptions.AASamples": 3,
+        "defaultArnoldRenderOptions.AASamplesMax": 4,
+        "defaultArnoldRenderOptions.bucketSize": 64,
+    },
+    # Silhouettes and outlines at half resolution, without indirect light
+    "preview": {
+        **FINAL,
+        "defaultResolution.width": 960,
+        "defaultResolution.height": 540,
+        "defaultArnoldDriver.exrTiled": False,
+        "defaultArnoldRenderOptions.AASamples": 2,
+        "defaultArnoldRenderOptions.enableAdaptiveSampling": False,
+        "defaultArnoldRenderOptions.GIDiffuseSamples": 0,
+        "defaultArnoldRenderOptions.GITotalDepth": 1,
+        "defaultArnoldRenderOptions.GIDiffuseDepth": 0,
+        "defaultArnoldRenderOptions.autoTransparencyDepth": 2,
+        "defaultArnoldRenderOptions.bucketSize": 64,
+    },
+}
+
+
+def settings(name: str) -> dict[str, Value]:
+    try:
+        return PROFILES[name]
+    except KeyError:
+        raise ValueError(
+            f"Render profile must be one of {sorted(PROFILES)}: {name}"
+        ) from None
+
+
+def byNode(
+    values: dict[str, Value], nodes: Optional[Iterable[str]] = None
+) -> dict[str, dict[str, Value]]:
+    """{node: {attribute: value}}, optionally only for `nodes`"""
+    result = {}
+    for attribute, value in values.items():
+        node, attribute = attribute.split(".", 1)
+        if nodes is None or node in nodes:
+            result.setdefault(node, {})[attribute] = value
+    return result
+
+
+def current() -> str:
+    """The profile stored in the open scene"""
+    import maya.cmds as cmds
+
+    node, attribute = ATTRIBUTE.split(".")
+    if cmds.attributeQuery(attribute, node=node, exists=True):
+        name = cmds.getAttr(ATTRIBUTE)
+        if name in PROFILES:
+            return name
+    return DEFAULT
+
+
+def diff(state: dict[str, Value]) -> dict[str, Value]:
+    """The attributes in `state` whose current value differs"""
+    import maya.cmds as cmds
+
+    changes = {}
+    for attribute, value in state.items():
+        try:
+            current = cmds.getAttr(attribute)
+        except ValueError:
+            continue
+        if isinstance(value, float) and isinstance(current, (int, float)):
+            if abs(current - value) <= 1e-6:
+                continue
+        elif current == value:
+            continue
+        changes[attribute] = value
+    return changes
+
+
+def apply(changes: dict[str, Value]) -> None:
+    import maya.cmds as cmds
+
+    for attribute, value in changes.items():
+        try:
+            if isinstance(value, str):
+                cmds.setAttr(attribute, value, type="string")
+            else:
+                cmds.setAttr(attribute, value)
+        except RuntimeError:
+            pass
+
+
+def applyProfile(name: str) -> dict[str, Value]:
+    """Store profile `name` in the open scene and set the values that differ
+
+    Returns the attributes that were changed.
+    """
+    import maya.cmds as cmds
+
+    values = settings(name)
+    cmds.loadPlugin("mtoa", quiet=True)
+    node, attribute = ATTRIBUTE.split(".")
+    if not cmds.attributeQuery(attribute, node=node, exists=True):
+        cmds.addAttr(node, longName=attribute, dataType="string")
+    if cmds.getAttr(ATTRIBUTE) != name:
+        cmds.setAttr(ATTRIBUTE, name, type="string")
+
+    changes = diff(values)
+    apply(changes)
+    return changes
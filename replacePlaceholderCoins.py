@@ -1,31 +1,35 @@
 """Replace the 100+ placeholder coin models with the finalized model"""
 
-from functools import partial
-
 import maya.cmds as cmds
 
+import swapPlaceholders
+
+OPTIONS = {
+    "candidates": ["Coin_geo"],
+    "correction": swapPlaceholders.rotation(x=90),
+}
+
 
-def main() -> None:
+def main(progress: int = 0, proxy: str = "instances") -> None:
+    """Swap in the final coin as mesh instances, an instancer, or proxies
+
+    See `swapPlaceholders.PROXIES` for the `proxy` choices.
+    """
     oldGroup = "back_coins"
     newGroup = cmds.group(name="new_coins", empty=True, world=True)
-    newCoin = "Coin_geo"
-
-    listRelativesCmd = partial(cmds.listRelatives, fullPath=True)
-    coins = listRelativesCmd(oldGroup, allDescendents=True, type="mesh")
-    coins = listRelativesCmd(coins, parent=True)
-
-    xformCmd = partial(cmds.xform, worldSpace=True)
-    for c in coins:
-        position = xformCmd(c, query=True, translation=True)
-        x, y, z = xformCmd(c, query=True, rotation=True)
-        x += 90
-        orientation = x, y, z
-        newCoin = cmds.instance(newCoin)
-        xformCmd(newCoin, translation=position, rotation=orientation)
-        cmds.parent(newCoin, newGroup)
 
+    swapPlaceholders.swap(
+        oldGroup, group=newGroup, proxy=proxy, progress=progress, **OPTIONS
+    )
     cmds.delete(oldGroup)
 
 
+def benchmark(frames: int = 24) -> dict[str, dict[str, float]]:
+    """Compare viewport frame time and .ma size for each coin representation"""
+    return swapPlaceholders.benchmark(
+        "back_coins", group="new_coins", frames=frames, **OPTIONS
+    )
+
+
 if __name__ == "__main__":
     main()
@@ -1,43 +1,95 @@
-"""Connect a referenced rig's geometry to the master layout's shader network
+"""Connect referenced rigs' geometry to the master layout's shader networks
 
 Some rigs were developed after models in the master layout were already imported,
 so instead of having the rigs have their own shader networks, connect to the
 model's in the master layout instead.
+
+One script node handles every rig in the manifest. Rigs already linked are
+skipped, and geometry is assigned to shading groups without selecting it.
+Rigs are linked one at a time while Maya is idle (see `idleQueue`), or all
+at once where this repository isn't on PYTHONPATH.
 """
 
+from typing import Iterator
+
 import maya.cmds as cmds
 
-REFERENCED_RIG_GEO = "::"
-MASTER_ASSET_NAME = "::"
-
-if cmds.referenceQuery(REFERENCED_RIG_GEO, isNodeReferenced=True):
-
-    def connectToMasterShaders() -> None:
-        for source, destination in {
-            "container": "shaderNetwork",
-            "shadingEngine": "sg",
-            "aiLambert": "lam",
-            "aiToon": "toon",
-            "aiRange": "rng",
-            "aiMultiply": "lineWidth",
-        }.items():
-            try:
-                cmds.connectAttr(
-                    f"{REFERENCED_RIG_GEO}.{source}",
-                    f"{MASTER_ASSET_NAME}{destination}.model",
-                    force=True,
-                )
-            except RuntimeError:
+# Script nodes also run where the repository isn't on PYTHONPATH
+try:
+    import idleQueue
+except ImportError:
+    idleQueue = None
+
+# {referenced rig geometry: master shader network prefix}, e.g.
+# {"::Violeta_geo": "::Violeta"} links to "::Violeta_sg", "::Violeta_toon", ...
+MANIFEST: dict[str, str] = {}
+
+# {rig message attribute: master network node suffix}
+LINKS = {
+    "container": "shaderNetwork",
+    "shadingEngine": "sg",
+    "aiLambert": "lam",
+    "aiToon": "toon",
+    "aiRange": "rng",
+    "aiMultiply": "lineWidth",
+}
+
+
+def connectToMasterShaders(manifest: dict[str, str] = MANIFEST) -> list[str]:
+    """Link every referenced rig in `manifest`, returning the newly connected"""
+    linked: list[str] = []
+    for _ in linking(manifest, linked):
+        pass
+    return linked
+
+
+def linking(manifest: dict[str, str], linked: list[str]) -> Iterator[None]:
+    """Job linking one rig at a time, adding the newly connected to `linked`"""
+    assignments: dict[str, list[str]] = {}  # {shading group: [shapes]}
+    for pattern, master in manifest.items():
+        nodes = {s: cmds.ls(f"{master}_{s}") for s in LINKS.values()}
+        nodes = {s: n[0] for s, n in nodes.items() if n}
+        sg = nodes.get("sg")
+        for rig in cmds.ls(pattern, long=True):
+            if not cmds.referenceQuery(rig, isNodeReferenced=True):
                 continue
 
-        cmds.select(REFERENCED_RIG_GEO, replace=True)
-        try:
-            cmds.hyperShade(assign=f"{MASTER_ASSET_NAME}_sg")
-        except:
-            pass
+            changed = False
+            for source, suffix in LINKS.items():
+                if suffix not in nodes or not cmds.attributeQuery(
+                    source, node=rig, exists=True
+                ):
+                    continue
+                destination = f"{nodes[suffix]}.model"
+                if not cmds.isConnected(f"{rig}.{source}", destination):
+                    try:
+                        cmds.connectAttr(
+                            f"{rig}.{source}", destination, force=True
+                        )
+                    except RuntimeError:
+                        continue
+                    changed = True
+
+            descendants = cmds.listRelatives(
+                rig, allDescendents=True, fullPath=True
+            )
+            if sg and descendants:
+                shapes = cmds.ls(
+                    descendants, shapes=True, noIntermediate=True, long=True
+                )
+                assignments.setdefault(sg, []).extend(shapes)
+            if changed:
+                linked.append(rig)
+            yield
 
-        cmds.select(clear=True)
+    for sg, shapes in assignments.items():
+        members = cmds.sets(sg, query=True)
+        members = set(cmds.ls(members, long=True)) if members else set()
+        if missing := [s for s in shapes if s not in members]:
+            cmds.sets(missing, edit=True, forceElement=sg)
 
-    connectToMasterShaders()
 
-del REFERENCED_RIG_GEO, MASTER_ASSET_NAME
+if idleQueue:
+    idleQueue.schedule("connectToMasterShaders", linking(MANIFEST, []))
+else:
+    connectToMasterShaders()
@@ -1,18 +1,125 @@
-"""Set the necessary render settings when the file is opened"""
+"""Set the necessary render settings when the file is opened
 
-from functools import partial
-from itertools import count
+Render settings come from the profile stored in the scene (see
+`renderProfiles`). The scene is compared against them and only differing
+attributes are set, so opening an up-to-date scene doesn't dirty it. Once
+every setting is set, a fingerprint of them is kept on the script node; while
+it matches, nothing else is queried. Values that depend on who opens the
+scene, like the auto-TX directory, are left out of it and checked every time.
+
+MtoA is only loaded when Arnold's nodes are needed and missing. AOVs are
+checked on every open, whether or not the fingerprint matches, and only
+created, which needs MtoA's Python API, when one is missing or unwired.
+
+Settings are set a batch at a time while Maya is idle (see `idleQueue`), so
+the scene is usable while they're applied. How long each part took is
+printed when done.
+
+Without this repository on PYTHONPATH, the "final" settings kept here are
+applied, and scenes stored with another profile are left as they are.
+"""
+
+import hashlib
+import json
+import time
+from contextlib import contextmanager
+from typing import Iterator, Optional, Union
 
 import maya.cmds as cmds
 
-cmds.loadPlugin("mtoa", quiet=True)
-import mtoa
+# Script nodes also run where the repository isn't on PYTHONPATH
+try:
+    import idleQueue
+except ImportError:
+    idleQueue = None
+try:
+    import renderProfiles
+except ImportError:
+    renderProfiles = None
+try:
+    import shaderNetworkIndex
+except ImportError:
+    shaderNetworkIndex = None
+
+Value = Union[bool, int, float, str]
+
+SCRIPT_NODE = "::setRenderSettings_script"
+FINGERPRINT = "settingsFingerprint"
+BATCH_SIZE = 100  # Attributes compared and set per chunk
+
+# The "final" profile, used where `renderProfiles` can't be imported. Keep it
+# the same as `renderProfiles.FINAL`.
+RENDER_SETTINGS: dict[str, Value] = {
+    "defaultRenderGlobals.currentRenderer": "arnold",
+    "defaultRenderGlobals.animation": True,
+    "defaultRenderGlobals.putFrameBeforeExt": True,
+    "defaultRenderGlobals.periodInExt": 2,
+    "defaultRenderGlobals.extensionPadding": 3,
+    "defaultResolution.width": 1920,
+    "defaultResolution.height": 1080,
+    "defaultArnoldDriver.aiTranslator": "exr",
+    "defaultArnoldDriver.exrCompression": 4,
+    "defaultArnoldDriver.halfPrecision": True,
+    "defaultArnoldDriver.exrTiled": True,
+    "defaultArnoldDriver.mergeAOVs": True,
+    "defaultArnoldDriver.colorManagement": 0,
+    "defaultArnoldRenderOptions.AASamples": 5,
+    "defaultArnoldRenderOptions.GIDiffuseSamples": 2,
+    "defaultArnoldRenderOptions.GISpecularSamples": 0,
+    "defaultArnoldRenderOptions.GITransmissionSamples": 0,
+    "defaultArnoldRenderOptions.GISssSamples": 0,
+    "defaultArnoldRenderOptions.GIVolumeSamples": 0,
+    "defaultArnoldRenderOptions.enableProgressiveRender": False,
+    "defaultArnoldRenderOptions.enableAdaptiveSampling": True,
+    "defaultArnoldRenderOptions.AASamplesMax": 6,
+    "defaultArnoldRenderOptions.AAAdaptiveThreshold": 0.1,
+    "defaultArnoldRenderOptions.lock_sampling_noise": True,
+    "defaultArnoldRenderOptions.GITotalDepth": 5,
+    "defaultArnoldRenderOptions.GIDiffuseDepth": 1,
+    "defaultArnoldRenderOptions.GISpecularDepth": 0,
+    "defaultArnoldRenderOptions.GITransmissionDepth": 0,
+    "defaultArnoldRenderOptions.GIVolumeDepth": 0,
+    "defaultArnoldRenderOptions.autoTransparencyDepth": 5,
+    "defaultArnoldRenderOptions.ignoreMotionBlur": True,
+    "defaultArnoldRenderOptions.bucketScanning": 1,
+    "defaultArnoldRenderOptions.bucketSize": 384,
+    "defaultArnoldRenderOptions.threads_autodetect": True,
+    "defaultArnoldFilter.aiTranslator": "contour",
+}
+
+# {AOV: (type, filter)}, where no type means MtoA's default for the AOV
+AOVS = {
+    "background": ("rgba", "::box_filter"),
+    "direct": ("rgba", "::box_filter"),
+    "indirect": ("rgba", "::box_filter"),
+    "emission": ("rgba", "::box_filter"),
+    "outline": ("rgba", "defaultArnoldFilter"),
+    "Z": (None, "::closest_filter"),
+    "ID": (None, "::closest_filter"),
+}
 
+# Milliseconds of work in each section of the last run
+timings: dict[str, float] = {}
 
-def setRenderSettings() -> None:
-    setStrAttr = partial(cmds.setAttr, type="string")
 
-    for network in cmds.ls("::*_shaderNetwork", type="container"):
+@contextmanager
+def _section(name: str) -> Iterator[None]:
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = (time.perf_counter() - start) * 1000
+        timings[name] = timings.get(name, 0.0) + elapsed
+
+
+def desiredState() -> dict[str, Value]:
+    """Every attribute the scene should have, in the order to set them"""
+    state = {}
+    if shaderNetworkIndex:
+        networks = shaderNetworkIndex.containers()
+    else:
+        networks = cmds.ls("::*_shaderNetwork", type="container")
+    for network in networks:
         try:
             texture = cmds.getAttr(f"{network}.texture")
         except ValueError:
@@ -21,11 +128,9 @@ def setRenderSettings() -> None:
             continue
 
         filename = texture.rsplit("/", 1)[-1]
-        setStrAttr(f"{network}.texture", f"sourceimages/{filename}")
+        state[f"{network}.texture"] = f"sourceimages/{filename}"
 
     default = "defaultRenderGlobals"
-    setStrAttr(f"{default}.currentRenderer", "arnold")
-
     prefix = cmds.getAttr(f"{default}.imageFilePrefix")
     if (not prefix) or len(prefix) <= 3 or (not prefix.startswith("ACT")):
         filename = cmds.file(query=True, sceneName=True, shortName=True)
@@ -33,127 +138,245 @@ def setRenderSettings() -> None:
             start = filename.index("ACT")
             act = filename[start:][3]
             shot = filename[start:][5:7]
-            setStrAttr(f"{default}.imageFilePrefix", f"ACT{act}-{shot}")
+            state[f"{default}.imageFilePrefix"] = f"ACT{act}-{shot}"
 
-    for attribute, value in {
-        "animation": True,
-        "putFrameBeforeExt": True,
-        "periodInExt": 2,
-        "extensionPadding": 3,
-    }.items():
-        cmds.setAttr(f"{default}.{attribute}", value)
+    state.update(renderSettings())
 
     for camera in cmds.ls(cameras=True):
         if camera.startswith("ACT"):
-            cmds.setAttr(f"{camera}.renderable", True)
-            cmds.setAttr(f"{camera}.mask", True)
-            cmds.setAttr(f"{camera}.depth", True)
+            state[f"{camera}.renderable"] = True
+            state[f"{camera}.mask"] = True
+            state[f"{camera}.depth"] = True
         else:
-            cmds.setAttr(f"{camera}.renderable", False)
-
-    cmds.setAttr("defaultResolution.width", 1920)
-    cmds.setAttr("defaultResolution.height", 1080)
-
-    arnold = "defaultArnold"
-    setStrAttr(f"{arnold}Driver.aiTranslator", "exr")
-
-    for attribute, value in {
-        "exrCompression": 4,
-        "halfPrecision": True,
-        "exrTiled": True,
-        "mergeAOVs": True,
-        "colorManagement": 0,
-    }.items():
-        cmds.setAttr(f"{arnold}Driver.{attribute}", value)
-
-    for attribute, value in {
-        "AASamples": 5,
-        "GIDiffuseSamples": 2,
-        "GISpecularSamples": 0,
-        "GITransmissionSamples": 0,
-        "GISssSamples": 0,
-        "GIVolumeSamples": 0,
-        "enableProgressiveRender": False,
-        "enableAdaptiveSampling": True,
-        "AASamplesMax": 6,
-        "AAAdaptiveThreshold": 0.1,
-        "lock_sampling_noise": True,
-        "GITotalDepth": 5,
-        "GIDiffuseDepth": 1,
-        "GISpecularDepth": 0,
-        "GITransmissionDepth": 0,
-        "GIVolumeDepth": 0,
-        "autoTransparencyDepth": 5,
-        "ignoreMotionBlur": True,
-        "bucketScanning": 1,
-        "bucketSize": 384,
-        "threads_autodetect": True,
-    }.items():
-        cmds.setAttr(f"{arnold}RenderOptions.{attribute}", value)
-
-    directory = cmds.internalVar(userTmpDir=True)
-    try:
-        setStrAttr(f"{arnold}RenderOptions.textureAutoTxPath", directory)
-    except RuntimeError:
-        pass
+            state[f"{camera}.renderable"] = False
+    return state
+
+
+def renderSettings() -> dict[str, Value]:
+    """Settings of the profile stored in the scene"""
+    if renderProfiles:
+        return renderProfiles.settings(renderProfiles.current())
 
-    setStrAttr(f"{arnold}Filter.aiTranslator", "contour")
+    attribute = "defaultRenderGlobals.renderProfile"
+    node, name = attribute.split(".")
+    if cmds.attributeQuery(name, node=node, exists=True):
+        if (profile := cmds.getAttr(attribute)) not in ("", "final"):
+            cmds.warning(
+                f"Render profile {profile} wasn't applied, as the A Trace"
+                " scripts aren't on PYTHONPATH."
+            )
+            return {}
+    return RENDER_SETTINGS
 
-    outlinerEditorCmd = partial(cmds.outlinerEditor, edit=True)
-    for n in count(start=1):
+
+def userState() -> dict[str, Value]:
+    """Attributes that depend on who opens the scene, so aren't fingerprinted"""
+    state = {}
+    options = "defaultArnoldRenderOptions"
+    if cmds.objExists(options) and cmds.attributeQuery(
+        "textureAutoTxPath", node=options, exists=True
+    ):
+        directory = cmds.internalVar(userTmpDir=True)
+        state[f"{options}.textureAutoTxPath"] = directory
+    return state
+
+
+def fingerprint(state: dict[str, Value]) -> str:
+    text = json.dumps(state, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha1(text.encode()).hexdigest()
+
+
+def diff(
+    state: dict[str, Value], missing: Optional[list[str]] = None
+) -> dict[str, Value]:
+    """The attributes in `state` whose current value differs
+
+    Attributes that don't exist are skipped, and added to `missing` if given.
+    """
+    changes = {}
+    for attribute, value in state.items():
         try:
-            outlinerEditorCmd(f"outlinerPanel{n}", showContainedOnly=True)
+            current = cmds.getAttr(attribute)
+        except ValueError:
+            if missing is not None:
+                missing.append(attribute)
+            continue
+        if isinstance(value, float) and isinstance(current, (int, float)):
+            if abs(current - value) <= 1e-6:
+                continue
+        elif current == value:
+            continue
+        changes[attribute] = value
+    return changes
+
+
+def apply(changes: dict[str, Value]) -> None:
+    for attribute, value in changes.items():
+        try:
+            if isinstance(value, str):
+                cmds.setAttr(attribute, value, type="string")
+            else:
+                cmds.setAttr(attribute, value)
         except RuntimeError:
-            break
+            pass
+
+
+def setOutlinerOptions() -> None:
+    # Panels aren't saved with the scene, so this runs on every open
+    for panel in cmds.getPanel(type="outlinerPanel") or []:
+        cmds.outlinerEditor(
+            panel, edit=True, showContainedOnly=True, showNamespace=False
+        )
+
+
+def _scriptNode() -> Optional[str]:
+    nodes = cmds.ls(SCRIPT_NODE)
+    return nodes[0] if nodes else None
+
+
+def _storedFingerprint(node: Optional[str]) -> Optional[str]:
+    if node and cmds.attributeQuery(FINGERPRINT, node=node, exists=True):
+        return cmds.getAttr(f"{node}.{FINGERPRINT}")
+    return None
+
+
+def _storeFingerprint(node: Optional[str], digest: str) -> None:
+    if not node:
+        return
+    if not cmds.attributeQuery(FINGERPRINT, node=node, exists=True):
+        cmds.addAttr(node, longName=FINGERPRINT, dataType="string")
+    cmds.setAttr(f"{node}.{FINGERPRINT}", digest, type="string")
+
+
+def loadArnold(attributes: Optional[list[str]] = None) -> None:
+    """Load MtoA if any of `attributes`, or any at all, need its nodes"""
+    if cmds.pluginInfo("mtoa", query=True, loaded=True):
+        return
+    if attributes is not None and all(
+        cmds.objExists(a.split(".", 1)[0])
+        for a in attributes
+        if a.startswith("defaultArnold")
+    ):
+        return
+    cmds.loadPlugin("mtoa", quiet=True)
+
+
+def setRenderSettings() -> Iterator[None]:
+    """Job setting what differs from `desiredState`, unless already applied
+
+    What differs from `userState` is set, and missing AOVs created, either way.
+    """
+    timings.clear()
+    start = time.perf_counter()
+    try:
+        with _section("outliner"):
+            setOutlinerOptions()
+        yield
+
+        with _section("state"):
+            state = desiredState()
+            node = _scriptNode()
+            digest = fingerprint(state)
+            applied = _storedFingerprint(node) == digest
+        yield
+
+        if not applied:
+            with _section("mtoa"):
+                loadArnold(list(state))
+            yield
+
+            attributes = list(state.items())
+            for i in range(0, len(attributes), BATCH_SIZE):
+                with _section("apply"):
+                    apply(diff(dict(attributes[i : i + BATCH_SIZE])))
+                yield
+
+            # Setting some values, e.g. the renderer, creates the nodes of
+            # others, so a batch may have skipped them
+            with _section("verify"):
+                apply(diff(state))
+                missing = []
+                unsettled = list(diff(state, missing)) + missing
+            yield
+
+        # After MtoA is loaded, whether or not the fingerprint matched
+        with _section("user"):
+            apply(diff(userState()))
+        yield
+
+        # AOVs can be deleted without changing the settings, so they're
+        # checked on every open
+        if node and cmds.referenceQuery(node, isNodeReferenced=True):
+            with _section("aovs"):
+                ensureAOVs()
+        if applied:
+            return
+
+        if unsettled:
+            # Not stored, so the next open tries again
+            cmds.warning(
+                f"{len(unsettled)} render settings couldn't be set, e.g."
+                f" {unsettled[0]}."
+            )
         else:
-            outlinerEditorCmd(f"outlinerPanel{n}", showNamespace=False)
-
-    # Create AOVs when the file is referenced into a scene
-    if cmds.referenceQuery("::setRenderSettings_script", isNodeReferenced=True):
-        cmds.evaluationManager(mode="off")
-
-        aovint = mtoa.aovs.AOVInterface()
-        aovs = (
-            "background",
-            "direct",
-            "indirect",
-            "emission",
-            "outline",
-            "Z",
-            "ID",
+            _storeFingerprint(node, digest)
+    finally:
+        elapsed = (time.perf_counter() - start) * 1000
+        work = sum(timings.values())
+        sections = ", ".join(f"{n} {ms:.1f}" for n, ms in timings.items())
+        print(
+            f"setRenderSettings: {work:.1f} ms of work over {elapsed:.1f} ms"
+            f" ({sections})"
         )
 
-        def isZOrId(aov: str) -> bool:
-            return aov == "Z" or aov == "ID"
-
-        connectAttrCmd = partial(cmds.connectAttr, force=True)
-        for aov in aovs:
-            name = f"aiAOV_{aov}"
-            if not (
-                cmds.objExists(name) and cmds.objectType(name, isType="aiAOV")
-            ):
-                if isZOrId(aov):
-                    aovint.addAOV(aov)
-                else:
-                    aovint.addAOV(aov, aovType="rgba")
-
-            if isZOrId(aov):
-                connectAttrCmd(
-                    "::closest_filter.message",
-                    f"{name}.outputs[0].filter",
-                )
-            elif aov == "outline":
-                connectAttrCmd(
-                    f"{arnold}Filter.message",
-                    f"{name}.outputs[0].filter",
-                )
+
+def missingAOVs() -> list[str]:
+    """AOVs whose aiAOV node doesn't exist or isn't wired to its filter"""
+    missing = []
+    for aov, (_, filter_) in AOVS.items():
+        name = f"aiAOV_{aov}"
+        if not (cmds.objExists(name) and cmds.objectType(name, isType="aiAOV")):
+            missing.append(aov)
+            continue
+        sources = (
+            cmds.listConnections(
+                f"{name}.outputs[0].filter", source=True, destination=False
+            )
+            or []
+        )
+        expected = filter_.rsplit(":", 1)[-1]
+        if not any(s.rsplit(":", 1)[-1] == expected for s in sources):
+            missing.append(aov)
+    return missing
+
+
+def ensureAOVs() -> list[str]:
+    """Create and wire the AOVs that are missing, returning them"""
+    if not (missing := missingAOVs()):
+        return []
+
+    loadArnold()
+    import mtoa.aovs
+
+    cmds.evaluationManager(mode="off")
+    interface = mtoa.aovs.AOVInterface()
+    for aov in missing:
+        name = f"aiAOV_{aov}"
+        type_, filter_ = AOVS[aov]
+        if not (cmds.objExists(name) and cmds.objectType(name, isType="aiAOV")):
+            if type_:
+                interface.addAOV(aov, aovType=type_)
             else:
-                connectAttrCmd(
-                    "::box_filter.message",
-                    f"{name}.outputs[0].filter",
-                )
-        else:
-            cmds.delete(cmds.ls("aiAOVFilter*", type="aiAOVFilter"))
+                interface.addAOV(aov)
+        cmds.connectAttr(
+            f"{filter_}.message", f"{name}.outputs[0].filter", force=True
+        )
+    cmds.delete(cmds.ls("aiAOVFilter*", type="aiAOVFilter"))
+    return missing
 
 
-setRenderSettings()
+if idleQueue:
+    idleQueue.schedule("setRenderSettings", setRenderSettings())
+else:
+    for _ in setRenderSettings():
+        pass
@@ -1,13 +1,37 @@
 """Create shader networks for selected objects"""
 
+from math import ceil
+from typing import Callable, Iterable, Optional
+
 import maya.api.OpenMaya as om
 import maya.cmds as cmds
 
+import cmdsProfiler
+import shaderNetworkIndex
+import undoableModifier
+
 # Establish master aiRampRgb, aiFlat, and aiCellNoise node names
 MASTER_CEL_SHADE = "master_celShade"
 MASTER_LINE_COLOR = "master_lineColor"
 MASTER_LINE_NOISE = "master_lineNoise"
 
+# Nodes that shading nodes and shading groups are listed under
+DEFAULT_SHADER_LIST = "defaultShaderList1.shaders"
+DEFAULT_TEXTURE_LIST = "defaultTextureList1.textures"
+DEFAULT_UTILITY_LIST = "defaultRenderUtilityList1.utilities"
+RENDER_PARTITION = "renderPartition.sets"
+
+# Container attributes published for artists, keyed by network node type
+PUBLISHED_ATTRIBUTES = {
+    ("aiImage", "filename"): "texture",
+    ("aiLambert", "opacity"): "opacity",
+    ("aiToon", "normalType"): "normalType",
+    ("aiToon", "angleThreshold"): "angleThreshold",
+    ("aiToon", "priority"): "linePriority",
+    ("aiRange", "multiplier"): "lineThickness",
+    ("aiToon", "edgeColor"): "lineColor",
+}
+
 
 class Model:
     """3D model of a prop"""
@@ -16,8 +40,19 @@ class Model:
         self.dagPath = om.MGlobal.getSelectionListByName(longName).getDagPath(0)
         self.connectToMasterLineColor = True
         self.connectToMasterLineNoise = True
-        self.frame = None  # frameLayout
+        self.frame = None  # Frame, while the model is on the current page
+
+        # Network node names resolved from the model's message attributes
+        self._cache: dict[str, Optional[str]] = {}
+        self._nodeCallbacks: dict[str, list[int]] = {}
+        self._staleCallbacks: list[int] = []
+        self._callbacks = [
+            om.MNodeMessage.addAttributeChangedCallback(
+                self.dagPath.node(), self._onConnectionChanged
+            )
+        ]
 
+        node = om.MFnDependencyNode(self.dagPath.node())
         for attribute, niceName in {
             "container": "Shader Network",
             "shadingEngine": "Shading Group",
@@ -28,7 +63,7 @@ class Model:
             "aiMultiply": "Line Width",
             "aiCellNoise": "Line Noise",
         }.items():
-            if not cmds.attributeQuery(attribute, node=self, exists=True):
+            if not node.hasAttribute(attribute):
                 cmds.addAttr(
                     self,
                     longName=attribute,
@@ -47,158 +82,117 @@ class Model:
 
     @property
     def display(self) -> str:
-        if shapes := cmds.listRelatives(
-            self.dagPath, shapes=True, fullPath=True
-        ):
-            type_ = cmds.objectType(shapes[0])
+        if self.dagPath.numberOfShapesDirectlyBelow():
+            shape = om.MDagPath(self.dagPath).extendToShape(0)
+            type_ = om.MFnDagNode(shape).typeName
         else:
             type_ = "group"
         return f"{self} ({type_})".replace("|", " > ")
 
     @property
     def asset(self) -> str:
-        try:
-            return cmds.listConnections(self, type="container")[0]
-        except TypeError:
-            return f"{self.dagPath}_shaderNetwork".replace("|", "_")
+        return self._connected("container") or self._defaultName(
+            "shaderNetwork"
+        )
 
     @property
     def shadingGroup(self) -> str:
-        try:
-            return cmds.listConnections(self, type="shadingEngine")[0]
-        except TypeError:
-            return f"{self.dagPath}_sg".replace("|", "_")
+        return self._connected("shadingEngine") or self._defaultName("sg")
 
     @property
     def lambert(self) -> str:
-        try:
-            return cmds.listConnections(self, type="aiLambert")[0]
-        except TypeError:
-            return f"{self.dagPath}_lam".replace("|", "_")
+        return self._connected("aiLambert") or self._defaultName("lam")
 
     @property
     def toon(self) -> str:
-        try:
-            return cmds.listConnections(self, type="aiToon")[0]
-        except TypeError:
-            return f"{self.dagPath}_toon".replace("|", "_")
+        return self._connected("aiToon") or self._defaultName("toon")
 
     @property
     def texture(self) -> str:
-        try:
-            return cmds.listConnections(self, type="aiImage")[0]
-        except TypeError:
-            return f"{self.dagPath}_tex".replace("|", "_")
+        return self._connected("aiImage") or self._defaultName("tex")
 
     @property
     def range(self) -> str:
-        try:
-            return cmds.listConnections(self, type="aiRange")[0]
-        except TypeError:
-            return f"{self.dagPath}_rng".replace("|", "_")
+        return self._connected("aiRange") or self._defaultName("rng")
 
     @property
     def mult(self) -> str:
-        try:
-            return cmds.listConnections(self, type="aiMultiply")[0]
-        except TypeError:
-            return f"{self.dagPath}_lineWidth".replace("|", "_")
+        return self._connected("aiMultiply") or self._defaultName("lineWidth")
 
     @property
     def noise(self) -> str:
-        try:
-            return cmds.listConnections(self, type="aiCellNoise")[0]
-        except TypeError:
-            return f"{self.dagPath}_lineNoise".replace("|", "_")
-
-    def createShaderNetwork(self) -> None:
-        # Create shadingEngine
-        createNode(self.shadingGroup, "shadingEngine")
-        connectAttr(f"{self}.shadingEngine", f"{self.shadingGroup}.model")
-
-        # Create aiLambert
-        createNode(self.lambert, "aiLambert")
-        for source, destination in {
-            f"{self.lambert}.outColor": f"{self.shadingGroup}.aiSurfaceShader",
-            f"{self}.aiLambert": f"{self.lambert}.model",
-        }.items():
-            connectAttr(source, destination)
+        return self._connected("aiCellNoise") or self._defaultName("lineNoise")
+
+    def _connected(self, type_: str) -> Optional[str]:
+        """Name of the network node of `type_`, cached until the graph changes"""
+        if self._staleCallbacks:
+            om.MMessage.removeCallbacks(self._staleCallbacks)
+            self._staleCallbacks.clear()
+
+        if type_ not in self._cache:
+            try:
+                node = cmds.listConnections(self, type=type_)[0]
+            except TypeError:
+                node = None
+            else:
+                obj = om.MGlobal.getSelectionListByName(node).getDependNode(0)
+                self._nodeCallbacks[type_] = [
+                    om.MNodeMessage.addNameChangedCallback(
+                        obj, self._onNodeChanged, type_
+                    ),
+                    om.MNodeMessage.addNodePreRemovalCallback(
+                        obj, self._onNodeChanged, type_
+                    ),
+                ]
+            self._cache[type_] = node
+        return self._cache[type_]
+
+    def _defaultName(self, suffix: str) -> str:
+        return f"{self.dagPath}_{suffix}".replace("|", "_")
+
+    def _invalidate(self, type_: Optional[str] = None) -> None:
+        # Callbacks can't safely remove themselves, so stale ones are removed
+        # on the next lookup instead
+        for t in [type_] if type_ else list(self._nodeCallbacks):
+            self._staleCallbacks.extend(self._nodeCallbacks.pop(t, []))
+        if type_:
+            self._cache.pop(type_, None)
+        else:
+            self._cache.clear()
 
-        # Create aiToon
-        createNode(self.toon, "aiToon")
-        for destination in (
-            f"{self.shadingGroup}.surfaceShader",
-            f"{self.lambert}.KdColor",
+    def _onConnectionChanged(self, message: int, *_) -> None:
+        if message & (
+            om.MNodeMessage.kConnectionMade | om.MNodeMessage.kConnectionBroken
         ):
-            connectAttr(f"{self.toon}.outColor", destination)
-        connectAttr(f"{self}.aiToon", f"{self.toon}.model")
-
-        # Create aiImage
-        createNode(self.texture, "aiImage")
-        for source, destination in {
-            f"{self.texture}.outColor": f"{self.toon}.baseColor",
-            f"{self}.aiImage": f"{self.texture}.model",
-        }.items():
-            connectAttr(source, destination)
-
-        # Create aiMultiply
-        createNode(self.mult, "aiMultiply")
-        for source, destination in {
-            f"{self.mult}.outColorR": f"{self.toon}.silhouetteWidthScale",
-            f"{self}.aiMultiply": f"{self.mult}.model",
-        }.items():
-            connectAttr(source, destination)
-
-        # Create aiRange
-        createNode(self.range, "aiRange")
-        for source, destination in {
-            f"{self.range}.outColor": f"{self.mult}.input2",
-            f"{self}.aiRange": f"{self.range}.model",
-        }.items():
-            connectAttr(source, destination)
+            self._invalidate()
 
-        # Create aiCellNoise
-        if not self.connectToMasterLineNoise:
-            createNoiseShader(self.noise)
-            for source, destination in {
-                f"{self.noise}.outColor": f"{self.mult}.input1",
-                f"{self}.aiCellNoise": f"{self.noise}.model",
-            }.items():
-                connectAttr(source, destination)
+    def _onNodeChanged(self, *args) -> None:
+        self._invalidate(args[-1])
 
-        # Apply shader network to model
-        cmds.select(self.dagPath, replace=True)
-        cmds.hyperShade(assign=self.shadingGroup)
-        cmds.select(clear=True)
+    def release(self) -> None:
+        """Stop tracking changes to the model and its shader network"""
+        self._invalidate()
+        om.MMessage.removeCallbacks(self._callbacks + self._staleCallbacks)
+        self._callbacks.clear()
+        self._staleCallbacks.clear()
 
-        self._assetizeNetwork()
-
-    def _assetizeNetwork(self):
-        createNode(self.asset, "container")
-        cmds.setAttr(f"{self.asset}.creationDate", "2023/03", type="string")
-        connectAttr(f"{self}.container", f"{self.asset}.model")
-
-        shaders = [self.lambert, self.toon, self.texture, self.mult, self.range]
-        if not self.connectToMasterLineNoise:
-            shaders.append(self.noise)
-        cmds.container(self.asset, edit=True, addNode=shaders, force=True)
+    @property
+    def nodes(self) -> dict[str, str]:
+        """Shader network node names keyed by type"""
+        return {
+            "container": self.asset,
+            "shadingEngine": self.shadingGroup,
+            "aiLambert": self.lambert,
+            "aiToon": self.toon,
+            "aiImage": self.texture,
+            "aiRange": self.range,
+            "aiMultiply": self.mult,
+            "aiCellNoise": self.noise,
+        }
 
-        attributes = (
-            cmds.container(self.asset, query=True, publishName=True) or []
-        )
-        for attribute, name in {
-            f"{self.texture}.filename": "texture",
-            f"{self.lambert}.opacity": "opacity",
-            f"{self.toon}.normalType": "normalType",
-            f"{self.toon}.angleThreshold": "angleThreshold",
-            f"{self.toon}.priority": "linePriority",
-            f"{self.range}.multiplier": "lineThickness",
-            f"{self.toon}.edgeColor": "lineColor",
-        }.items():
-            if name not in attributes:
-                cmds.container(
-                    self.asset, edit=True, publishAndBind=(attribute, name)
-                )
+    def createShaderNetwork(self) -> None:
+        """Create this model's shader network, or repair what differs"""
+        createShaderNetworks([self])
 
 
 def connectAttr(source: str, destination: str) -> None:
@@ -211,7 +205,7 @@ def connectAttr(source: str, destination: str) -> None:
         cmds.connectAttr(source, destination, force=True)
 
 
-def connectMasterShaders(model: Model, *_) -> None:
+def createMasterShaders() -> None:
     createRampShader()
 
     createNode(MASTER_LINE_COLOR, "aiFlat")
@@ -221,28 +215,15 @@ def connectMasterShaders(model: Model, *_) -> None:
 
     createNoiseShader(MASTER_LINE_NOISE)
 
-    # Connect ramp, flat, and cellNoise to toon shaders
-    model.createShaderNetwork()
-    connectAttr(f"{MASTER_CEL_SHADE}.outColor", f"{model.toon}.baseTonemap")
-
-    if model.connectToMasterLineColor:
-        connectAttr(f"{MASTER_LINE_COLOR}.outColor", f"{model.toon}.edgeColor")
-    else:
-        try:
-            cmds.disconnectAttr(
-                f"{MASTER_LINE_COLOR}.outColor", f"{model.toon}.edgeColor"
-            )
-        except RuntimeError:
-            print(
-                f"{model.toon} is already disconnected from {MASTER_LINE_COLOR}."
-            )
-
-    if model.connectToMasterLineNoise:
-        connectAttr(f"{MASTER_LINE_NOISE}.outColor", f"{model.mult}.input1")
-
 
 def createRampShader() -> None:
+    exists = cmds.objExists(MASTER_CEL_SHADE) and cmds.objectType(
+        MASTER_CEL_SHADE, isType="aiRampRgb"
+    )
     createNode(MASTER_CEL_SHADE, "aiRampRgb")
+    if exists:
+        return
+
     # Set-up 5 gradients on ramp
     for i in range(5):
         color_ = i / 5 + 0.2
@@ -263,7 +244,8 @@ def createRampShader() -> None:
 
 def createNoiseShader(name: str) -> None:
     createNode(name, "aiCellNoise")
-    cmds.setAttr(f"{name}.randomness", 0.8)
+    if abs(cmds.getAttr(f"{name}.randomness") - 0.8) > 1e-6:
+        cmds.setAttr(f"{name}.randomness", 0.8)
 
 
 def createNode(name: str, type_: str) -> None:
@@ -321,12 +303,564 @@ def createNode(name: str, type_: str) -> None:
         cmds.addAttr(name, longName="model", attributeType="message")
 
 
+class NetworkBuilder:
+    """Build shader networks for many models through one MDGModifier
+
+    Each network is compared against the template: its nodes, the values and
+    connections `createNode` gives them, its connections, assignments, and
+    container members and published names. Only what differs is changed.
+    Missing nodes and their dynamic attributes are created first so that
+    their plugs can be found, then the rest is queued on the same modifier,
+    which is committed as a single undoable step, if anything changed at all.
+
+    Every change is listed in `changes` by model, or by node for the master
+    shaders. With `dryRun`, changes are only listed and nothing is modified.
+
+    Models already sharing a network keep sharing it. With `shared`, models
+    with the same `sharingKey` are given one network between them, that of
+    the first model that already has one with members, or else of the first
+    model. The model it was built for is connected to each node's `model`
+    attribute, and the others to its `members`. Networks they used before
+    are left for `deleteUnusedShaders`.
+    """
+
+    def __init__(self, dryRun: bool = False, shared: bool = False) -> None:
+        self.dryRun = dryRun
+        self.shared = shared
+        self.changes: dict[str, list[str]] = {}
+        self.modifier = om.MDGModifier()
+        self._objects: dict[str, om.MObject] = {}
+        self._created: dict[str, str] = {}  # {name: type}
+        self._added: set[str] = set()  # Dynamic attributes not on nodes yet
+        self._planned: set[str] = set()
+        self._initialized: set[str] = set()
+        self._nextIndices: dict[str, int] = {}
+        self._key = ""
+
+    def __repr__(self) -> str:
+        return (
+            f"{self.__class__.__name__}"
+            f"(dryRun={self.dryRun}, shared={self.shared})"
+        )
+
+    def build(self, models: list[Model]) -> dict[str, list[str]]:
+        """Plan every network, then apply the changes unless `dryRun`"""
+        for name, type_ in (
+            (MASTER_CEL_SHADE, "aiRampRgb"),
+            (MASTER_LINE_COLOR, "aiFlat"),
+            (MASTER_LINE_NOISE, "aiCellNoise"),
+        ):
+            if not (
+                cmds.objExists(name) and cmds.objectType(name, isType=type_)
+            ):
+                # Only possible in a dry run, as `createMasterShaders` ran
+                self._key = name
+                self._created[name] = type_
+                self._record(f"create {name} ({type_})")
+
+        groups = self._group(models)
+        networks = [
+            self._planNodes(owner or others[0], bool(others))
+            for owner, others in groups
+        ]
+        if not self.dryRun:
+            self.modifier.doIt()
+
+        for (owner, others), nodes in zip(groups, networks):
+            first = owner or others[0]
+            self._key = first.dagPath.fullPathName()
+            for type_, name in nodes.items():
+                if name not in self._initialized:
+                    self._initialized.add(name)
+                    self._initialize(name, type_)
+            self._planNetwork(first, nodes)
+            for model in [owner] + others if owner else others:
+                self._key = model.dagPath.fullPathName()
+                self._planMember(model, nodes, model is owner)
+
+        if self.changes and not self.dryRun:
+            undoableModifier.commit(self.modifier)
+        return self.changes
+
+    def _record(self, change: str) -> None:
+        self.changes.setdefault(self._key, []).append(change)
+
+    def _group(
+        self, models: list[Model]
+    ) -> list[tuple[Optional[Model], list[Model]]]:
+        """(Model the network is for, other models) for each network
+
+        There's no model the network is for when it belongs to a model not
+        among `models`.
+        """
+        groups: dict[object, list[Model]] = {}
+        for model in models:
+            key = sharingKey(model) if self.shared else None
+            groups.setdefault(key or model.asset, []).append(model)
+
+        result = []
+        for group in groups.values():
+            owners = [m for m in group if m == self._owner(m)]
+            owners.sort(key=lambda m: not self._hasMembers(m.asset))
+            if owners:
+                owner = owners[0]
+            elif self._owner(group[0]):
+                owner = None
+            else:
+                owner = group[0]
+            result.append((owner, [m for m in group if m is not owner]))
+        return result
+
+    def _owner(self, model: Model) -> Optional[str]:
+        """Full path of the model `model`'s container was built for"""
+        try:
+            plug = self._plug(f"{model.asset}.model")
+        except RuntimeError:
+            return None
+        if not plug.isDestination:
+            return None
+        return om.MDagPath.getAPathTo(plug.source().node()).fullPathName()
+
+    def _hasMembers(self, asset: str) -> bool:
+        try:
+            return bool(self._plug(f"{asset}.members").numElements())
+        except RuntimeError:
+            return False
+
+    def _planNodes(self, model: Model, shared: bool) -> dict[str, str]:
+        self._key = model.dagPath.fullPathName()
+        nodes = model.nodes
+        if model.connectToMasterLineNoise:
+            del nodes["aiCellNoise"]
+
+        for type_, name in nodes.items():
+            if name in self._planned:
+                continue
+            self._planned.add(name)
+            try:
+                node = self._object(name)
+            except RuntimeError:
+                node = None
+
+            if node is None or om.MFnDependencyNode(node).typeName != type_:
+                self._record(f"create {name} ({type_})")
+                self._created[name] = type_
+                node = None
+                if not self.dryRun:
+                    node = self.modifier.createNode(type_)
+                    self.modifier.renameNode(node, name)
+                    self._objects[name] = node
+
+            if type_ == "aiRange" and self._lacks(name, node, "multiplier"):
+                attribute = om.MFnNumericAttribute()
+                multiplier = attribute.create(
+                    "multiplier", "multiplier", om.MFnNumericData.kDouble, 1
+                )
+                attribute.setMin(0)
+                attribute.setMax(1)
+                self.modifier.addAttribute(node, multiplier)
+            if self._lacks(name, node, "model"):
+                message = om.MFnMessageAttribute().create("model", "model")
+                self.modifier.addAttribute(node, message)
+            if shared and self._lacks(name, node, "members"):
+                attribute = om.MFnMessageAttribute()
+                members = attribute.create("members", "members")
+                attribute.array = True
+                attribute.indexMatters = False
+                self.modifier.addAttribute(node, members)
+        return nodes
+
+    def _lacks(
+        self, name: str, node: Optional[om.MObject], attribute: str
+    ) -> bool:
+        """Whether dynamic `attribute` must be added to the node `name`
+
+        In a dry run, the attribute is only listed, and False is returned.
+        """
+        if node is not None and om.MFnDependencyNode(node).hasAttribute(
+            attribute
+        ):
+            return False
+        if name not in self._created:
+            self._record(f"add {name}.{attribute}")
+        self._added.add(f"{name}.{attribute}")
+        return not self.dryRun
+
+    def _initialize(self, name: str, type_: str) -> None:
+        """Check the values `createNode` gives a new node of the same type"""
+        if type_ == "shadingEngine":
+            self._append(RENDER_PARTITION, f"{name}.message")
+
+        elif type_ == "aiLambert":
+            self._append(DEFAULT_UTILITY_LIST, f"{name}.message")
+            self._setValue(f"{name}.Kd", 1.0)
+            self._connect(f"{name}.KdColor", f"{name}.hardwareColor")
+
+        elif type_ == "aiToon":
+            self._append(DEFAULT_SHADER_LIST, f"{name}.message")
+            for attribute, value in {
+                "enableSilhouette": True,
+                "base": 1.0,
+                "indirectDiffuse": 1.0,
+            }.items():
+                self._setValue(f"{name}.{attribute}", value)
+            for source, destination in {
+                "edgeColor": "silhouetteColor",
+                "baseColor": "hardwareColor",
+            }.items():
+                self._connect(f"{name}.{source}", f"{name}.{destination}")
+
+        elif type_ == "aiImage":
+            self._append(DEFAULT_TEXTURE_LIST, f"{name}.message")
+            for attribute, value in {
+                "colorSpace": "Rec.1886 / Rec.709 video",
+                "ignoreColorSpaceFileRules": True,
+                "ignoreMissingTextures": True,
+                "missingTextureColor": (1.0, 1.0, 1.0),
+            }.items():
+                self._setValue(f"{name}.{attribute}", value)
+
+        elif type_ == "aiRange":
+            self._append(DEFAULT_UTILITY_LIST, f"{name}.message")
+            self._setValue(f"{name}.outputMin", 0.125)
+            self._connect(f"{name}.multiplier", f"{name}.inputR")
+
+        elif type_ in ("aiMultiply", "aiCellNoise"):
+            self._append(DEFAULT_UTILITY_LIST, f"{name}.message")
+            if type_ == "aiCellNoise":
+                self._setValue(f"{name}.randomness", 0.8)
+
+        elif type_ == "container":
+            self._setValue(f"{name}.viewMode", 0)
+            self._setValue(f"{name}.creationDate", "2023/03")
+
+    def _planNetwork(self, model: Model, nodes: dict[str, str]) -> None:
+        """Connect the network's nodes, with `model`'s line settings"""
+        sg, lambert, toon = (
+            nodes["shadingEngine"],
+            nodes["aiLambert"],
+            nodes["aiToon"],
+        )
+        texture, mult, range_ = (
+            nodes["aiImage"],
+            nodes["aiMultiply"],
+            nodes["aiRange"],
+        )
+
+        for source, destination in (
+            (f"{lambert}.outColor", f"{sg}.aiSurfaceShader"),
+            (f"{toon}.outColor", f"{sg}.surfaceShader"),
+            (f"{toon}.outColor", f"{lambert}.KdColor"),
+            (f"{texture}.outColor", f"{toon}.baseColor"),
+            (f"{mult}.outColorR", f"{toon}.silhouetteWidthScale"),
+            (f"{range_}.outColor", f"{mult}.input2"),
+            (f"{MASTER_CEL_SHADE}.outColor", f"{toon}.baseTonemap"),
+        ):
+            self._connect(source, destination)
+
+        if model.connectToMasterLineNoise:
+            self._connect(f"{MASTER_LINE_NOISE}.outColor", f"{mult}.input1")
+        else:
+            self._connect(f"{nodes['aiCellNoise']}.outColor", f"{mult}.input1")
+
+        lineColor = f"{MASTER_LINE_COLOR}.outColor"
+        edgeColor = f"{toon}.edgeColor"
+        if model.connectToMasterLineColor:
+            self._connect(lineColor, edgeColor)
+        elif not self._pending(lineColor, edgeColor):
+            source, destination = self._plug(lineColor), self._plug(edgeColor)
+            if destination.isDestination and destination.source() == source:
+                self._record(f"disconnect {lineColor} from {edgeColor}")
+                self.modifier.disconnect(source, destination)
+
+        self._planContainer(nodes)
+
+    def _planMember(
+        self, model: Model, nodes: dict[str, str], owner: bool
+    ) -> None:
+        """Link `model`'s message attributes to `nodes` and assign it to them"""
+        path = model.dagPath.fullPathName()
+        self._objects[path] = model.dagPath.node()
+        sg = nodes["shadingEngine"]
+
+        # Connect the model's message attributes to its network
+        for type_, name in nodes.items():
+            source = f"{path}.{type_}"
+            if owner:
+                self._connect(source, f"{name}.model")
+                self._unlink(source, f"{name}.model")
+            else:
+                self._append(f"{name}.members", source)
+                self._unlink(source, f"{name}.members")
+
+        # Apply shader network to model
+        shapes = shapesUnder(model.dagPath)
+        if not self._pending(sg):
+            shadingGroup = om.MFnSet(self._object(sg))
+            shapes = [s for s in shapes if not shadingGroup.isMember(s)]
+        if shapes:
+            shapes = [shape.fullPathName() for shape in shapes]
+            self._record(f"assign {sg} to {len(shapes)} shapes")
+            self.modifier.commandToExecute(
+                f"sets -edit -forceElement {sg} {' '.join(shapes)}"
+            )
+
+    def _unlink(self, source: str, keep: str) -> None:
+        """Disconnect `source` from everything but `keep` and its elements"""
+        plug = self._plug(source)
+        for destination in plug.destinations():
+            if destination.name().split("[")[0] != keep:
+                self._record(f"disconnect {source} from {destination.name()}")
+                self.modifier.disconnect(plug, destination)
+
+    def _planContainer(self, nodes: dict[str, str]) -> None:
+        asset = nodes["container"]
+        if asset in self._created:
+            members, published = set(), set()
+        else:
+            members = set(
+                cmds.container(asset, query=True, nodeList=True) or []
+            )
+            published = set(
+                cmds.container(asset, query=True, publishName=True) or []
+            )
+
+        shaders = [
+            name for type_, name in nodes.items() if type_.startswith("ai")
+        ]
+        if toAdd := [s for s in shaders if s not in members]:
+            self._record(f"add {', '.join(toAdd)} to {asset}")
+            flags = " ".join(f"-addNode {s}" for s in toAdd)
+            self.modifier.commandToExecute(
+                f"container -edit -force {flags} {asset}"
+            )
+
+        for (type_, attribute), name in PUBLISHED_ATTRIBUTES.items():
+            if name not in published:
+                self._record(f"publish {nodes[type_]}.{attribute} as {name}")
+                self.modifier.commandToExecute(
+                    f'container -edit -publishAndBind "{nodes[type_]}.{attribute}"'
+                    f' "{name}" {asset}'
+                )
+
+    def _pending(self, *attributes: str) -> bool:
+        """Whether any of `attributes` has no plug until the modifier runs"""
+        return self.dryRun and any(
+            a.split(".")[0] in self._created or a in self._added
+            for a in attributes
+        )
+
+    def _object(self, name: str) -> om.MObject:
+        if name not in self._objects:
+            selection = om.MGlobal.getSelectionListByName(name)
+            self._objects[name] = selection.getDependNode(0)
+        return self._objects[name]
+
+    def _plug(self, attribute: str) -> om.MPlug:
+        node, attribute = attribute.split(".", 1)
+        node = om.MFnDependencyNode(self._object(node))
+        return node.findPlug(attribute, False)
+
+    def _connect(self, source: str, destination: str) -> None:
+        if self._pending(source, destination):
+            self._record(f"connect {source} to {destination}")
+            return
+        sourcePlug, destinationPlug = self._plug(source), self._plug(
+            destination
+        )
+
+        if destinationPlug.isDestination:
+            connection = destinationPlug.source()
+            if connection == sourcePlug:
+                return
+            self.modifier.disconnect(connection, destinationPlug)
+        self._record(f"connect {source} to {destination}")
+        self.modifier.connect(sourcePlug, destinationPlug)
+
+    def _append(self, array: str, source: str) -> None:
+        """Connect `source` to the next available element of `array`"""
+        if self._pending(source, array):
+            self._record(f"connect {source} to {array}")
+            return
+        if source.split(".")[0] not in self._created:
+            for plug in self._plug(source).destinations():
+                if plug.name().split("[")[0] == array:
+                    return
+
+        plug = self._plug(array)
+        if array not in self._nextIndices:
+            indices = plug.getExistingArrayAttributeIndices()
+            self._nextIndices[array] = max(indices) + 1 if indices else 0
+        element = plug.elementByLogicalIndex(self._nextIndices[array])
+        self._nextIndices[array] += 1
+        self._record(f"connect {source} to {array}")
+        self.modifier.connect(self._plug(source), element)
+
+    def _setValue(self, attribute: str, value) -> None:
+        if self._pending(attribute):
+            self._record(f"set {attribute}")
+            return
+        plug = self._plug(attribute)
+        if attribute.split(".")[0] not in self._created and _equal(plug, value):
+            return
+
+        self._record(f"set {attribute}")
+        if isinstance(value, bool):
+            self.modifier.newPlugValueBool(plug, value)
+        elif isinstance(value, int):
+            self.modifier.newPlugValueInt(plug, value)
+        elif isinstance(value, float):
+            self.modifier.newPlugValueDouble(plug, value)
+        elif isinstance(value, str):
+            self.modifier.newPlugValueString(plug, value)
+        else:
+            for i, v in enumerate(value):
+                self.modifier.newPlugValueDouble(plug.child(i), v)
+
+
+def _equal(plug: om.MPlug, value) -> bool:
+    """Whether `plug` already holds `value`"""
+    if isinstance(value, bool):
+        return plug.asBool() == value
+    if isinstance(value, int):
+        return plug.asInt() == value
+    if isinstance(value, float):
+        return abs(plug.asDouble() - value) <= 1e-6
+    if isinstance(value, str):
+        return plug.asString() == value
+    return all(_equal(plug.child(i), v) for i, v in enumerate(value))
+
+
+def sharingKey(model: Model) -> Optional[tuple]:
+    """What models must have in common to share a shader network
+
+    Texture, line color or whether it's the master's, whether line noise is
+    the master's, and line thickness. Models whose network has no texture
+    yet have no key, as they can't share one.
+    """
+    texture = model.texture
+    if not cmds.objExists(texture):
+        return None
+    if not (filename := cmds.getAttr(f"{texture}.filename")):
+        return None
+
+    lineColor = model.connectToMasterLineColor
+    if not lineColor and cmds.objExists(model.toon):
+        lineColor = tuple(cmds.getAttr(f"{model.toon}.edgeColor")[0])
+    thickness = 1.0
+    if cmds.objExists(model.range):
+        thickness = round(cmds.getAttr(f"{model.range}.multiplier"), 6)
+    return filename, lineColor, model.connectToMasterLineNoise, thickness
+
+
+def createShaderNetworks(
+    models: list[Model], shared: bool = False
+) -> NetworkBuilder:
+    """Create the shader networks of all `models`, or repair what differs
+
+    With `shared`, models with the same `sharingKey` share one network.
+    """
+    createMasterShaders()
+    builder = NetworkBuilder(shared=shared)
+    changes = builder.build(models)
+    print(f"Changed {len(changes)} of {len(models)} shader networks.")
+    return builder
+
+
+def validateShaderNetworks(
+    models: list[Model], shared: bool = False
+) -> dict[str, list[str]]:
+    """How each of `models`' shader networks differs from the template
+
+    Networks that already match are left out. Nothing is modified.
+    """
+    return NetworkBuilder(dryRun=True, shared=shared).build(models)
+
+
+def shapesUnder(dagPath: om.MDagPath) -> list[om.MDagPath]:
+    """Non-intermediate shapes at or below `dagPath`, one per instance"""
+    shapes = []
+    iterator = om.MItDag()
+    iterator.reset(dagPath, om.MItDag.kDepthFirst, om.MFn.kShape)
+    while not iterator.isDone():
+        shape = iterator.getPath()
+        if not om.MFnDagNode(shape).isIntermediateObject:
+            shapes.append(shape)
+        iterator.next()
+    return shapes
+
+
+def deleteUnusedShaders(dryRun: bool = False) -> dict[str, list[str]]:
+    """Delete shading groups, materials, and textures nothing renders
+
+    A node is in use if it is upstream of a shading group with members
+    (shapes, instances, or whole groups), of any DAG node such as a light, or
+    of the Arnold options and AOVs. The graph is walked once, and everything
+    unused is deleted in one call. Returns the unused nodes by kind.
+    """
+    unused = {
+        "shadingEngines": cmds.ls(type="shadingEngine"),
+        "materials": cmds.ls(materials=True),
+        "textures": cmds.ls(type=("aiImage", "aiMultiply", "file")),
+    }
+
+    roots = []
+    iterator = om.MItDependencyNodes(om.MFn.kShadingEngine)
+    while not iterator.isDone():
+        node = iterator.thisNode()
+        if om.MFnSet(node).getMembers(False).length():
+            roots.append(node)
+        iterator.next()
+    iterator = om.MItDag()
+    while not iterator.isDone():
+        roots.append(iterator.currentItem())
+        iterator.next()
+    for node in cmds.ls(type=("aiOptions", "aiAOV")):
+        roots.append(om.MGlobal.getSelectionListByName(node).getDependNode(0))
+
+    used = shaderNetworkIndex.NodeSet()
+    while roots:
+        node = roots.pop()
+        if node in used:
+            continue
+        used.add(node)
+        for plug in om.MFnDependencyNode(node).getConnections():
+            if plug.isDestination:
+                roots.append(plug.source().node())
+
+    for kind, nodes in unused.items():
+        deletable = []
+        for name in nodes:
+            node = om.MGlobal.getSelectionListByName(name).getDependNode(0)
+            fn = om.MFnDependencyNode(node)
+            if not (
+                node in used
+                or fn.isDefaultNode
+                or fn.isFromReferencedFile
+                or fn.isLocked
+            ):
+                deletable.append(name)
+        unused[kind] = deletable
+
+    nodes = list(dict.fromkeys(n for kind in unused.values() for n in kind))
+    if nodes and not dryRun:
+        cmds.delete(nodes)
+
+    for kind, names in unused.items():
+        verb = "Would delete" if dryRun else "Deleted"
+        print(f"{verb} {len(names)} unused {kind}.")
+    return unused
+
+
 class Window:
     NAME = "shaderManager"
     TITLE = '"A Trace" Shader Manager'
+    PAGE_SIZE = 50
 
     def __init__(self) -> None:
-        self._models: list[Model] = []
+        self._models: dict[str, Model] = {}  # {full DAG path: model}
+        self._frames: list[Frame] = []  # Rows of the current page
+        self._page = 0
         self._build()
         self._update()
         cmds.showWindow(self.NAME)
@@ -340,7 +874,7 @@ class Window:
     def _build(self) -> None:
         if cmds.window(self.NAME, exists=True):
             cmds.deleteUI(self.NAME, window=True)
-        cmds.window(self.NAME, title=self.TITLE)
+        cmds.window(self.NAME, title=self.TITLE, closeCommand=self._close)
 
         form = cmds.formLayout("main", numberOfDivisions=100)
         self.scroll = cmds.scrollLayout(
@@ -349,6 +883,21 @@ class Window:
             childResizable=True,
             verticalScrollBarAlwaysVisible=True,
         )
+        search = cmds.textField(
+            "search_fld",
+            parent=form,
+            height=24,
+            placeholderText="Filter",
+            textChangedCommand=self._filter,
+            statusBarMessage="Only list geometries and groups whose path contains the text.",
+        )
+        page = cmds.text("page_txt", parent=form, label="")
+        share = cmds.checkBox(
+            "share_chk",
+            parent=form,
+            label="Share Networks Between Models With the Same Texture",
+            statusBarMessage="Give models with the same texture and line settings one shader network.",
+        )
         separator1 = cmds.separator("separator1", parent=form)
         separator2 = cmds.separator("separator2", parent=form)
         helpLine = cmds.helpLine("helpLine", parent=form, height=24)
@@ -408,12 +957,24 @@ class Window:
                 "Master Line Noise",
                 "Select the master aiCellNoise shader.",
             ),
+            (
+                previous := "previous_btn",
+                self._previousPage,
+                "Previous",
+                "Show the previous page of geometries and groups.",
+            ),
+            (
+                next_ := "next_btn",
+                self._nextPage,
+                "Next",
+                "Show the next page of geometries and groups.",
+            ),
         )
         for id, command, label, message in buttons:
             cmds.button(
                 id,
                 parent=form,
-                height=32,
+                height=24 if id in (previous, next_) else 32,
                 command=command,
                 label=label,
                 statusBarMessage=message,
@@ -424,10 +985,15 @@ class Window:
             edit=True,
             attachControl=(
                 (find, "top", 4, add),
-                (separator1, "top", 5, find),
+                (search, "top", 4, find),
+                (previous, "top", 4, find),
+                (page, "top", 8, find),
+                (next_, "top", 4, find),
+                (separator1, "top", 5, search),
                 (self.scroll, "top", 2, separator1),
                 (self.scroll, "bottom", 3, separator2),
-                (separator2, "bottom", 3, create),
+                (separator2, "bottom", 3, share),
+                (share, "bottom", 4, create),
                 (create, "bottom", 4, ramp),
                 (delete, "bottom", 4, ramp),
                 (ramp, "bottom", 4, helpLine),
@@ -444,8 +1010,11 @@ class Window:
                 (noise, "right", 7),
                 (find, "left", 7),
                 (find, "right", 7),
+                (search, "left", 7),
+                (next_, "right", 7),
                 (self.scroll, "left", 5),
                 (self.scroll, "right", 5),
+                (share, "left", 7),
                 (create, "left", 7),
                 (delete, "right", 7),
                 (separator1, "left", 7),
@@ -467,59 +1036,120 @@ class Window:
                 (color_, "left", 2, 100 / 3),
                 (color_, "right", 2, 100 / 3 * 2),
                 (noise, "left", 2, 100 / 3 * 2),
+                (search, "right", 2, 50),
+                (previous, "left", 2, 50),
+                (previous, "right", 2, 65),
+                (page, "left", 2, 65),
+                (page, "right", 2, 85),
+                (next_, "left", 2, 85),
             ),
         )
 
+    @cmdsProfiler.profiled()
     def _add(self, *_) -> None:
-        selection: list[str] = cmds.ls(
-            selection=True, transforms=True, long=True
-        )
-        selection.sort(key=lambda name: name.lower().rsplit("|", 1)[-1])
-        for model in selection:
-            if (model not in self._models) and cmds.listRelatives(
-                model, allDescendents=True
-            ):
-                model = Model(model)
-                model.frame = Frame(model, self.scroll, self._models)
-                self._models.append(model)
+        self._addModels(cmds.ls(selection=True, transforms=True, long=True))
         cmds.select(clear=True)
 
+    def _addModels(self, paths: Iterable[str]) -> None:
+        """Add the transforms at `paths` that have children and aren't listed"""
+        paths = sorted(
+            set(paths).difference(self._models),
+            key=lambda name: name.lower().rsplit("|", 1)[-1],
+        )
+        selection = om.MSelectionList()
+        for path in paths:
+            selection.add(path)
+
+        for i, path in enumerate(paths):
+            if selection.getDagPath(i).childCount():
+                self._models[path] = Model(path)
+        self._refresh()
+
+    def _refresh(self) -> None:
+        """Rebuild the rows of the current page of filtered models"""
+        for frame in self._frames:
+            cmds.deleteUI(frame, layout=True)
+            frame.model.frame = None
+
+        text = cmds.textField("search_fld", query=True, text=True).lower()
+        paths = [p for p in self._models if text in p.lower()]
+        pages = max(ceil(len(paths) / self.PAGE_SIZE), 1)
+        self._page = min(self._page, pages - 1)
+        start = self._page * self.PAGE_SIZE
+        paths = paths[start : start + self.PAGE_SIZE]
+
+        self._frames = []
+        for path in paths:
+            model = self._models[path]
+            model.frame = Frame(model, self.scroll, self._remove)
+            self._frames.append(model.frame)
+
+        cmds.text(
+            "page_txt",
+            edit=True,
+            label=f"Page {self._page + 1} of {pages}",
+        )
+        cmds.button("previous_btn", edit=True, enable=self._page > 0)
+        cmds.button("next_btn", edit=True, enable=self._page < pages - 1)
+
+    def _filter(self, *_) -> None:
+        self._page = 0
+        self._refresh()
+
+    def _previousPage(self, _) -> None:
+        self._page -= 1
+        self._refresh()
+
+    def _nextPage(self, _) -> None:
+        self._page += 1
+        self._refresh()
+
+    def _remove(self, model: Model) -> None:
+        path = next(p for p, m in self._models.items() if m is model)
+        del self._models[path]
+        model.release()
+        self._refresh()
+
     def _clear(self, *_) -> None:
-        for model in self._models:
-            cmds.deleteUI(model.frame, layout=True)
+        for model in self._models.values():
+            model.release()
         self._models.clear()
+        self._refresh()
+
+    def _close(self, *_) -> None:
+        for model in self._models.values():
+            model.release()
 
     def _update(self, *_) -> None:
         if cmds.ls(selection=True, transforms=True):
             self._clear()
             self._add()
 
+    @cmdsProfiler.profiled()
     def _find(self, _) -> None:
-        cmds.select(clear=True)
-        for sg in cmds.ls(typ="shadingEngine"):
-            if nodes := cmds.listConnections(sg, type="transform"):
-                cmds.select(nodes, add=True)
-            else:
-                nodes = cmds.ls(sg.split("_sg")[0], transforms=True, long=True)
-                cmds.select(nodes, add=True)
-        self._add()
-
+        networks = shaderNetworkIndex.build()
+        paths = set(networks)
+
+        # Fall back to names for shading groups that lost their model
+        indexed = {n.sg for n in networks.values()}
+        if names := [
+            sg.split("_sg")[0]
+            for sg in cmds.ls(type="shadingEngine")
+            if sg not in indexed
+        ]:
+            paths.update(cmds.ls(names, transforms=True, long=True))
+        self._addModels(paths)
+
+    @cmdsProfiler.profiled()
     def _create(self, _) -> None:
-        for model in self._models:
-            connectMasterShaders(model)
+        createShaderNetworks(
+            list(self._models.values()),
+            shared=cmds.checkBox("share_chk", query=True, value=True),
+        )
 
+    @cmdsProfiler.profiled()
     def _delete(self, _) -> None:
-        for sg in cmds.ls(type="shadingEngine"):
-            if not cmds.listConnections(sg, type="mesh"):
-                cmds.delete(sg)
-
-        for material in cmds.ls(materials=True):
-            if not cmds.listConnections(material, type="shadingEngine"):
-                cmds.delete(material)
-
-        for texture in cmds.ls(type=("aiImage", "aiMultiply", "file")):
-            if not cmds.listConnections(texture, type="aiToon"):
-                cmds.delete(texture)
+        deleteUnusedShaders()
 
     def _selectMasterCel(self, _) -> None:
         try:
@@ -541,12 +1171,15 @@ class Window:
 
 
 class Frame:
+    """Collapsed row for a model whose controls are built on first expand"""
+
     def __init__(
-        self, model: Model, scroll: str, modelsList: list[Model]
+        self, model: Model, scroll: str, onRemove: Callable[[Model], None]
     ) -> None:
         self._model = model
         self._scroll = scroll
-        self._modelsList = modelsList
+        self._onRemove = onRemove
+        self._built = False
 
         self._frame = cmds.frameLayout(
             f"{model.dagPath}_frame",
@@ -556,19 +1189,46 @@ class Frame:
             label=model.display,
             backgroundShade=True,
             collapsable=True,
-            collapse=False,
+            collapse=True,
+            expandCommand=self._build,
         )
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}({self._model!r}, {self._scroll!r}, {self._onRemove!r})"
+
+    def __str__(self) -> str:
+        return self._frame
+
+    @property
+    def model(self) -> Model:
+        return self._model
+
+    def _build(self, *_) -> None:
+        if self._built:
+            return
+        self._built = True
+        model = self._model
+
+        cmds.setParent(self._frame)
         form1 = cmds.formLayout(f"{model}_form1")
         controls = (
             (
                 connectColor := "connectColor_cb",
-                (self._uncheckLineColor, self._checkLineColor),
+                (
+                    self._uncheckLineColor,
+                    self._checkLineColor,
+                    model.connectToMasterLineColor,
+                ),
                 "Connect to Master Line Color",
                 f"If checked, connects {self._model} to the master aiFlat shader.",
             ),
             (
                 connectNoise := "connectNoise_cb",
-                (self._uncheckLineNoise, self._checkLineNoise),
+                (
+                    self._uncheckLineNoise,
+                    self._checkLineNoise,
+                    model.connectToMasterLineNoise,
+                ),
                 "Connect to Master Line Noise",
                 f"If unchecked, creates a separate aiCellNoise node for {self._model}.",
             ),
@@ -599,7 +1259,7 @@ class Frame:
                     offCommand=command[0],
                     onCommand=command[1],
                     statusBarMessage=message,
-                    value=True,
+                    value=command[2],
                 )
             else:
                 cmds.button(
@@ -713,12 +1373,6 @@ class Frame:
             ),
         )
 
-    def __repr__(self) -> str:
-        return f"{self.__class__.__name__}({self._model!r}, {self._scroll!r}, {self._modelsList!r})"
-
-    def __str__(self) -> str:
-        return self._frame
-
     def _checkLineColor(self, _) -> None:
         self._model.connectToMasterLineColor = True
 
@@ -775,12 +1429,10 @@ class Frame:
             )
 
     def _createShaderNetwork(self, _) -> None:
-        self._model.createShaderNetwork()
-        connectMasterShaders(self._model)
+        createShaderNetworks([self._model])
 
     def _remove(self, _) -> None:
-        cmds.deleteUI(self, layout=True)
-        self._modelsList.remove(self._model)
+        self._onRemove(self._model)
 
 
 if __name__ == "__main__":
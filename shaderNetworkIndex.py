@@ -0,0 +1,140 @@
+"""Index every shader network in the scene in a single graph pass"""
+
+from typing import NamedTuple, Optional
+
+import maya.api.OpenMaya as om
+
+# Model message attributes and the `Network` fields they resolve to
+FIELDS = {
+    "container": "container",
+    "shadingEngine": "sg",
+    "aiLambert": "lambert",
+    "aiToon": "toon",
+    "aiImage": "image",
+    "aiRange": "range",
+    "aiMultiply": "multiply",
+    "aiCellNoise": "noise",
+}
+
+
+class Network(NamedTuple):
+    """Shader network nodes connected to a model's message attributes
+
+    A network can be shared by several models. One of them is connected to
+    the nodes' `model` attribute, and the others to `members`. `owner` is the
+    full DAG path of the first, or of the first member if it was deleted, for
+    every other model.
+    """
+
+    model: str  # Full DAG path
+    container: Optional[str] = None
+    sg: Optional[str] = None
+    lambert: Optional[str] = None
+    toon: Optional[str] = None
+    image: Optional[str] = None
+    range: Optional[str] = None
+    multiply: Optional[str] = None
+    noise: Optional[str] = None
+    owner: Optional[str] = None
+
+    @property
+    def nodes(self) -> list[str]:
+        """Every network node except the container"""
+        nodes = (
+            self.sg,
+            self.lambert,
+            self.toon,
+            self.image,
+            self.range,
+            self.multiply,
+            self.noise,
+        )
+        return [n for n in nodes if n]
+
+
+class NodeSet:
+    """Set of nodes, since MObjects aren't hashable
+
+    Hash codes can collide, so nodes are bucketed by them and then compared.
+    """
+
+    def __init__(self) -> None:
+        self._buckets: dict[int, list[om.MObjectHandle]] = {}
+
+    def __contains__(self, node: om.MObject) -> bool:
+        handle = om.MObjectHandle(node)
+        return handle in self._buckets.get(handle.hashCode(), ())
+
+    def add(self, node: om.MObject) -> None:
+        handle = om.MObjectHandle(node)
+        bucket = self._buckets.setdefault(handle.hashCode(), [])
+        if handle not in bucket:
+            bucket.append(handle)
+
+
+def build() -> dict[str, Network]:
+    """Map the full DAG path of every model with a shader network to it
+
+    Models are found through the `.model` and `.members` attributes of
+    containers and shading groups, so each one is visited once no matter how
+    many nodes its network has.
+    """
+    networks = {}
+    visited = NodeSet()
+    for filter_ in (om.MFn.kContainer, om.MFn.kShadingEngine):
+        iterator = om.MItDependencyNodes(filter_)
+        while not iterator.isDone():
+            node = om.MFnDependencyNode(iterator.thisNode())
+            iterator.next()
+            if not node.hasAttribute("model"):
+                continue
+
+            # Without the model the network was built for, the first member
+            # stands in for it
+            plug = node.findPlug("model", False)
+            models = [plug.source().node()] if plug.isDestination else []
+            if node.hasAttribute("members"):
+                members = node.findPlug("members", False)
+                for i in members.getExistingArrayAttributeIndices():
+                    element = members.elementByLogicalIndex(i)
+                    if element.isDestination:
+                        models.append(element.source().node())
+            if not models:
+                continue
+
+            owner = None
+            if len(models) > 1 and models[0].hasFn(om.MFn.kDagNode):
+                owner = om.MDagPath.getAPathTo(models[0]).fullPathName()
+            for i, model in enumerate(models):
+                if model in visited or not model.hasFn(om.MFn.kDagNode):
+                    continue
+                visited.add(model)
+
+                network = _network(model, owner if i else None)
+                networks[network.model] = network
+    return networks
+
+
+def _network(model: om.MObject, owner: Optional[str] = None) -> Network:
+    node = om.MFnDependencyNode(model)
+    fields = {}
+    for attribute, field in FIELDS.items():
+        if not node.hasAttribute(attribute):
+            continue
+        if destinations := node.findPlug(attribute, False).destinations():
+            fields[field] = om.MFnDependencyNode(destinations[0].node()).name()
+    path = om.MDagPath.getAPathTo(model).fullPathName()
+    return Network(path, owner=owner, **fields)
+
+
+def containers(networks: Optional[dict[str, Network]] = None) -> list[str]:
+    """Names of every `*_shaderNetwork` container, in any namespace"""
+    if networks is None:
+        networks = build()
+    return list(
+        dict.fromkeys(
+            n.container
+            for n in networks.values()
+            if n.container and n.container.endswith("_shaderNetwork")
+        )
+    )
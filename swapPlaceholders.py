@@ -0,0 +1,417 @@
+"""Swap placeholder models for final ones, matched by their bounding boxes
+
+Placeholder world matrices are gathered into one NumPy array and corrected in
+a single vectorized step, so orientation fixes are matrices rather than Euler
+offsets. Each placeholder is matched to the nearest of several candidate final
+models with a KD-tree, by size (sorted box extents), shape (extents relative
+to the longest side), or position (box centers).
+
+Final models can be placed as mesh instances, as one particle instancer, or
+as instances of a GPU cache or Arnold stand-in proxy that keeps the viewport
+light and loads the full geometry only at render time.
+"""
+
+import os
+import tempfile
+import time
+from typing import Optional, Sequence
+
+import maya.api.OpenMaya as om
+import maya.cmds as cmds
+import numpy as np
+
+import undoableModifier
+from transforms import dagPath, setTransform
+
+try:
+    from scipy.spatial import cKDTree
+except ImportError:
+    cKDTree = None
+
+MATCH_MODES = ("size", "shape", "position")
+PROXIES = ("instances", "instancer", "gpuCache", "standIn")
+
+
+def placeholders(group: str) -> list[om.MDagPath]:
+    """Transforms of every mesh under `group`, one per instance"""
+    transforms = {}
+    iterator = om.MItDag()
+    iterator.reset(dagPath(group), om.MItDag.kDepthFirst, om.MFn.kMesh)
+    while not iterator.isDone():
+        transform = iterator.getPath().pop()
+        transforms.setdefault(transform.fullPathName(), transform)
+        iterator.next()
+    return list(transforms.values())
+
+
+def rotation(x: float = 0, y: float = 0, z: float = 0) -> np.ndarray:
+    """Correction matrix rotating by XYZ degrees in the model's local space"""
+    euler = om.MEulerRotation(*np.radians([x, y, z]).tolist())
+    return toArray([euler.asMatrix()])[0]
+
+
+def toArray(matrices: Sequence[om.MMatrix]) -> np.ndarray:
+    """(n, 4, 4) array of Maya's row-major matrices"""
+    return np.array(
+        [[m[i] for i in range(16)] for m in matrices], dtype=float
+    ).reshape(-1, 4, 4)
+
+
+def scales(matrices: np.ndarray) -> np.ndarray:
+    """(n, 3) scale of each matrix, the lengths of its basis rows"""
+    return np.linalg.norm(matrices[:, :3, :3], axis=2)
+
+
+def correct(
+    matrices: np.ndarray,
+    correction: Optional[np.ndarray] = None,
+    scale: Optional[Sequence[float]] = None,
+) -> np.ndarray:
+    """Apply `correction` in local space to every matrix at once
+
+    With `scale`, each matrix's own scale is replaced by it, innermost, so the
+    final model keeps its authored size.
+    """
+    matrices = np.array(matrices, dtype=float)
+    if scale is not None:
+        current = np.maximum(scales(matrices), 1e-12)
+        matrices[:, :3, :3] /= current[:, :, np.newaxis]
+    if correction is not None:
+        matrices = np.asarray(correction, dtype=float) @ matrices
+    if scale is not None:
+        matrices[:, :3, :] *= np.asarray(scale, dtype=float).reshape(-1, 3, 1)
+    return matrices
+
+
+def boxes(paths: Sequence[om.MDagPath]) -> tuple[np.ndarray, np.ndarray]:
+    """(n, 3) object space extents and centers of each transform's children"""
+    extents, centers = [], []
+    for path in paths:
+        box = om.MFnDagNode(path).boundingBox
+        extents.append((box.width, box.height, box.depth))
+        centers.append((box.center.x, box.center.y, box.center.z))
+    return np.array(extents, dtype=float), np.array(centers, dtype=float)
+
+
+def features(
+    extents: np.ndarray, centers: np.ndarray, matrices: np.ndarray, mode: str
+) -> np.ndarray:
+    """Points to match on for boxes transformed by `matrices`"""
+    if mode == "position":
+        points = np.hstack([centers, np.ones((len(centers), 1))])
+        return np.einsum("ni,nij->nj", points, matrices)[:, :3]
+
+    size = np.sort(extents * scales(matrices), axis=1)[:, ::-1]
+    if mode == "shape":
+        return size / np.maximum(size[:, :1], 1e-9)
+    return size
+
+
+def nearest(points: np.ndarray, targets: np.ndarray) -> np.ndarray:
+    """Index of the closest target to each point"""
+    if not len(points):
+        return np.zeros(0, dtype=int)
+    if cKDTree is not None:
+        return cKDTree(targets).query(points)[1]
+    distances = ((points[:, np.newaxis] - targets[np.newaxis]) ** 2).sum(axis=2)
+    return distances.argmin(axis=1)
+
+
+def match(
+    placeholderPaths: Sequence[om.MDagPath],
+    candidates: Sequence[str],
+    mode: str = "size",
+) -> np.ndarray:
+    """Index into `candidates` of the final model for each placeholder"""
+    if mode not in MATCH_MODES:
+        raise ValueError(f"Match mode must be one of {MATCH_MODES}: {mode}")
+    if len(candidates) == 1:
+        return np.zeros(len(placeholderPaths), dtype=int)
+
+    candidatePaths = [dagPath(c) for c in candidates]
+    candidateMatrices = toArray([p.inclusiveMatrix() for p in candidatePaths])
+    matrices = toArray([p.inclusiveMatrix() for p in placeholderPaths])
+    points = features(*boxes(placeholderPaths), matrices, mode)
+    targets = features(*boxes(candidatePaths), candidateMatrices, mode)
+    return nearest(points, targets)
+
+
+def swap(
+    placeholderGroup: str,
+    candidates: Sequence[str],
+    group: str = "swapped",
+    correction: Optional[np.ndarray] = None,
+    mode: str = "size",
+    keepScale: bool = False,
+    proxy: str = "instances",
+    progress: int = 0,
+) -> dict[str, list[str]]:
+    """Instance the best matching candidate at every placeholder
+
+    `correction` is a 4x4 matrix applied in each final model's local space,
+    e.g. `rotation(90)`. Unless `keepScale`, final models keep their own scale
+    instead of the placeholder's. `proxy` is one of PROXIES. Returns
+    {candidate: [new transforms or instancer]}; the placeholders are left for
+    the caller to delete.
+    """
+    if proxy not in PROXIES:
+        raise ValueError(f"Proxy must be one of {PROXIES}: {proxy}")
+    paths = placeholders(placeholderGroup)
+    matrices = toArray([p.inclusiveMatrix() for p in paths])
+    choices = match(paths, candidates, mode)
+    if not cmds.objExists(group):
+        group = cmds.group(name=group, empty=True, world=True)
+
+    result = {}
+    for i, candidate in enumerate(candidates):
+        selected = matrices[choices == i]
+        scale = None
+        if not keepScale:
+            scale = om.MFnTransform(dagPath(candidate)).scale()
+        final = [
+            om.MMatrix(m.ravel().tolist())
+            for m in correct(selected, correction, scale)
+        ]
+        if proxy == "instancer":
+            result[candidate] = [instancer(candidate, group, final)]
+        else:
+            source = candidate
+            if proxy != "instances":
+                source = proxyModel(candidate, proxy)
+            result[candidate] = instance(source, group, final, progress)
+    return result
+
+
+def proxyModel(source: str, proxy: str, directory: Optional[str] = None) -> str:
+    """Hidden transform holding a `proxy` shape exported from `source`
+
+    The geometry is exported in object space, from an identity transform
+    instancing the source shapes, so instances place it with their own
+    matrices. The proxy is reused if it already exists.
+    """
+    name = source.rsplit("|", 1)[-1]
+    transform = f"{name}_{proxy}"
+    if cmds.objExists(transform):
+        return transform
+    if directory is None:
+        workspace = cmds.workspace(query=True, rootDirectory=True)
+        directory = os.path.join(workspace, "cache", "proxies")
+    os.makedirs(directory, exist_ok=True)
+
+    sourcePath = dagPath(source)
+    shapes = [
+        om.MDagPath(sourcePath).extendToShape(i).fullPathName()
+        for i in range(sourcePath.numberOfShapesDirectlyBelow())
+    ]
+    export = cmds.group(name=f"{name}_export", empty=True, world=True)
+    for shape in shapes:
+        cmds.parent(shape, export, addObject=True, shape=True)
+    try:
+        if proxy == "gpuCache":
+            cmds.loadPlugin("gpuCache", quiet=True)
+            path = cmds.gpuCache(
+                export,
+                startTime=1,
+                endTime=1,
+                directory=directory,
+                fileName=name,
+                writeMaterials=True,
+            )[0]
+        else:
+            cmds.loadPlugin("mtoa", quiet=True)
+            path = os.path.join(directory, f"{name}.ass")
+            cmds.select(export)
+            cmds.arnoldExportAss(filename=path, selected=True)
+    finally:
+        cmds.delete(export)
+
+    transform = cmds.group(name=transform, empty=True, world=True)
+    if proxy == "gpuCache":
+        shape = cmds.createNode("gpuCache", parent=transform)
+        cmds.setAttr(f"{shape}.cacheFileName", path, type="string")
+    else:
+        shape = cmds.createNode("aiStandIn", parent=transform)
+        cmds.setAttr(f"{shape}.dso", path, type="string")
+    cmds.setAttr(f"{transform}.visibility", False)
+    return transform
+
+
+def instancer(source: str, parent: str, matrices: list[om.MMatrix]) -> str:
+    """One particle instancer placing `source` at each world matrix"""
+    name = source.rsplit("|", 1)[-1]
+    parentInverse = dagPath(parent).inclusiveMatrixInverse()
+    positions, rotations, sizes = [], [], []
+    for matrix in matrices:
+        matrix = om.MTransformationMatrix(matrix * parentInverse)
+        rotation = matrix.rotation()
+        positions.append(tuple(matrix.translation(om.MSpace.kTransform)))
+        rotations.append(
+            tuple(np.degrees([rotation.x, rotation.y, rotation.z]).tolist())
+        )
+        sizes.append(tuple(matrix.scale(om.MSpace.kTransform)))
+
+    cmds.undoInfo(openChunk=True)
+    try:
+        particles, shape = cmds.particle(
+            position=positions, name=f"{name}_points"
+        )
+        cmds.setAttr(f"{shape}.isDynamic", False)
+        for attribute, values in (
+            ("rotationPP", rotations),
+            ("scalePP", sizes),
+        ):
+            for longName in (attribute, f"{attribute}0"):
+                cmds.addAttr(shape, longName=longName, dataType="vectorArray")
+            cmds.setAttr(
+                f"{shape}.{attribute}0",
+                len(values),
+                *values,
+                type="vectorArray",
+            )
+        cmds.parent(particles, parent, relative=True)
+        return cmds.particleInstancer(
+            shape,
+            addObject=True,
+            object=source,
+            rotation="rotationPP",
+            scale="scalePP",
+            name=f"{name}_instancer",
+        )
+    finally:
+        cmds.undoInfo(closeChunk=True)
+
+
+def benchmark(
+    placeholderGroup: str,
+    candidates: Sequence[str],
+    proxies: Sequence[str] = PROXIES,
+    frames: int = 24,
+    **options,
+) -> dict[str, dict[str, float]]:
+    """Swap with each proxy and measure the scene it makes
+
+    The saved scene is reopened before each run, discarding unsaved changes.
+    Frame time is the mean of `frames` viewport updates (evaluation only in
+    batch mode), translation time is an Arnold scene export when MtoA is
+    loaded, and file size is the scene saved as Maya ASCII.
+    """
+    scene = cmds.file(query=True, sceneName=True)
+    if not scene:
+        raise RuntimeError("Save the scene before benchmarking")
+    batch = cmds.about(batch=True)
+    directory = tempfile.mkdtemp(prefix="swapBenchmark")
+
+    results = {}
+    for proxy in proxies:
+        cmds.file(scene, open=True, force=True)
+        start = time.perf_counter()
+        swap(placeholderGroup, candidates, proxy=proxy, **options)
+        cmds.delete(placeholderGroup)
+        result = {"swapSeconds": time.perf_counter() - start}
+
+        first = cmds.playbackOptions(query=True, minTime=True)
+        start = time.perf_counter()
+        for frame in range(frames):
+            cmds.currentTime(first + frame, update=True)
+            if not batch:
+                cmds.refresh(force=True)
+        result["frameSeconds"] = (time.perf_counter() - start) / frames
+
+        if cmds.pluginInfo("mtoa", query=True, loaded=True):
+            start = time.perf_counter()
+            cmds.arnoldExportAss(
+                filename=os.path.join(directory, f"{proxy}.ass")
+            )
+            result["translateSeconds"] = time.perf_counter() - start
+
+        path = os.path.join(directory, f"{proxy}.ma")
+        cmds.file(rename=path)
+        cmds.file(save=True, type="mayaAscii", force=True)
+        result["fileBytes"] = os.path.getsize(path)
+        results[proxy] = result
+
+    cmds.file(scene, open=True, force=True)
+    for proxy, result in results.items():
+        translate = result.get("translateSeconds")
+        print(
+            f"{proxy}: {result['frameSeconds'] * 1000:.1f} ms/frame,"
+            f" {result['fileBytes'] / 2**20:.1f} MB .ma,"
+            f" swapped in {result['swapSeconds']:.2f} s"
+            + (f", translated in {translate:.2f} s" if translate else "")
+        )
+    return results
+
+
+def instance(
+    source: str, parent: str, matrices: list[om.MMatrix], progress: int = 0
+) -> list[str]:
+    """Instance `source` under `parent` at each world matrix
+
+    Every transform and transform value goes through one MDagModifier, and
+    shapes are instanced under the transforms with `MFnDagNode.addChild`. The
+    whole swap is undone as a single step.
+    """
+    sourcePath = dagPath(source)
+    shapes = [
+        om.MDagPath(sourcePath).extendToShape(i).node()
+        for i in range(sourcePath.numberOfShapesDirectlyBelow())
+    ]
+    parentPath = dagPath(parent)
+    parentInverse = parentPath.inclusiveMatrixInverse()
+    name = sourcePath.partialPathName().rsplit("|", 1)[-1]
+
+    modifier = om.MDagModifier()
+    nodes = []
+    for i in range(len(matrices)):
+        node = modifier.createNode("transform", parentPath.node())
+        modifier.renameNode(node, f"{name}{i + 1}")
+        nodes.append(node)
+    modifier.doIt()
+
+    paths = []
+    for i, (node, matrix) in enumerate(zip(nodes, matrices), 1):
+        setTransform(modifier, node, matrix * parentInverse)
+        paths.append(om.MDagPath.getAPathTo(node).fullPathName())
+
+        if progress and (i % progress == 0 or i == len(nodes)):
+            print(f"Instanced {source} {i}/{len(nodes)} times.")
+    undoableModifier.commit(Instances(modifier, shapes, nodes))
+    return paths
+
+
+class Instances:
+    """Run `modifier`, then instance `shapes` under each of `transforms`
+
+    MDagModifier can only reparent, not instance, so this stands in for it
+    with `undoableModifier.commit`.
+    """
+
+    def __init__(
+        self,
+        modifier: om.MDagModifier,
+        shapes: list[om.MObject],
+        transforms: list[om.MObject],
+    ) -> None:
+        self.modifier = modifier
+        self.shapes = shapes
+        self.transforms = transforms
+
+    def __repr__(self) -> str:
+        return (
+            f"{self.__class__.__name__}({len(self.shapes)} shapes,"
+            f" {len(self.transforms)} transforms)"
+        )
+
+    def doIt(self) -> None:
+        self.modifier.doIt()
+        for transform in self.transforms:
+            transform = om.MFnDagNode(transform)
+            for shape in self.shapes:
+                transform.addChild(shape, om.MFnDagNode.kNextPos, True)
+
+    def undoIt(self) -> None:
+        for transform in self.transforms:
+            transform = om.MFnDagNode(transform)
+            for shape in self.shapes:
+                transform.removeChild(shape)
+        self.modifier.undoIt()
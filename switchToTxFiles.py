@@ -1,22 +1,57 @@
 """Use Arnold's TX files as textures instead of PNGs"""
 
+import os
+
 import maya.cmds as cmds
 
+import shaderNetworkIndex
+import txConvert
+
 
-def main() -> None:
-    for network in cmds.ls("::*_shaderNetwork", type="container"):
+def main(convert: bool = True) -> None:
+    textures = {}
+    for network in shaderNetworkIndex.containers():
         try:
             texture = cmds.getAttr(f"{network}.texture")
         except ValueError:
             continue
-        if not texture:
+        if texture:
+            textures[network] = texture
+
+    # Only point networks at TX files that exist and are up to date
+    failed = set()
+    if convert:
+        root = cmds.workspace(query=True, rootDirectory=True)
+        pairs = {
+            os.path.join(root, texture): os.path.join(
+                root, "sourceimages", _txFilename(texture)
+            )
+            for texture in textures.values()
+            if _txFilename(texture).endswith(".tx")
+            and not texture.endswith(".tx")
+        }
+        result = txConvert.convert(pairs.items())
+        failed = {os.path.abspath(t) for t in result["failed"]}
+        failed.update(os.path.abspath(t) for t in result["missing"])
+        print(
+            f"TX files: {len(result['converted'])} converted,"
+            f" {len(result['skipped'])} up to date, {len(failed)} failed."
+        )
+
+    for network, texture in textures.items():
+        if failed and os.path.abspath(os.path.join(root, texture)) in failed:
+            cmds.warning(f"Could not convert {texture} for {network}.")
             continue
 
-        filename = texture.rsplit("/", 1)[-1].replace(".png", ".tx")
+        filename = _txFilename(texture)
         cmds.setAttr(
             f"{network}.texture", f"sourceimages/{filename}", type="string"
         )
 
 
+def _txFilename(texture: str) -> str:
+    return texture.rsplit("/", 1)[-1].replace(".png", ".tx")
+
+
 if __name__ == "__main__":
     main()
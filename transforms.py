@@ -0,0 +1,24 @@
+"""DAG path and transform helpers shared between scripts"""
+
+import maya.api.OpenMaya as om
+
+
+def dagPath(name: str) -> om.MDagPath:
+    return om.MGlobal.getSelectionListByName(name).getDagPath(0)
+
+
+def setTransform(
+    modifier: om.MDGModifier, node: om.MObject, matrix: om.MMatrix
+) -> None:
+    """Queue the translate, rotate, and scale values that make up `matrix`"""
+    matrix = om.MTransformationMatrix(matrix)
+    rotation = matrix.rotation()
+    node = om.MFnDependencyNode(node)
+    for attribute, values in {
+        "translate": matrix.translation(om.MSpace.kTransform),
+        "rotate": (rotation.x, rotation.y, rotation.z),
+        "scale": matrix.scale(om.MSpace.kTransform),
+    }.items():
+        for axis, value in zip("XYZ", values):
+            plug = node.findPlug(f"{attribute}{axis}", False)
+            modifier.newPlugValueDouble(plug, value)
@@ -0,0 +1,112 @@
+"""Convert textures to Arnold TX files in parallel, skipping up-to-date ones
+
+The converter is a command template whose "{input}" and "{output}" arguments
+are filled in per texture. It defaults to Arnold's maketx and can be replaced
+through the ATRACE_TX_CONVERTER environment variable, e.g. with a copy
+command when testing.
+"""
+
+import json
+import os
+import shlex
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, Optional, Sequence
+
+from fileHashes import SIDECAR, HashCache
+
+CONVERTER = ("maketx", "--oiio", "-o", "{output}", "{input}")
+
+# Sidecar kept beside the TX files
+MANIFEST = ".txManifest.json"  # {TX file: hash of the texture it came from}
+
+
+def converter() -> list[str]:
+    if command := os.environ.get("ATRACE_TX_CONVERTER"):
+        return shlex.split(command)
+    return list(CONVERTER)
+
+
+def isStale(
+    source: str, output: str, manifest: dict[str, str], hashes: HashCache
+) -> bool:
+    """Whether `output` is missing or was made from other texture contents"""
+    if not os.path.isfile(output):
+        return True
+
+    digest = hashes.hash(source)
+    if recorded := manifest.get(output):
+        return recorded != digest
+
+    # TX files made before the manifest existed are trusted if they're newer
+    if os.path.getmtime(output) >= os.path.getmtime(source):
+        manifest[output] = digest
+        return False
+    return True
+
+
+def convert(
+    pairs: Iterable[tuple[str, str]],
+    command: Optional[Sequence[str]] = None,
+    jobs: Optional[int] = None,
+) -> dict[str, list[str]]:
+    """Convert each (texture, TX file) pair whose TX file is missing or stale
+
+    Each conversion runs as its own process, at most `jobs` at a time.
+    Returns the textures that were converted, skipped, missing, or failed.
+    """
+    pairs = {os.path.abspath(s): os.path.abspath(o) for s, o in pairs}
+    command = list(command or converter())
+    result = {"converted": [], "skipped": [], "missing": [], "failed": []}
+    if not pairs:
+        return result
+
+    directories = {os.path.dirname(o) for o in pairs.values()}
+    manifests = {d: _loadManifest(d) for d in directories}
+    caches = {d: HashCache(os.path.join(d, SIDECAR)) for d in directories}
+
+    def run(source: str, output: str) -> str:
+        directory = os.path.dirname(output)
+        manifest, hashes = manifests[directory], caches[directory]
+        if not os.path.isfile(source):
+            return "missing"
+        if not isStale(source, output, manifest, hashes):
+            return "skipped"
+
+        arguments = [a.format(input=source, output=output) for a in command]
+        os.makedirs(directory, exist_ok=True)
+        try:
+            subprocess.run(arguments, check=True, capture_output=True)
+        except (OSError, subprocess.CalledProcessError):
+            return "failed"
+        if not os.path.isfile(output):
+            return "failed"
+        manifest[output] = hashes.hash(source)
+        return "converted"
+
+    with ThreadPoolExecutor(max_workers=jobs or os.cpu_count()) as executor:
+        statuses = executor.map(lambda p: run(*p), pairs.items())
+        for source, status in zip(pairs, statuses):
+            result[status].append(source)
+
+    for directory in directories:
+        _saveManifest(directory, manifests[directory])
+        caches[directory].save()
+    return result
+
+
+def _loadManifest(directory: str) -> dict[str, str]:
+    try:
+        with open(os.path.join(directory, MANIFEST)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _saveManifest(directory: str, manifest: dict[str, str]) -> None:
+    if not os.path.isdir(directory):
+        return
+    path = os.path.join(directory, MANIFEST)
+    with open(f"{path}.tmp", "w") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(f"{path}.tmp", path)
@@ -0,0 +1,61 @@
+"""Put an OpenMaya modifier on Maya's undo queue as a single step
+
+Modifiers run from scripts are invisible to Maya's undo queue, so this file
+doubles as a plug-in whose only command hands a finished modifier to it.
+"""
+
+import sys
+import types
+
+import maya.api.OpenMaya as om
+import maya.cmds as cmds
+
+COMMAND = "atraceModifier"
+
+maya_useNewAPI = True
+
+# Maya imports plug-ins under its own module name, so share pending modifiers
+# through `sys.modules` instead of a module global
+_shared = sys.modules.setdefault("_atraceModifier", types.ModuleType("_"))
+if not hasattr(_shared, "pending"):
+    _shared.pending = []
+
+
+class Command(om.MPxCommand):
+    def __init__(self) -> None:
+        super().__init__()
+        self._modifier = None
+
+    def doIt(self, _) -> None:
+        self._modifier = _shared.pending.pop()
+        self._modifier.doIt()
+
+    def redoIt(self) -> None:
+        self._modifier.doIt()
+
+    def undoIt(self) -> None:
+        self._modifier.undoIt()
+
+    def isUndoable(self) -> bool:
+        return True
+
+
+def commit(modifier: om.MDGModifier) -> None:
+    """Execute the remaining operations in `modifier` as one undoable step
+
+    Operations already run by an earlier `modifier.doIt()` are undone along
+    with the rest. Anything else with `doIt` and `undoIt` methods, like
+    `swapPlaceholders.Instances`, can stand in for a modifier.
+    """
+    if not cmds.pluginInfo(__file__, query=True, loaded=True):
+        cmds.loadPlugin(__file__, quiet=True)
+    _shared.pending.append(modifier)
+    getattr(cmds, COMMAND)()
+
+
+def initializePlugin(plugin: om.MObject) -> None:
+    om.MFnPlugin(plugin).registerCommand(COMMAND, Command)
+
+
+def uninitializePlugin(plugin: om.MObject) -> None:
+    om.MFnPlugin(plugin).deregisterCommand(COMMAND)